@@ -0,0 +1,84 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Benchmark of approximate similar-movie lookups.
+
+Embeds the movie catalog, then answers similar-movie queries for random
+movies by brute-force cosine similarity and through the IVF index at
+several probe counts, and reports the recall@k and latency of each.
+
+Usage: python bench/bench_ann.py [--queries N] [--k K] [--lists N] [--movies PATH]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(bench_dir)
+sys.path.insert(0, os.path.join(project_dir, "src"))
+
+# pylint: disable=wrong-import-position,import-error
+from nltk.stem import PorterStemmer
+from prediction_scripts.catalog import DEFAULT_MOVIES_PATH, Catalog
+from prediction_scripts.embeddings import MovieEmbeddings
+
+PROBES = (1, 2, 4, 8, 16, 32, 64)
+
+
+def timed(search, rows):
+    """
+    Results and per-query latencies in milliseconds of a search over some rows
+    """
+    results, latencies = [], []
+    for row in rows:
+        start = time.perf_counter()
+        results.append(set(search(row)[0].tolist()))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+
+def main():
+    """
+    Compares IVF lookups at several probe counts with exact search
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--movies", default=DEFAULT_MOVIES_PATH)
+    args = parser.parse_args()
+
+    catalog = Catalog.from_csv(args.movies)
+    start = time.perf_counter()
+    embeddings = MovieEmbeddings.build(catalog, PorterStemmer(), n_lists=args.lists)
+    print(
+        f"embedded and indexed {len(catalog)} movies into {embeddings.index.n_lists} lists "
+        f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+
+    rows = np.random.default_rng(0).choice(len(catalog), args.queries, replace=False)
+    exact, latencies = timed(lambda row: embeddings.similar(row, args.k, None, [row]), rows)
+    print(
+        f"{'exact':<10} recall 1.000   "
+        f"p50 {np.percentile(latencies, 50):7.3f} ms   p99 {np.percentile(latencies, 99):7.3f} ms"
+    )
+    for n_probe in PROBES:
+        if n_probe > embeddings.index.n_lists:
+            break
+        found, latencies = timed(lambda row, n_probe=n_probe: embeddings.similar(row, args.k, n_probe, [row]), rows)
+        recall = np.mean([len(a & b) / max(len(b), 1) for a, b in zip(found, exact)])
+        print(
+            f"probe {n_probe:<4} recall {recall:.3f}   "
+            f"p50 {np.percentile(latencies, 50):7.3f} ms   p99 {np.percentile(latencies, 99):7.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Benchmark of per-request auth overhead.
+
+Replays Authorization headers from a pool of sessions and times turning
+each into a user id the way the routes used to, with jwt.decode on every
+request, and through the TokenVerifier behind require_auth, with and
+without its cache of verified tokens.
+
+Usage: python bench/bench_auth.py [--requests N] [--sessions N] [--cache-size N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(bench_dir)
+sys.path.insert(0, os.path.join(project_dir, "src", "recommenderapp"))
+
+# pylint: disable=wrong-import-position,import-error
+import jwt
+from auth import TokenVerifier, bearer_token
+
+SECRET_KEY = "popcornpicks"
+
+
+def decode_every_time(auth_header):
+    """
+    The header parsing and decode each protected route used to repeat
+    """
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    token = auth_header.split(' ')[1]
+    payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    return payload['user_id']
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of samples
+    """
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def measure(name, authenticate, headers):
+    """
+    Times authenticate on every header and prints the mean and p50/p99 latency
+    """
+    latencies = []
+    for header in headers:
+        start = time.perf_counter()
+        authenticate(header)
+        latencies.append(time.perf_counter() - start)
+    print(
+        f"{name:<24} mean {sum(latencies) / len(latencies) * 1e6:7.2f} us   "
+        f"p50 {percentile(latencies, 0.50) * 1e6:7.2f} us   "
+        f"p99 {percentile(latencies, 0.99) * 1e6:7.2f} us"
+    )
+
+
+def main():
+    """
+    Times authenticating replayed headers with and without the token cache
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--cache-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    expires = int(time.time()) + 3600
+    tokens = [
+        jwt.encode({"user_id": user_id, "exp": expires}, SECRET_KEY, algorithm="HS256")
+        for user_id in range(args.sessions)
+    ]
+    rng = random.Random(0)
+    headers = [f"Bearer {rng.choice(tokens)}" for _ in range(args.requests)]
+
+    measure("jwt.decode per request", decode_every_time, headers)
+    uncached = TokenVerifier(SECRET_KEY, max_entries=0)
+    measure("verifier, no cache", lambda header: uncached.user_id(bearer_token(header)), headers)
+    cached = TokenVerifier(SECRET_KEY, max_entries=args.cache_size)
+    measure("verifier, cached", lambda header: cached.user_id(bearer_token(header)), headers)
+    metrics = cached.metrics()
+    print(f"cache hit rate {metrics['hit_rate']:.3f} with {metrics['entries']} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Benchmark of cold catalog loading.
+
+Loads the movie catalog in fresh processes, once by parsing movies.csv and
+once by memory-mapping a snapshot built from it, and reports the load time
+(after the imports) and peak memory of each process.
+
+Usage: python bench/bench_catalog.py [--runs N] [--movies PATH]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(bench_dir)
+sys.path.insert(0, os.path.join(project_dir, "src"))
+
+# pylint: disable=wrong-import-position,import-error
+from prediction_scripts.catalog import DEFAULT_MOVIES_PATH, build_snapshot
+
+# Run in a fresh interpreter so nothing is cached between loads
+LOAD_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+from prediction_scripts.catalog import Catalog, max_rss_bytes
+start = time.perf_counter()
+catalog = Catalog.{loader}({path!r})
+catalog.title_index
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "rows": len(catalog), "rss": max_rss_bytes()}}))
+"""
+
+
+def load(loader, path):
+    """
+    Loads the catalog in a new process and returns its timing report
+    """
+    script = LOAD_SCRIPT.format(src=os.path.join(project_dir, "src"), loader=loader, path=path)
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    """
+    Loads the catalog from the CSV and from a snapshot, printing the time and memory of each
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--movies", default=DEFAULT_MOVIES_PATH)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        snapshot = build_snapshot(args.movies, os.path.join(tmp, "movies.snapshot"))
+        print(f"snapshot build: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        for name, loader, path in (
+            ("csv", "from_csv", args.movies),
+            ("snapshot", "from_snapshot", snapshot),
+        ):
+            reports = [load(loader, path) for _ in range(args.runs)]
+            seconds = sorted(report["seconds"] for report in reports)
+            rss = max(report["rss"] or 0 for report in reports)
+            print(
+                f"{name:<10} {reports[0]['rows']} rows   "
+                f"median {seconds[len(seconds) // 2] * 1000:8.1f} ms   "
+                f"min {seconds[0] * 1000:8.1f} ms   "
+                f"peak rss {rss / 2 ** 20:7.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Benchmark of the /predict route against an SQLite stand-in for MySQL.
+
+Reports the database round trips per request and the p50/p99 latency of
+/predict, and compares the bulk enrichment query with the previous three
+SELECTs per recommended title.
+
+Usage: python bench/bench_predict.py [--requests N] [--seeds N]
+"""
+
+import argparse
+import csv
+import os
+import random
+import sqlite3
+import sys
+import time
+from unittest.mock import patch
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(bench_dir)
+app_dir = os.path.join(project_dir, "src", "recommenderapp")
+
+
+class CountingCursor:
+    """
+    Cursor accepting the MySQL %s paramstyle that counts every statement
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.sqlite.cursor()
+
+    def execute(self, query, params=()):
+        """
+        Runs a statement on SQLite, counting a round trip
+        """
+        self.connection.round_trips += 1
+        self.cursor.execute(query.replace("%s", "?"), tuple(params))
+
+    def fetchone(self):
+        """
+        Next row of the last statement
+        """
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        """
+        Remaining rows of the last statement
+        """
+        return self.cursor.fetchall()
+
+    @property
+    def description(self):
+        """
+        Column descriptions of the last statement
+        """
+        return self.cursor.description
+
+    def close(self):
+        """
+        Closes the SQLite cursor
+        """
+        self.cursor.close()
+
+
+class CountingConnection:
+    """
+    Minimal stand-in for a mysql.connector connection backed by SQLite
+    """
+
+    def __init__(self, sqlite):
+        self.sqlite = sqlite
+        self.round_trips = 0
+
+    def cursor(self, *args, **kwargs):
+        """
+        New counting cursor; the mysql.connector options are ignored
+        """
+        return CountingCursor(self)
+
+    def commit(self):
+        """
+        Commits the SQLite transaction
+        """
+        self.sqlite.commit()
+
+    def rollback(self):
+        """
+        Rolls back the SQLite transaction
+        """
+        self.sqlite.rollback()
+
+    def ping(self, reconnect=False):
+        """
+        Always healthy, as the database is in memory
+        """
+
+    def close(self):
+        """
+        Leaves the shared SQLite database open
+        """
+
+
+def load_movies(movies_path):
+    """
+    Loads the catalog into an in-memory SQLite Movies table shaped like init.sql
+    """
+    sqlite = sqlite3.connect(":memory:", check_same_thread=False)
+    sqlite.execute(
+        "CREATE TABLE Movies (idMovies INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, "
+        "imdb_id TEXT, genres TEXT, overview TEXT, poster_path TEXT, runtime INTEGER, "
+        "streaming_platforms TEXT)"
+    )
+    with open(movies_path, "r", encoding="utf-8") as file:
+        rows = [
+            (row["title"], row["imdb_id"], row["genres"], row["overview"],
+             row["poster_path"], row.get("streaming_platforms", ""))
+            for row in csv.DictReader(file)
+        ]
+    sqlite.executemany(
+        "INSERT INTO Movies (name, imdb_id, genres, overview, poster_path, streaming_platforms) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    sqlite.commit()
+    return sqlite, [row[0] for row in rows]
+
+
+def legacy_enrichment(db, titles):
+    """
+    The previous /predict enrichment: three SELECTs per recommended title
+    """
+    details = []
+    for title in titles:
+        cursor = db.cursor()
+        cursor.execute("SELECT idMovies FROM Movies WHERE name = %s", (title,))
+        result = cursor.fetchone()
+        cursor.close()
+        if result:
+            cursor = db.cursor()
+            cursor.execute("SELECT overview FROM Movies WHERE name = %s", (title,))
+            overview = cursor.fetchone()[0]
+            cursor.close()
+            cursor = db.cursor()
+            cursor.execute("SELECT streaming_platforms FROM Movies WHERE name = %s", (title,))
+            streaming_platforms = cursor.fetchone()[0]
+            cursor.close()
+            details.append((result[0], title, overview, streaming_platforms))
+    return details
+
+
+def percentile(samples, fraction):
+    """
+    Nearest-rank percentile of a list of samples
+    """
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(name, latencies, round_trips):
+    """
+    Prints one line of benchmark results
+    """
+    print(
+        f"{name:<22} p50 {percentile(latencies, 0.50) * 1000:8.2f} ms   "
+        f"p99 {percentile(latencies, 0.99) * 1000:8.2f} ms   "
+        f"{round_trips / len(latencies):6.1f} round trips/request"
+    )
+
+
+def main():
+    """
+    Replays /predict requests and prints their latency and round trips
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seeds", type=int, default=5, help="input movies per request")
+    args = parser.parse_args()
+
+    sqlite, titles = load_movies(os.path.join(project_dir, "data", "movies.csv"))
+    db = CountingConnection(sqlite)
+    rng = random.Random(0)
+    requests = [rng.sample(titles, args.seeds) for _ in range(args.requests)]
+
+    # app.py resolves its data files relative to its own directory
+    os.chdir(app_dir)
+    sys.path.insert(0, app_dir)
+    with patch("mysql.connector.connect", return_value=db):
+        import app  # pylint: disable=import-outside-toplevel,import-error
+
+        client = app.app.test_client()
+        # Wait for the recommender rather than timing its load in the first request
+        model = app.recommender.get()
+        latencies = []
+        db.round_trips = 0
+        for seeds in requests:
+            start = time.perf_counter()
+            response = client.post("/predict", json={"movies": seeds})
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.json
+        report("/predict", latencies, db.round_trips)
+
+        for name, enrich in (("legacy enrichment", legacy_enrichment),
+                             ("bulk enrichment", app.get_movie_details)):
+            latencies = []
+            db.round_trips = 0
+            for seeds in requests:
+                candidates = [rec["title"] for rec in
+                              model.recommend_many(seeds, app.PREDICT_CANDIDATES)]
+                start = time.perf_counter()
+                enrich(db, candidates)
+                latencies.append(time.perf_counter() - start)
+            report(name, latencies, db.round_trips)
+
+
+if __name__ == "__main__":
+    main()
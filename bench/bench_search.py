@@ -0,0 +1,108 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Benchmark of per-query /search latency.
+
+Compares Search.results_top_ten with the linear scan over every title that
+it replaced, on prefixes and substrings of random catalog titles, and times
+Search.ranked_results on the same queries and on misspelled titles.
+
+Usage: python bench/bench_search.py [--queries N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(bench_dir)
+sys.path.insert(0, os.path.join(project_dir, "src", "recommenderapp"))
+
+# pylint: disable=wrong-import-position,import-error
+from search import Search
+
+
+def linear_top_ten(titles, word):
+    """
+    The previous search: a prefix scan then a substring scan over every title
+    """
+    n = len(word)
+    word = word.lower()
+    res = [x for x in titles if x.lower()[:n] == word]
+    visited_words = set(res)
+    res.extend(x for x in titles if x not in visited_words and word in x.lower())
+    return res[:10]
+
+
+def misspell(rng, title):
+    """
+    Swaps two adjacent letters of a title
+    """
+    if len(title) < 4:
+        return title
+    i = rng.randrange(len(title) - 1)
+    return title[:i] + title[i + 1] + title[i] + title[i + 2:]
+
+
+def percentile(samples, fraction):
+    """
+    Nearest-rank percentile of a list of samples
+    """
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(name, search, queries):
+    """
+    Times search on every query and prints p50/p99/max latency
+    """
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append(time.perf_counter() - start)
+    print(
+        f"{name:<28} p50 {percentile(latencies, 0.50) * 1000:8.3f} ms   "
+        f"p99 {percentile(latencies, 0.99) * 1000:8.3f} ms   "
+        f"max {max(latencies) * 1000:8.3f} ms"
+    )
+
+
+def main():
+    """
+    Times every search mode on sampled titles and prints the latencies
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    finder = Search()
+    print(f"index build: {(time.perf_counter() - start) * 1000:.1f} ms")
+    titles = list(finder.df["title"])
+
+    rng = random.Random(0)
+    sample = rng.sample(titles, args.queries)
+    workloads = {
+        "prefix": [title[:rng.randint(1, 8)] for title in sample],
+        "substring": [title[2:rng.randint(4, 9)] for title in sample],
+    }
+    for workload, queries in workloads.items():
+        measure(f"{workload} linear scan", lambda word: linear_top_ten(titles, word), queries)
+        measure(f"{workload} results_top_ten", finder.results_top_ten, queries)
+
+    start = time.perf_counter()
+    finder.build_ranked_index()
+    print(f"ranked index build: {(time.perf_counter() - start) * 1000:.1f} ms")
+    workloads["typo"] = [misspell(rng, title.split(" (")[0]) for title in sample]
+    for workload, queries in workloads.items():
+        measure(f"{workload} ranked_results", finder.ranked_results, queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -30,7 +30,8 @@ CREATE TABLE IF NOT EXISTS Movies (
   runtime INT,                              -- Maps to 'runtime', stored as an integer
   streaming_platforms TEXT,                 -- Maps to 'streaming_platforms'
   PRIMARY KEY (idMovies),
-  UNIQUE INDEX imdb_id_UNIQUE (imdb_id ASC)
+  UNIQUE INDEX imdb_id_UNIQUE (imdb_id ASC),
+  INDEX name_idx (name ASC)
 );
 
 -- Create the Watchlist table
@@ -39,6 +40,7 @@ CREATE TABLE IF NOT EXISTS Watchlist (
     user_id INT NOT NULL,
     movie_id INT NOT NULL,
     added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX user_movie_idx (user_id ASC, movie_id ASC),
     FOREIGN KEY (user_id) REFERENCES Users(idUsers),
     FOREIGN KEY (movie_id) REFERENCES Movies(idMovies)
 );
@@ -52,7 +54,8 @@ CREATE TABLE IF NOT EXISTS Ratings (
   review TEXT NOT NULL,
   time DATETIME NOT NULL,
   PRIMARY KEY (idRatings),
-  INDEX user_id_idx (user_id ASC),
+  INDEX user_time_idx (user_id ASC, time ASC, movie_id, score),
+  INDEX time_idx (time ASC),
   INDEX movie_id_idx (movie_id ASC),
   CONSTRAINT user_id
     FOREIGN KEY (user_id)
@@ -71,6 +74,7 @@ CREATE TABLE IF NOT EXISTS Friends (
   idUsers INT NOT NULL,
   idFriend INT NOT NULL,
   PRIMARY KEY (idFriendship),
+  INDEX user_friend_idx (idUsers ASC, idFriend ASC),
   CONSTRAINT idUsers
     FOREIGN KEY (idUsers)
     REFERENCES Users (idUsers)
@@ -81,4 +85,45 @@ CREATE TABLE IF NOT EXISTS Friends (
     REFERENCES Users (idUsers)
     ON DELETE NO ACTION
     ON UPDATE NO ACTION
+) ENGINE = InnoDB;
+
+-- Top recommendations of every user, written by src/recommenderapp/precompute.py
+CREATE TABLE IF NOT EXISTS UserRecommendations (
+  user_id INT NOT NULL,
+  position INT NOT NULL,
+  movie_id INT NOT NULL,
+  score FLOAT NOT NULL,
+  model_version VARCHAR(45) NOT NULL,
+  computed_at DATETIME NOT NULL,
+  PRIMARY KEY (user_id, position),
+  CONSTRAINT recommendation_user_id
+    FOREIGN KEY (user_id)
+    REFERENCES Users (idUsers)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION,
+  CONSTRAINT recommendation_movie_id
+    FOREIGN KEY (movie_id)
+    REFERENCES Movies (idMovies)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION
+) ENGINE = InnoDB;
+
+-- Recent reviews of every user's friends, newest first, pushed by submit_review
+-- and trimmed to the newest 100 per user
+CREATE TABLE IF NOT EXISTS FriendActivity (
+  user_id INT NOT NULL,
+  time DATETIME NOT NULL,
+  rating_id INT NOT NULL,
+  friend_id INT NOT NULL,
+  PRIMARY KEY (user_id, time, rating_id),
+  CONSTRAINT activity_user_id
+    FOREIGN KEY (user_id)
+    REFERENCES Users (idUsers)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION,
+  CONSTRAINT activity_rating_id
+    FOREIGN KEY (rating_id)
+    REFERENCES Ratings (idRatings)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION
 ) ENGINE = InnoDB;
\ No newline at end of file
@@ -0,0 +1,24 @@
+-- Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+-- This code is licensed under MIT license (see LICENSE for details)
+
+-- @author: PopcornPicks
+
+-- Indexes for the lookups the API runs on every request. Databases created
+-- from the current init.sql already have them; run this once on older ones.
+
+USE PopcornPicksDB;
+
+-- /predict, submit_review and movies.py look movies up by title
+ALTER TABLE Movies ADD INDEX name_idx (name ASC);
+
+-- Existence checks and deletes of the watchlist routes, covered by the index
+ALTER TABLE Watchlist ADD INDEX user_movie_idx (user_id ASC, movie_id ASC);
+
+-- Both sides of add_friend's OR query, and get_friends
+ALTER TABLE Friends ADD INDEX user_friend_idx (idUsers ASC, idFriend ASC);
+
+-- A user's most recent reviews, covering the columns the recent-movies queries read
+ALTER TABLE Ratings ADD INDEX user_time_idx (user_id ASC, time ASC, movie_id, score);
+
+-- user_time_idx now backs the user_id foreign key
+ALTER TABLE Ratings DROP INDEX user_id_idx;
@@ -0,0 +1,11 @@
+-- Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+-- This code is licensed under MIT license (see LICENSE for details)
+
+-- @author: PopcornPicks
+
+-- The review wall pages through Ratings by (time, idRatings); InnoDB keeps
+-- the primary key in every secondary index, so an index on time covers both.
+
+USE PopcornPicksDB;
+
+ALTER TABLE Ratings ADD INDEX time_idx (time ASC);
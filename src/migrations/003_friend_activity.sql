@@ -0,0 +1,35 @@
+-- Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+-- This code is licensed under MIT license (see LICENSE for details)
+
+-- @author: PopcornPicks
+
+-- Friend activity timelines for /friends/activity, filled with the newest
+-- 100 reviews of every user's friends; submit_review keeps them up to date.
+
+USE PopcornPicksDB;
+
+CREATE TABLE IF NOT EXISTS FriendActivity (
+  user_id INT NOT NULL,
+  time DATETIME NOT NULL,
+  rating_id INT NOT NULL,
+  friend_id INT NOT NULL,
+  PRIMARY KEY (user_id, time, rating_id),
+  CONSTRAINT activity_user_id
+    FOREIGN KEY (user_id)
+    REFERENCES Users (idUsers)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION,
+  CONSTRAINT activity_rating_id
+    FOREIGN KEY (rating_id)
+    REFERENCES Ratings (idRatings)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION
+) ENGINE = InnoDB;
+
+INSERT IGNORE INTO FriendActivity (user_id, time, rating_id, friend_id)
+SELECT user_id, time, rating_id, friend_id FROM (
+  SELECT f.idUsers AS user_id, r.time, r.idRatings AS rating_id, r.user_id AS friend_id,
+    ROW_NUMBER() OVER (PARTITION BY f.idUsers ORDER BY r.time DESC, r.idRatings DESC) AS position
+  FROM Friends AS f JOIN Ratings AS r ON r.user_id = f.idFriend
+) AS ranked
+WHERE position <= 100;
@@ -0,0 +1,29 @@
+-- Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+-- This code is licensed under MIT license (see LICENSE for details)
+
+-- @author: PopcornPicks
+
+-- Precomputed recommendations for /recommendations, written by
+-- src/recommenderapp/precompute.py; empty until the job first runs.
+
+USE PopcornPicksDB;
+
+CREATE TABLE IF NOT EXISTS UserRecommendations (
+  user_id INT NOT NULL,
+  position INT NOT NULL,
+  movie_id INT NOT NULL,
+  score FLOAT NOT NULL,
+  model_version VARCHAR(45) NOT NULL,
+  computed_at DATETIME NOT NULL,
+  PRIMARY KEY (user_id, position),
+  CONSTRAINT recommendation_user_id
+    FOREIGN KEY (user_id)
+    REFERENCES Users (idUsers)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION,
+  CONSTRAINT recommendation_movie_id
+    FOREIGN KEY (movie_id)
+    REFERENCES Movies (idMovies)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION
+) ENGINE = InnoDB;
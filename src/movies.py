@@ -1,9 +1,17 @@
 """
 Reads the movies in data/movies.csv and imports them into the local database.
 Make sure to run init.sql first.
+
+Rows are upserted on imdb_id in batches, one commit per batch, so the
+import can be rerun and a bad row only rejects itself:
+
+    python movies.py [csv] [--batch-size N] [--workers N] [--load-data]
 """
 
+import argparse
 import csv
+import time
+from concurrent.futures import ThreadPoolExecutor
 import mysql.connector
 
 # Database connection settings
@@ -16,52 +24,210 @@ DB_PORT = 27276
 # CSV file path
 CSV_FILE = '../data/movies.csv'
 
-def import_csv_to_mysql():
+# Rows sent per executemany and committed together
+BATCH_SIZE = 1000
+
+# Times a batch is retried when it loses a deadlock to another worker
+DEADLOCK_RETRIES = 3
+ER_LOCK_DEADLOCK = 1213
+
+COLUMNS = ('name', 'genres', 'imdb_id', 'overview', 'poster_path', 'runtime', 'streaming_platforms')
+
+# Re-imported movies are updated in place, keeping the idMovies other tables refer to
+UPDATE_CLAUSE = "ON DUPLICATE KEY UPDATE " + ", ".join(
+    f"{column} = VALUES({column})" for column in COLUMNS if column != 'imdb_id'
+)
+
+UPSERT_QUERY = f"""
+    INSERT INTO Movies ({', '.join(COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(COLUMNS))})
+    {UPDATE_CLAUSE}
+"""
+
+# Column widths of the Movies table
+MAX_NAME_LENGTH = 128
+MAX_IMDB_ID_LENGTH = 45
+MAX_GENRES_LENGTH = 255
+
+
+def connect(**options):
+    """
+    Connection to the local database, with extra connector options
+    """
+    return mysql.connector.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        port=DB_PORT,
+        **options
+    )
+
+
+def parse_row(row):
+    """
+    Values of a CSV row in COLUMNS order, or ValueError if it cannot be stored
+    """
+    if not row.get('title') or not row.get('imdb_id'):
+        raise ValueError("missing title or imdb_id")
+    if len(row['title']) > MAX_NAME_LENGTH or len(row['imdb_id']) > MAX_IMDB_ID_LENGTH:
+        raise ValueError("title or imdb_id too long")
+    if len(row.get('genres') or '') > MAX_GENRES_LENGTH:
+        raise ValueError("genres too long")
+    runtime = row.get('runtime')
+    return (
+        row['title'],                                       # Maps to 'name'
+        row.get('genres') or None,                          # Maps to 'genres'
+        row['imdb_id'],                                     # Maps to 'imdb_id'
+        row.get('overview') or None,                        # Maps to 'overview'
+        row.get('poster_path') or None,                     # Maps to 'poster_path'
+        int(float(runtime)) if runtime else None,           # Maps to 'runtime'
+        row.get('streaming_platforms') or None,             # Maps to 'streaming_platforms'
+    )
+
+
+def read_rows(path):
+    """
+    Parsed rows of a movies CSV file, with (line, title, reason) for each rejected row
+    """
+    rows, rejected = [], []
+    with open(path, 'r', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            try:
+                rows.append(parse_row(row))
+            except (ValueError, TypeError) as error:
+                rejected.append((reader.line_num, row.get('title'), str(error)))
+    return rows, rejected
+
+
+def load_batches(connection, rows, batch_size=BATCH_SIZE):
+    """
+    Upserts rows a batch at a time, committing each batch; a batch the
+    server refuses is retried row by row so only its bad rows are rejected
+
+    Returns the number of rows stored and (title, reason) for each rejected one
+    """
+    cursor = connection.cursor()
+    stored, rejected = 0, []
     try:
-        # Connect to the database
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            port=DB_PORT
-        )
-        cursor = connection.cursor()
-
-        # Open the CSV file
-        with open(CSV_FILE, 'r', encoding='utf-8') as file:
-            csv_reader = csv.DictReader(file)
-            for row in csv_reader:
-                # Insert the row into the Movies table
-                insert_query = """
-                    INSERT INTO Movies (name, genres, imdb_id, overview, poster_path, runtime, streaming_platforms)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            for attempt in range(DEADLOCK_RETRIES + 1):
                 try:
-                    cursor.execute(insert_query, (
-                        row['title'],         # Maps to 'name'
-                        row['genres'],        # Maps to 'genres'
-                        row['imdb_id'],       # Maps to 'imdb_id'
-                        row['overview'],      # Maps to 'overview'
-                        row['poster_path'],   # Maps to 'poster_path'
-                        int(row['runtime']) if row['runtime'] else None,  # Maps to 'runtime'
-                        row['streaming_platforms']
-                    ))
+                    cursor.executemany(UPSERT_QUERY, batch)
+                    connection.commit()
+                    stored += len(batch)
+                    break
                 except mysql.connector.Error as error:
-                    print(f"Skipping: {row['title']}")
+                    connection.rollback()
+                    if error.errno == ER_LOCK_DEADLOCK and attempt < DEADLOCK_RETRIES:
+                        continue
+                    for row in batch:
+                        try:
+                            cursor.execute(UPSERT_QUERY, row)
+                            stored += 1
+                        except mysql.connector.Error as row_error:
+                            rejected.append((row[0], str(row_error)))
+                    connection.commit()
+                    break
+    finally:
+        cursor.close()
+    return stored, rejected
 
-        # Commit the transaction
-        connection.commit()
-        print("Data imported successfully!")
 
-    except mysql.connector.Error as error:
-        print(f"Error: {error}")
-        connection.rollback()
+def load_data_infile(connection, path):
+    """
+    Loads a CSV file with LOAD DATA LOCAL INFILE into a staging table and
+    upserts it into Movies in one statement; needs local_infile enabled on
+    the server and the connection
 
+    Returns the number of rows stored and the number the server skipped
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        rows = sum(1 for _ in csv.reader(file)) - 1
+    cursor = connection.cursor()
+    try:
+        cursor.execute("CREATE TEMPORARY TABLE MoviesStaging LIKE Movies")
+        cursor.execute(
+            """
+            LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE MoviesStaging
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            IGNORE 1 LINES
+            (@movie_id, name, genres, imdb_id, overview, poster_path, @runtime, streaming_platforms)
+            SET runtime = IF(@runtime = '', NULL, ROUND(@runtime))
+            """,
+            (path,),
+        )
+        cursor.execute("SELECT COUNT(*) FROM MoviesStaging")
+        staged = cursor.fetchone()[0]
+        cursor.execute(
+            f"INSERT INTO Movies ({', '.join(COLUMNS)}) "
+            f"SELECT {', '.join(COLUMNS)} FROM MoviesStaging {UPDATE_CLAUSE}"
+        )
+        connection.commit()
+        cursor.execute("DROP TEMPORARY TABLE MoviesStaging")
     finally:
-        if connection.is_connected():
-            cursor.close()
+        cursor.close()
+    return staged, rows - staged
+
+
+def import_csv_to_mysql(path=CSV_FILE, batch_size=BATCH_SIZE, workers=1, load_data=False):
+    """
+    Imports a movies CSV file, with several connections loading contiguous
+    slices of it in parallel when workers is above 1, and reports the
+    throughput and rejected rows
+    """
+    start = time.perf_counter()
+    if load_data:
+        try:
+            connection = connect(allow_local_infile=True)
+            try:
+                stored, skipped = load_data_infile(connection, path)
+            finally:
+                connection.close()
+            elapsed = time.perf_counter() - start
+            print(f"Imported {stored} movies with LOAD DATA in {elapsed:.1f}s "
+                  f"({stored / max(elapsed, 1e-9):.0f} rows/sec), {skipped} rows skipped by the server")
+            return stored, [(None, f"{skipped} rows skipped by LOAD DATA")] if skipped else []
+        except mysql.connector.Error as error:
+            print(f"LOAD DATA LOCAL INFILE unavailable ({error}), falling back to batched inserts")
+
+    rows, rejected = read_rows(path)
+    rejected = [(title, f"line {line}: {reason}") for line, title, reason in rejected]
+    workers = max(1, min(workers, len(rows) // batch_size + 1))
+    size = max(1, -(-len(rows) // workers))
+    slices = [rows[i:i + size] for i in range(0, len(rows), size)]
+
+    def load(part):
+        connection = connect()
+        try:
+            return load_batches(connection, part, batch_size)
+        finally:
             connection.close()
 
+    stored = 0
+    with ThreadPoolExecutor(workers) as pool:
+        for part_stored, part_rejected in pool.map(load, slices):
+            stored += part_stored
+            rejected.extend(part_rejected)
+
+    elapsed = time.perf_counter() - start
+    print(f"Imported {stored} movies in {elapsed:.1f}s ({stored / max(elapsed, 1e-9):.0f} rows/sec) "
+          f"with {workers} connection(s), batches of {batch_size}")
+    if rejected:
+        print(f"Rejected {len(rejected)} rows:")
+        for title, reason in rejected:
+            print(f"  {title}: {reason}")
+    return stored, rejected
+
+
 if __name__ == '__main__':
-    import_csv_to_mysql()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Import data/movies.csv into the Movies table")
+    parser.add_argument('path', nargs='?', default=CSV_FILE)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--load-data', action='store_true', help="use LOAD DATA LOCAL INFILE when the server allows it")
+    args = parser.parse_args()
+    import_csv_to_mysql(args.path, args.batch_size, args.workers, args.load_data)
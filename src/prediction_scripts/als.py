@@ -0,0 +1,275 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Latent-factor recommender trained by alternating least squares over
+data/ratings.csv, served by batched matrix products and argpartition.
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(scripts_dir))
+
+# pylint: disable=wrong-import-position
+from prediction_scripts.model_store import load_artifact, save_artifact
+
+ALS_ARTIFACT = "als"
+
+DEFAULT_ALS_PATH = os.path.join(scripts_dir, "artifacts", "als_factors.npz")
+
+DEFAULT_FACTORS = 32
+DEFAULT_REGULARIZATION = 0.1
+DEFAULT_ITERATIONS = 10
+
+# Rows solved together: their normal equations are stacked into one batched solve
+BLOCK_SIZE = 256
+
+# Implicit feedback: confidence of an observed rating is 1 + CONFIDENCE_ALPHA * rating
+CONFIDENCE_ALPHA = 10.0
+
+
+def solve_rows(matrix, rows, fixed, regularization, implicit=False, gram=None):
+    """
+    Least-squares factors of some rows of a CSR ratings matrix against the
+    fixed factors of its columns, as one batched solve of their normal equations
+    """
+    n_factors = fixed.shape[1]
+    lhs = np.empty((len(rows), n_factors, n_factors))
+    rhs = np.empty((len(rows), n_factors))
+    identity = np.eye(n_factors)
+    for i, row in enumerate(rows):
+        start, stop = matrix.indptr[row], matrix.indptr[row + 1]
+        factors = fixed[matrix.indices[start:stop]]
+        values = matrix.data[start:stop]
+        if implicit:
+            # Unrated columns count as preference 0 with confidence 1, through the gram matrix
+            confidence = 1 + CONFIDENCE_ALPHA * values
+            lhs[i] = gram + (factors.T * (confidence - 1)).dot(factors)
+            rhs[i] = factors.T.dot(confidence)
+            lhs[i] += regularization * identity
+        else:
+            lhs[i] = factors.T.dot(factors)
+            rhs[i] = factors.T.dot(values)
+            # Weighted regularization, so rows with many ratings are not over-shrunk
+            lhs[i] += regularization * max(stop - start, 1) * identity
+    return np.linalg.solve(lhs, rhs[..., None])[..., 0]
+
+
+class ALSModel:
+    """
+    User and movie factors whose dot products predict ratings
+    """
+
+    def __init__(
+        self, user_keys, movie_ids, user_factors, item_factors, mean=0.0, implicit=False, source=None,
+        version=None,
+    ):
+        """
+        user_keys and movie_ids label the rows of user_factors and item_factors;
+        mean is added back to every explicit prediction, source is the
+        (size, mtime_ns) of the ratings file the model was trained on, and
+        version the artifact version it was loaded from
+        """
+        self.user_keys = user_keys
+        self.movie_ids = movie_ids
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.mean = mean
+        self.implicit = implicit
+        self.source = source
+        self.version = version
+        self.user_position = pd.Index(user_keys)
+        self.item_position = pd.Index(movie_ids)
+
+    @classmethod
+    def fit(
+        cls,
+        ratings,
+        factors=DEFAULT_FACTORS,
+        regularization=DEFAULT_REGULARIZATION,
+        iterations=DEFAULT_ITERATIONS,
+        implicit=False,
+        workers=None,
+        seed=0,
+    ):
+        """
+        Trains on a frame of userId, movieId and rating columns, solving blocks
+        of users then blocks of movies in a thread pool each iteration (numpy
+        releases the GIL in its matrix products and solves)
+        """
+        ratings = ratings.drop_duplicates(["userId", "movieId"], keep="last")
+        user_codes, user_keys = pd.factorize(ratings["userId"], sort=True)
+        item_codes, movie_ids = pd.factorize(ratings["movieId"], sort=True)
+        values = ratings["rating"].to_numpy(dtype=np.float64)
+        mean = 0.0 if implicit else float(values.mean())
+        by_user = sparse.csr_matrix(
+            (values - mean, (user_codes, item_codes)), shape=(len(user_keys), len(movie_ids))
+        )
+        by_item = by_user.T.tocsr()
+
+        rng = np.random.default_rng(seed)
+        user_factors = rng.normal(0, 0.1, (len(user_keys), factors))
+        item_factors = rng.normal(0, 0.1, (len(movie_ids), factors))
+        with ThreadPoolExecutor(workers or os.cpu_count()) as pool:
+            for _ in range(iterations):
+                for matrix, solved, fixed in ((by_user, user_factors, item_factors),
+                                              (by_item, item_factors, user_factors)):
+                    gram = fixed.T.dot(fixed) if implicit else None
+                    blocks = [np.arange(start, min(start + BLOCK_SIZE, matrix.shape[0]))
+                              for start in range(0, matrix.shape[0], BLOCK_SIZE)]
+
+                    def solve(rows, matrix=matrix, fixed=fixed, gram=gram):
+                        return rows, solve_rows(matrix, rows, fixed, regularization, implicit, gram)
+
+                    for rows, block in pool.map(solve, blocks):
+                        solved[rows] = block
+        return cls(
+            np.asarray(user_keys), np.asarray(movie_ids, dtype=np.int64),
+            user_factors.astype(np.float32), item_factors.astype(np.float32), mean, implicit,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a model written by save
+        """
+        with np.load(path) as data:
+            source = tuple(int(value) for value in data["source"]) if "source" in data else None
+            return cls(
+                data["user_keys"], data["movie_ids"], data["user_factors"], data["item_factors"],
+                float(data["mean"]), bool(data["implicit"]), source,
+            )
+
+    def save(self, path):
+        """
+        Writes the model to an .npz file, replacing any previous one atomically
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        staging = f"{path}.tmp{os.getpid()}.npz"
+        arrays = {
+            "user_keys": self.user_keys,
+            "movie_ids": self.movie_ids,
+            "user_factors": self.user_factors,
+            "item_factors": self.item_factors,
+            "mean": np.float64(self.mean),
+            "implicit": np.bool_(self.implicit),
+        }
+        if self.source is not None:
+            arrays["source"] = np.array(self.source, dtype=np.int64)
+        np.savez(staging, **arrays)
+        os.replace(staging, path)
+
+    @classmethod
+    def from_artifact(cls, root=None, version=None):
+        """
+        Memory-maps a model artifact, the current version by default
+        """
+        arrays, manifest = load_artifact(ALS_ARTIFACT, root, version)
+        metadata = manifest["metadata"]
+        source = tuple(metadata["source"]) if metadata.get("source") else None
+        return cls(
+            arrays["user_keys"], arrays["movie_ids"], arrays["user_factors"], arrays["item_factors"],
+            metadata["mean"], metadata["implicit"], source, manifest["version"],
+        )
+
+    def save_artifact(self, root=None, keep=None):
+        """
+        Saves the model as the next artifact version and returns it
+        """
+        arrays = {
+            "user_keys": self.user_keys,
+            "movie_ids": self.movie_ids,
+            "user_factors": self.user_factors,
+            "item_factors": self.item_factors,
+        }
+        metadata = {
+            "mean": float(self.mean),
+            "implicit": bool(self.implicit),
+            "source": list(self.source) if self.source is not None else None,
+        }
+        self.version = save_artifact(ALS_ARTIFACT, arrays, metadata, root, keep)
+        return self.version
+
+    def user_vector(self, user_key):
+        """
+        Factors of a user seen in training, or None
+        """
+        position = self.user_position.get_indexer([user_key])[0]
+        return None if position < 0 else self.user_factors[position]
+
+    def fold_in(self, movie_ids, ratings, regularization=DEFAULT_REGULARIZATION):
+        """
+        Factors of a user who was not in training, from their ratings, with one
+        solve against the fixed movie factors
+        """
+        # A movie rated twice counts with its last rating
+        latest = dict(zip(movie_ids, ratings))
+        items = self.item_position.get_indexer(list(latest))
+        known = items >= 0
+        if not known.any():
+            return None
+        values = np.fromiter(latest.values(), dtype=np.float64)[known] - self.mean
+        row = sparse.csr_matrix((values, (np.zeros(known.sum(), dtype=np.int64), items[known])),
+                                shape=(1, len(self.movie_ids)))
+        gram = self.item_factors.T.dot(self.item_factors) if self.implicit else None
+        return solve_rows(row, [0], self.item_factors.astype(np.float64), regularization,
+                          self.implicit, gram)[0].astype(np.float32)
+
+    def recommend_batch(self, user_vectors, n=10, exclude=None):
+        """
+        Top-n movie ids and predicted ratings for several users at once, with
+        one matrix product and an argpartition per row; exclude optionally
+        lists movie ids to skip for each user
+        """
+        scores = np.atleast_2d(user_vectors).dot(self.item_factors.T) + self.mean
+        if exclude is not None:
+            for row, movie_ids in enumerate(exclude):
+                items = self.item_position.get_indexer(list(movie_ids))
+                scores[row, items[items >= 0]] = -np.inf
+        n = min(n, scores.shape[1])
+        if n <= 0:
+            return [[] for _ in scores]
+        top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.lexsort((top, -top_scores))
+        top = np.take_along_axis(top, order, axis=1)
+        results = []
+        for row, items in zip(scores, top):
+            items = items[np.isfinite(row[items])]
+            results.append(list(zip(self.movie_ids[items].tolist(), row[items].tolist())))
+        return results
+
+    def recommend(self, user_vector, n=10, exclude=()):
+        """
+        Top-n movie ids and predicted ratings for one user
+        """
+        return self.recommend_batch(user_vector[None, :], n, [exclude])[0]
+
+
+def load_als(ratings_path, path=DEFAULT_ALS_PATH, **options):
+    """
+    The ALS model of a ratings file, read from path if it was trained on the
+    file as it is now, and trained and saved there otherwise
+    """
+    stat = os.stat(ratings_path)
+    if os.path.exists(path):
+        model = ALSModel.load(path)
+        if model.source == (stat.st_size, stat.st_mtime_ns):
+            return model
+    ratings = pd.read_csv(ratings_path, usecols=["userId", "movieId", "rating"])
+    model = ALSModel.fit(ratings, **options)
+    model.source = (stat.st_size, stat.st_mtime_ns)
+    try:
+        model.save(path)
+    except OSError:
+        # A read-only deployment still serves the model it just trained
+        pass
+    return model
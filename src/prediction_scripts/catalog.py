@@ -0,0 +1,406 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Movie catalog loaded once per process and shared by the search, the
+genre recommender and the new-user recommender.
+
+The catalog can be compiled into a binary columnar snapshot, which worker
+processes memory-map read-only instead of parsing the CSV file:
+
+    python src/prediction_scripts/catalog.py build [movies.csv] [snapshot dir]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+code_dir = os.path.dirname(scripts_dir)
+project_dir = os.path.dirname(code_dir)
+
+DEFAULT_MOVIES_PATH = os.path.join(project_dir, "data", "movies.csv")
+
+# Explicit column types so pandas does not infer wider ones
+CATALOG_DTYPES = {
+    "movieId": "int32",
+    "title": "object",
+    "genres": "category",
+    "imdb_id": "object",
+    "overview": "object",
+    "poster_path": "object",
+    "runtime": "float32",
+    "streaming_platforms": "object",
+}
+
+# Bumped whenever the snapshot layout changes so older snapshots are ignored
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MANIFEST = "manifest.json"
+
+
+def _read_only(array):
+    """
+    Marks a numpy array read-only and returns it
+    """
+    array.flags.writeable = False
+    return array
+
+
+def snapshot_path(movies_path):
+    """
+    Default snapshot directory of a movies CSV file, next to it
+    """
+    return os.path.splitext(movies_path)[0] + ".snapshot"
+
+
+class Catalog:
+    """
+    Movie columns with derived lookup arrays, shared read-only by their consumers
+
+    Columns of a snapshot stay memory-mapped, and its text columns other
+    than the titles are only decoded when first asked for.
+    """
+
+    # (size, mtime_ns) of the movies file the catalog was read from, if any
+    source = None
+
+    def __init__(self, columns, genre_names, genre_masks):
+        """
+        columns maps every column name to its values, or to a function
+        returning them for columns decoded on first use
+        """
+        self._columns = dict(columns)
+        self._frame = None
+        self._genre_matrix = None
+        self._imdb_movie_ids = None
+        self._movie_id_rows = None
+        self._lock = threading.Lock()
+
+        # Interned titles are stored once however many structures refer to them
+        titles = self.column("title")
+        self.titles = _read_only(np.array([sys.intern(title) for title in titles], dtype=object))
+        self._columns["title"] = self.titles
+        self.movie_ids = self.column("movieId")
+        self.genre_names = list(genre_names)
+        self.genre_masks = genre_masks
+
+        # Keep the first row for each title, and every row for the few duplicated titles
+        self.title_index = {}
+        self.duplicate_rows = {}
+        for row, title in enumerate(self.titles):
+            if title in self.title_index:
+                self.duplicate_rows.setdefault(title, [self.title_index[title]]).append(row)
+            else:
+                self.title_index[title] = row
+
+    @classmethod
+    def from_frame(cls, frame):
+        """
+        Builds the catalog from a movies frame read with CATALOG_DTYPES
+        """
+        frame = frame.drop_duplicates().reset_index(drop=True)
+
+        # Genre combinations are categorical, so each distinct string is split once
+        genre_sets = [set(genres.split("|")) for genres in frame["genres"].cat.categories]
+        genre_names = sorted(set().union(*genre_sets))
+        if len(genre_names) > 64:
+            raise ValueError(f"Too many genres for a bitmask index: {len(genre_names)}")
+        genre_bits = {genre: 1 << i for i, genre in enumerate(genre_names)}
+        dtype = np.uint32 if len(genre_names) <= 32 else np.uint64
+        category_masks = np.array(
+            [sum(genre_bits[genre] for genre in genres) for genres in genre_sets], dtype=dtype
+        )
+        codes = frame["genres"].cat.codes.to_numpy()
+        # Movies without genres have the code -1 and an empty mask
+        genre_masks = np.where(codes >= 0, category_masks[codes], 0).astype(dtype)
+
+        columns = {}
+        for name in frame.columns:
+            if isinstance(frame[name].dtype, pd.CategoricalDtype):
+                columns[name] = frame[name].array
+            else:
+                columns[name] = _read_only(frame[name].to_numpy(copy=True))
+        return cls(columns, genre_names, _read_only(genre_masks))
+
+    @classmethod
+    def from_csv(cls, path):
+        """
+        Parses a movies CSV file with the catalog's column types
+        """
+        header = pd.read_csv(path, nrows=0).columns
+        dtypes = {column: dtype for column, dtype in CATALOG_DTYPES.items() if column in header}
+        stat = os.stat(path)
+        catalog = cls.from_frame(pd.read_csv(path, dtype=dtypes))
+        catalog.source = (stat.st_size, stat.st_mtime_ns)
+        return catalog
+
+    @classmethod
+    def from_snapshot(cls, path):
+        """
+        Memory-maps a snapshot written by build_snapshot
+        """
+        with open(os.path.join(path, SNAPSHOT_MANIFEST), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+        if manifest["version"] != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported catalog snapshot version: {manifest['version']}")
+
+        def load(name):
+            return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+
+        columns = {}
+        for name, kind in manifest["columns"].items():
+            if kind == "numeric":
+                columns[name] = load(name)
+            elif kind == "category":
+                columns[name] = _categories(load(name + ".codes"), manifest["categories"][name])
+            else:
+                columns[name] = _strings(
+                    load(name + ".offsets"), load(name + ".heap"), load(name + ".valid")
+                )
+        catalog = cls(columns, manifest["genre_names"], load("genre_masks"))
+        catalog.source = (manifest["source_size"], manifest["source_mtime_ns"])
+        return catalog
+
+    def __len__(self):
+        return len(self.titles)
+
+    def column(self, name):
+        """
+        Values of one catalog column, decoded on first use
+        """
+        values = self._columns[name]
+        if callable(values):
+            with self._lock:
+                values = self._columns[name]
+                if callable(values):
+                    values = self._columns[name] = values()
+        return values
+
+    @property
+    def frame(self):
+        """
+        Shallow copy of the catalog frame; consumers may add columns but must not edit values
+        """
+        if self._frame is None:
+            frame = pd.DataFrame({name: self.column(name) for name in list(self._columns)})
+            with self._lock:
+                if self._frame is None:
+                    self._frame = frame
+        return self._frame.copy(deep=False)
+
+    def rows_of(self, title):
+        """
+        Every catalog row holding the given title
+        """
+        return self.duplicate_rows.get(title, [self.title_index[title]])
+
+    def imdb_movie_ids(self):
+        """
+        Catalog movie id of every imdb id, built on first use
+        """
+        if self._imdb_movie_ids is None:
+            self._imdb_movie_ids = {
+                imdb_id: movie_id
+                for imdb_id, movie_id in zip(self.column("imdb_id"), self.movie_ids.tolist())
+                if isinstance(imdb_id, str)
+            }
+        return self._imdb_movie_ids
+
+    def rows_of_movie_ids(self, movie_ids):
+        """
+        First catalog row of each movie id, or -1 for ids not in the catalog
+        """
+        if self._movie_id_rows is None:
+            rows = pd.Series(np.arange(len(self)), index=self.movie_ids)
+            self._movie_id_rows = rows[~rows.index.duplicated()]
+        return self._movie_id_rows.reindex(movie_ids).fillna(-1).to_numpy(dtype=np.int64)
+
+    def genre_matrix(self):
+        """
+        Movies x genres one-hot matrix of floats, built on first use
+        """
+        if self._genre_matrix is None:
+            with self._lock:
+                if self._genre_matrix is None:
+                    bits = np.arange(len(self.genre_names), dtype=self.genre_masks.dtype)
+                    matrix = (self.genre_masks[:, None] >> bits) & 1
+                    self._genre_matrix = _read_only(matrix.astype(np.float64))
+        return self._genre_matrix
+
+    def memory_usage(self):
+        """
+        Bytes held by the decoded columns and by each derived array; memory-mapped
+        columns are included although their pages are shared between processes
+        """
+        frame = 0
+        for values in self._columns.values():
+            if not callable(values):
+                frame += int(pd.Series(values, copy=False).memory_usage(deep=True, index=False))
+        usage = {
+            "frame": frame,
+            "titles": int(self.titles.nbytes),
+            "movie_ids": int(self.movie_ids.nbytes),
+            "genre_masks": int(self.genre_masks.nbytes),
+            "title_index": sys.getsizeof(self.title_index),
+            "genre_matrix": 0 if self._genre_matrix is None else int(self._genre_matrix.nbytes),
+        }
+        usage["total"] = sum(usage.values())
+        return usage
+
+
+def _categories(codes, categories):
+    """
+    Deferred decoding of a categorical snapshot column
+    """
+    return lambda: pd.Categorical.from_codes(np.asarray(codes), categories)
+
+
+def _strings(offsets, heap, valid):
+    """
+    Deferred decoding of a text snapshot column stored as a UTF-8 heap with row offsets
+    """
+
+    def decode():
+        raw = heap.tobytes()
+        bounds = offsets.tolist()
+        values = np.array(
+            [raw[start:end].decode("utf-8") for start, end in zip(bounds, bounds[1:])],
+            dtype=object,
+        )
+        values[~np.asarray(valid)] = np.nan
+        return _read_only(values)
+
+    return decode
+
+
+def build_snapshot(movies_path=DEFAULT_MOVIES_PATH, path=None):
+    """
+    Compiles a movies CSV file into a snapshot directory: one .npy file per
+    numeric column, codes of categorical columns, a UTF-8 heap with row
+    offsets per text column, the genre bitmasks and a JSON manifest
+    """
+    path = path or snapshot_path(movies_path)
+    catalog = Catalog.from_csv(movies_path)
+    staging = f"{path}.tmp{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    def save(name, array):
+        np.save(os.path.join(staging, name + ".npy"), np.ascontiguousarray(array))
+
+    columns = {}
+    categories = {}
+    for name in catalog.frame.columns:
+        values = catalog.column(name)
+        if isinstance(values, pd.Categorical):
+            columns[name] = "category"
+            categories[name] = [str(category) for category in values.categories]
+            save(name + ".codes", values.codes)
+        elif values.dtype != object:
+            columns[name] = "numeric"
+            save(name, values)
+        else:
+            columns[name] = "text"
+            valid = pd.notna(values)
+            encoded = [str(value).encode("utf-8") if ok else b"" for value, ok in zip(values, valid)]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            save(name + ".offsets", offsets)
+            save(name + ".heap", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+            save(name + ".valid", valid)
+    save("genre_masks", catalog.genre_masks)
+
+    source = os.stat(movies_path)
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "rows": len(catalog),
+        "source_size": source.st_size,
+        "source_mtime_ns": source.st_mtime_ns,
+        "columns": columns,
+        "categories": categories,
+        "genre_names": catalog.genre_names,
+    }
+    with open(os.path.join(staging, SNAPSHOT_MANIFEST), "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+
+    # Processes still mapping the old files keep reading them after they are unlinked
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(staging, path)
+    return path
+
+
+def snapshot_is_current(movies_path, path):
+    """
+    Whether a snapshot was built from the movies file as it is now, or the file is gone
+    """
+    try:
+        with open(os.path.join(path, SNAPSHOT_MANIFEST), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return False
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        return False
+    if not os.path.exists(movies_path):
+        return True
+    source = os.stat(movies_path)
+    return (source.st_size, source.st_mtime_ns) == (
+        manifest["source_size"],
+        manifest["source_mtime_ns"],
+    )
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(path=DEFAULT_MOVIES_PATH):
+    """
+    The process-wide catalog for a movies file, memory-mapped from its snapshot
+    when that is up to date and parsed from the file otherwise
+    """
+    key = os.path.realpath(path)
+    catalog = _catalogs.get(key)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.get(key)
+            if catalog is None:
+                snapshot = snapshot_path(key)
+                if snapshot_is_current(key, snapshot):
+                    catalog = Catalog.from_snapshot(snapshot)
+                else:
+                    catalog = Catalog.from_csv(key)
+                _catalogs[key] = catalog
+    return catalog
+
+
+def max_rss_bytes():
+    """
+    Peak resident set size of this process, or None where it cannot be read
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Movie catalog tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="compile a movies CSV file into a snapshot")
+    build.add_argument("movies_path", nargs="?", default=DEFAULT_MOVIES_PATH)
+    build.add_argument("snapshot_path", nargs="?", default=None)
+    args = parser.parse_args()
+    print(f"Wrote {build_snapshot(args.movies_path, args.snapshot_path)}")
@@ -0,0 +1,215 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Content embeddings of the movie catalog: stemmed TF-IDF over the title,
+genres and overview of every movie, reduced by truncated SVD, with an
+inverted-file (IVF) index for approximate nearest-neighbour lookups.
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+DEFAULT_DIMENSIONS = 64
+DEFAULT_MAX_FEATURES = 5000
+
+# Lists scanned per query; more lists raise recall and latency together
+DEFAULT_PROBES = 16
+
+DEFAULT_KMEANS_ITERATIONS = 10
+
+# Rows assigned to centroids together while clustering
+BLOCK_SIZE = 4096
+
+
+def stemmed_analyzer(stemmer):
+    """
+    Tokenizer that lowercases, drops English stop words and stems, caching
+    the stem of every distinct token
+    """
+    analyzer = CountVectorizer(stop_words="english").build_analyzer()
+    stems = {}
+
+    def analyze(document):
+        tokens = []
+        for token in analyzer(document):
+            stem = stems.get(token)
+            if stem is None:
+                stem = stems[token] = stemmer.stem(token)
+            tokens.append(stem)
+        return tokens
+
+    return analyze
+
+
+def movie_documents(catalog):
+    """
+    Text of every catalog row: its title, genres and overview
+    """
+    documents = []
+    for title, genres, overview in zip(
+        catalog.titles, catalog.column("genres"), catalog.column("overview")
+    ):
+        parts = [title, "" if pd.isna(genres) else str(genres).replace("|", " ")]
+        if isinstance(overview, str):
+            parts.append(overview)
+        documents.append(" ".join(parts))
+    return documents
+
+
+def embed_documents(documents, stemmer, dimensions=DEFAULT_DIMENSIONS,
+                    max_features=DEFAULT_MAX_FEATURES, seed=0):
+    """
+    Unit-length float32 embeddings of some documents, shape (documents, dimensions)
+    """
+    vectorizer = TfidfVectorizer(
+        analyzer=stemmed_analyzer(stemmer), max_features=max_features, sublinear_tf=True
+    )
+    tfidf = vectorizer.fit_transform(documents)
+    dimensions = min(dimensions, tfidf.shape[1] - 1)
+    vectors = TruncatedSVD(dimensions, random_state=seed).fit_transform(tfidf)
+    return normalize(vectors.astype(np.float32))
+
+
+def normalize(vectors):
+    """
+    Rows scaled to unit length; zero rows stay zero
+    """
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def top_k(candidates, scores, k):
+    """
+    The k best candidates and their scores, best first, ties by candidate
+    """
+    k = min(k, int(np.count_nonzero(np.isfinite(scores))))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.lexsort((candidates[best], -scores[best]))]
+    return candidates[best], scores[best]
+
+
+def exact_search(vectors, query, k=10, exclude=()):
+    """
+    Rows of the k vectors with the highest cosine similarity to a unit query,
+    and their similarities, by scanning every vector
+    """
+    scores = vectors.dot(query)
+    scores[list(exclude)] = -np.inf
+    return top_k(np.arange(len(vectors)), scores, k)
+
+
+class IVFIndex:
+    """
+    Vectors clustered by spherical k-means; a query only scans the lists of
+    its closest centroids
+    """
+
+    def __init__(self, centroids, order, offsets, list_vectors):
+        """
+        List i holds rows order[offsets[i]:offsets[i + 1]], whose vectors are
+        stored contiguously at the same positions of list_vectors
+        """
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.list_vectors = list_vectors
+
+    @classmethod
+    def build(cls, vectors, n_lists=None, iterations=DEFAULT_KMEANS_ITERATIONS, seed=0):
+        """
+        Clusters unit vectors into n_lists lists, about the square root of their count by default
+        """
+        n = len(vectors)
+        n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n, n_lists, replace=False)].copy()
+        assignment = np.zeros(n, dtype=np.int64)
+        for _ in range(iterations):
+            assignment = cls._assign(vectors, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, vectors)
+            empty = ~sums.any(axis=1)
+            # Reseed empty lists with random vectors so every list keeps a centroid
+            sums[empty] = vectors[rng.choice(n, int(empty.sum()))]
+            centroids = normalize(sums)
+        assignment = cls._assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.concatenate([[0], np.bincount(assignment, minlength=n_lists).cumsum()])
+        return cls(centroids, order, offsets, vectors[order])
+
+    @staticmethod
+    def _assign(vectors, centroids):
+        """
+        Closest centroid of every vector, a block of vectors at a time
+        """
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), BLOCK_SIZE):
+            block = vectors[start:start + BLOCK_SIZE]
+            assignment[start:start + BLOCK_SIZE] = block.dot(centroids.T).argmax(axis=1)
+        return assignment
+
+    def __len__(self):
+        return len(self.order)
+
+    @property
+    def n_lists(self):
+        """
+        Number of inverted lists, one per centroid
+        """
+        return len(self.centroids)
+
+    def search(self, query, k=10, n_probe=DEFAULT_PROBES, exclude=()):
+        """
+        Approximate rows of the k vectors closest to a unit query and their
+        similarities, scanning the n_probe lists with the closest centroids
+        """
+        n_probe = max(1, min(n_probe, self.n_lists))
+        probed = np.argpartition(-self.centroids.dot(query), n_probe - 1)[:n_probe]
+        positions = np.concatenate(
+            [np.arange(self.offsets[i], self.offsets[i + 1]) for i in probed]
+        )
+        candidates = self.order[positions]
+        scores = self.list_vectors[positions].dot(query)
+        if len(exclude):
+            scores[np.isin(candidates, list(exclude))] = -np.inf
+        return top_k(candidates, scores, k)
+
+
+class MovieEmbeddings:
+    """
+    Content embedding of every row of one catalog, with an IVF index over them
+    """
+
+    def __init__(self, catalog, vectors, index):
+        """
+        vectors holds the embedding of every catalog row, scaled to unit length,
+        and index is an IVFIndex over them
+        """
+        self.catalog = catalog
+        self.vectors = vectors
+        self.index = index
+
+    @classmethod
+    def build(cls, catalog, stemmer, dimensions=DEFAULT_DIMENSIONS, n_lists=None, seed=0):
+        """
+        Embeds the movies of a catalog and indexes them
+        """
+        vectors = embed_documents(movie_documents(catalog), stemmer, dimensions, seed=seed)
+        return cls(catalog, vectors, IVFIndex.build(vectors, n_lists, seed=seed))
+
+    def similar(self, row, k=10, n_probe=DEFAULT_PROBES, exclude=()):
+        """
+        Catalog rows of the k movies most similar in content to a row and their
+        similarities, approximately unless n_probe is None
+        """
+        if n_probe is None:
+            return exact_search(self.vectors, self.vectors[row], k, exclude)
+        return self.index.search(self.vectors[row], k, n_probe, exclude)
@@ -0,0 +1,305 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Item-item collaborative filtering over data/ratings.csv: the most similar
+movies of every movie by cosine similarity of their rating vectors.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_NEIGHBORS_PATH = os.path.join(scripts_dir, "artifacts", "item_neighbors.npz")
+
+# Neighbours kept per movie
+DEFAULT_K = 50
+
+# Movies whose similarities are computed together; bounds the dense block at
+# BLOCK_SIZE x movies floats
+BLOCK_SIZE = 512
+
+
+def read_ratings(path):
+    """
+    Reads a ratings CSV file with compact column types
+    """
+    return pd.read_csv(
+        path,
+        usecols=["userId", "movieId", "rating", "timestamp"],
+        dtype={"userId": "int32", "movieId": "int32", "rating": "float32", "timestamp": "int64"},
+    )
+
+
+def rating_matrix(ratings):
+    """
+    Sparse movies x users CSR matrix of a ratings frame, with the movie id of every row
+    """
+    # A user rating the same movie twice counts with the latest rating
+    ratings = ratings.sort_values("timestamp").drop_duplicates(["userId", "movieId"], keep="last")
+    item_codes, movie_ids = pd.factorize(ratings["movieId"], sort=True)
+    user_codes, users = pd.factorize(ratings["userId"])
+    matrix = sparse.csr_matrix(
+        (ratings["rating"].to_numpy(dtype=np.float32), (item_codes, user_codes)),
+        shape=(len(movie_ids), len(users)),
+    )
+    return matrix, np.asarray(movie_ids, dtype=np.int64)
+
+
+def normalize_rows(matrix):
+    """
+    Rows of a sparse matrix scaled to unit length, as float32 CSR
+    """
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).dot(matrix).tocsr().astype(np.float32)
+
+
+def best_first(top, top_scores):
+    """
+    Sorts (rows, k) neighbour and score arrays best first, ties by neighbour,
+    with -1 and a score of 0 for neighbours that are not similar at all
+    """
+    order = np.lexsort((top, -top_scores))
+    top = np.take_along_axis(top, order, axis=-1)
+    top_scores = np.take_along_axis(top_scores, order, axis=-1)
+    return np.where(top_scores > 0, top, -1), np.where(top_scores > 0, top_scores, 0)
+
+
+def top_k_neighbors(matrix, k=DEFAULT_K, block_size=BLOCK_SIZE):
+    """
+    Top-k cosine neighbours of every row of a sparse matrix, computed a block
+    of rows at a time so the full rows x rows similarity matrix never exists
+
+    Returns (neighbors, scores), both of shape (rows, k), best first; missing
+    neighbours are -1 with a score of 0
+    """
+    n_items = matrix.shape[0]
+    normalized = normalize_rows(matrix)
+    transposed = normalized.T.tocsr()
+
+    k = min(k, n_items - 1)
+    neighbors = np.full((n_items, max(k, 0)), -1, dtype=np.int32)
+    scores = np.zeros((n_items, max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return neighbors, scores
+    for start in range(0, n_items, block_size):
+        stop = min(start + block_size, n_items)
+        block = normalized[start:stop].dot(transposed).toarray()
+        # A movie is not its own neighbour
+        block[np.arange(stop - start), np.arange(start, stop)] = 0
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        neighbors[start:stop], scores[start:stop] = best_first(
+            top, np.take_along_axis(block, top, axis=1)
+        )
+    return neighbors, scores
+
+
+class ItemNeighbors:
+    """
+    Table of the k most similar movies of every rated movie
+    """
+
+    def __init__(self, movie_ids, neighbors, scores, source=None, version=0):
+        """
+        neighbors holds positions in movie_ids; source is the (size, mtime_ns)
+        of the ratings file the table was built from, and version counts the
+        incremental updates applied since
+        """
+        self.movie_ids = movie_ids
+        self.neighbors = neighbors
+        self.scores = scores
+        self.source = source
+        self.version = version
+        self.position = pd.Index(movie_ids)
+
+    @classmethod
+    def build(cls, ratings_path, k=DEFAULT_K, block_size=BLOCK_SIZE):
+        """
+        Computes the table from a ratings CSV file
+        """
+        matrix, movie_ids = rating_matrix(read_ratings(ratings_path))
+        neighbors, scores = top_k_neighbors(matrix, k, block_size)
+        stat = os.stat(ratings_path)
+        return cls(movie_ids, neighbors, scores, (stat.st_size, stat.st_mtime_ns))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a table written by save
+        """
+        with np.load(path) as data:
+            source = tuple(int(value) for value in data["source"]) if "source" in data else None
+            return cls(data["movie_ids"], data["neighbors"], data["scores"], source)
+
+    def save(self, path):
+        """
+        Writes the table to an .npz file, replacing any previous one atomically
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        staging = f"{path}.tmp{os.getpid()}.npz"
+        arrays = {"movie_ids": self.movie_ids, "neighbors": self.neighbors, "scores": self.scores}
+        if self.source is not None:
+            arrays["source"] = np.array(self.source, dtype=np.int64)
+        np.savez(staging, **arrays)
+        os.replace(staging, path)
+
+    def similar(self, movie_id):
+        """
+        Movie ids and similarities of the neighbours of a movie, best first
+        """
+        position = self.position.get_indexer([movie_id])[0]
+        if position < 0:
+            return np.empty(0, dtype=self.movie_ids.dtype), np.empty(0, dtype=np.float32)
+        valid = self.neighbors[position] >= 0
+        return self.movie_ids[self.neighbors[position][valid]], self.scores[position][valid]
+
+    def aligned(self, catalog):
+        """
+        The table re-indexed by catalog row: (rows, k) arrays of neighbour rows
+        (-1 where missing) and similarities, for O(k) lookups while serving
+        """
+        # Rated movies missing from the catalog are dropped; duplicated ids use their first row
+        row_of_item = catalog.rows_of_movie_ids(self.movie_ids)
+        item_of_row = self.position.get_indexer(catalog.movie_ids)
+
+        k = self.neighbors.shape[1]
+        rows = np.full((len(catalog), k), -1, dtype=np.int32)
+        scores = np.zeros((len(catalog), k), dtype=np.float32)
+        rated = item_of_row >= 0
+        items = self.neighbors[item_of_row[rated]]
+        mapped = np.where(items >= 0, row_of_item[items], -1)
+        rows[rated] = mapped
+        scores[rated] = np.where(mapped >= 0, self.scores[item_of_row[rated]], 0)
+        return rows, scores
+
+
+def load_neighbors(ratings_path, path=DEFAULT_NEIGHBORS_PATH, k=DEFAULT_K):
+    """
+    The neighbour table of a ratings file, read from path if it was built
+    from the file as it is now, and rebuilt and saved there otherwise
+    """
+    stat = os.stat(ratings_path)
+    if os.path.exists(path):
+        table = ItemNeighbors.load(path)
+        if table.source == (stat.st_size, stat.st_mtime_ns) and table.neighbors.shape[1] == k:
+            return table
+    table = ItemNeighbors.build(ratings_path, k)
+    try:
+        table.save(path)
+    except OSError:
+        # A read-only deployment still serves the table it just built
+        pass
+    return table
+
+
+class IncrementalNeighbors:
+    """
+    The rating matrix behind a neighbour table, to update the table as new
+    ratings arrive without recomputing every movie's neighbours
+    """
+
+    def __init__(self, matrix, users, table):
+        """
+        matrix is the movies x users rating matrix the table was built from,
+        and users the key of each of its columns
+        """
+        self.matrix = matrix.tocsr().astype(np.float32)
+        self.table = table
+        self.k = table.neighbors.shape[1]
+        self.items = {movie_id: item for item, movie_id in enumerate(table.movie_ids.tolist())}
+        self.users = {user: code for code, user in enumerate(users)}
+
+    @classmethod
+    def from_csv(cls, ratings_path, table):
+        """
+        Rebuilds the rating matrix of a table from the ratings file it came from
+        """
+        ratings = read_ratings(ratings_path)
+        matrix, movie_ids = rating_matrix(ratings)
+        if not np.array_equal(movie_ids, table.movie_ids):
+            raise ValueError(f"Neighbour table was not built from {ratings_path}")
+        # Same column order as rating_matrix
+        users = pd.factorize(
+            ratings.sort_values("timestamp").drop_duplicates(["userId", "movieId"], keep="last")["userId"]
+        )[1]
+        return cls(matrix, users.tolist(), table)
+
+    def apply(self, users, movie_ids, ratings):
+        """
+        Adds or replaces ratings, one per (user, movie), and returns the next
+        version of the neighbour table; the previous table is left untouched
+        """
+        latest = {}
+        for user, movie_id, rating in zip(users, movie_ids, ratings):
+            item = self.items.setdefault(movie_id, len(self.items))
+            code = self.users.setdefault(user, len(self.users))
+            latest[item, code] = rating
+        if not latest:
+            return self.table
+
+        shape = (len(self.items), len(self.users))
+        if shape != self.matrix.shape:
+            self.matrix.resize(shape)
+        rows, columns = (np.array(axis, dtype=np.int64) for axis in zip(*latest))
+        values = np.array(list(latest.values()), dtype=np.float32)
+        previous = np.asarray(self.matrix[rows, columns]).ravel()
+        self.matrix = (self.matrix + sparse.csr_matrix((values - previous, (rows, columns)), shape=shape)).tocsr()
+
+        touched = np.unique(rows)
+        neighbors, scores = self._update_neighbors(touched)
+        movie_ids = np.array(sorted(self.items, key=self.items.get), dtype=self.table.movie_ids.dtype)
+        self.table = ItemNeighbors(
+            movie_ids, neighbors, scores, self.table.source, self.table.version + 1
+        )
+        return self.table
+
+    def _update_neighbors(self, touched):
+        """
+        Neighbour lists after the ratings of the touched movies changed: those
+        movies are recomputed, and every other list only takes in their new
+        similarities, unless that could let an unlisted movie in
+        """
+        n_items, k = self.matrix.shape[0], self.k
+        old_neighbors, old_scores = self.table.neighbors, self.table.scores
+        neighbors = np.full((n_items, k), -1, dtype=np.int32)
+        scores = np.zeros((n_items, k), dtype=np.float32)
+        neighbors[:len(old_neighbors)] = old_neighbors
+        scores[:len(old_scores)] = old_scores
+
+        normalized = normalize_rows(self.matrix)
+        transposed = normalized.T.tocsr()
+        # Row t of the similarity matrix is also its column t
+        changed = normalized[touched].dot(transposed).toarray()
+        changed[np.arange(len(touched)), touched] = 0
+        top = np.argpartition(-changed, k - 1, axis=1)[:, :k]
+        neighbors[touched], scores[touched] = best_first(top, np.take_along_axis(changed, top, axis=1))
+
+        is_touched = np.zeros(n_items, dtype=bool)
+        is_touched[touched] = True
+        lists_touched = (neighbors >= 0) & is_touched[np.maximum(neighbors, 0)]
+        affected = np.flatnonzero(changed.any(axis=0) | lists_touched.any(axis=1))
+        for item in affected[~is_touched[affected]].tolist():
+            listed = neighbors[item]
+            keep = (listed >= 0) & ~lists_touched[item]
+            candidates = np.concatenate([listed[keep], touched])
+            candidate_scores = np.concatenate([scores[item][keep], changed[:, item]])
+            row, row_scores = best_first(candidates[None, :], candidate_scores[None, :])
+            row, row_scores = row[0, :k], row_scores[0, :k]
+            if listed[-1] >= 0 and (len(row) < k or row[-1] < 0 or row_scores[-1] < scores[item][-1]):
+                # A movie outside the old list may now be among the k best
+                similarity = normalized[item].dot(transposed).toarray()
+                similarity[0, item] = 0
+                best = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+                row, row_scores = best_first(best, np.take_along_axis(similarity, best, axis=1))
+                row, row_scores = row[0], row_scores[0]
+            neighbors[item] = -1
+            scores[item] = 0
+            neighbors[item, :len(row)] = row
+            scores[item, :len(row)] = row_scores
+        return neighbors, scores
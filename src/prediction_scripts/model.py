@@ -1,71 +1,443 @@
+import json
+import os
+import sys
+import threading
 import numpy as np
-import pandas as pd
-import pickle
-import nltk
-from nltk.stem import PorterStemmer
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from prediction_scripts.catalog import get_catalog
+from prediction_scripts.model_store import ArtifactError, load_artifact, save_artifact, source_of
+
+# Lookup table used to count set bits byte by byte when numpy has no bitwise_count
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# Ways recommend_many can merge the scores of several input movies
+AGGREGATIONS = ('max', 'sum', 'rank')
+
+# Smoothing constant of reciprocal rank fusion
+RANK_FUSION_K = 60
+
+# Weight of a rating neighbour's cosine similarity against one shared genre
+CF_WEIGHT = 2.0
+
+RECOMMENDER_ARTIFACT = "recommender"
+
+
+def popcount(values, out=None):
+    """
+    Count the set bits of every element of an unsigned integer array,
+    optionally writing the counts into out
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values, out=out)
+    as_bytes = values.view(np.uint8).reshape(values.shape + (values.itemsize,))
+    return _POPCOUNT_TABLE[as_bytes].sum(axis=-1, dtype=np.uint8, out=out)
+
+
+class CatalogNeighbors:
+    """
+    Rating neighbours of every catalog row, aligned with one catalog
+    """
+
+    def __init__(self, catalog, table, rows=None, scores=None, high_water=0):
+        """
+        rows and scores are the table aligned with the catalog, when already known;
+        high_water is the idRatings of the last review added to the table, or
+        None if it had updates not numbered by the Ratings table
+        """
+        self.catalog = catalog
+        self.table = table
+        self.high_water = high_water
+        if rows is None:
+            rows, scores = table.aligned(catalog)
+        self.rows, self.scores = rows, scores
+
+    def add_scores(self, scores, row):
+        """
+        Adds the weighted similarity of the neighbours of a row to its scores, in O(k)
+        """
+        neighbors = self.rows[row]
+        valid = neighbors >= 0
+        scores[neighbors[valid]] += CF_WEIGHT * self.scores[row][valid]
+
 
 class MovieRecommender:
     def __init__(self):
+        # nltk and scikit-learn are slow to import, so only load them with a recommender
+        from nltk.stem import PorterStemmer  # pylint: disable=import-outside-toplevel
+        from sklearn.feature_extraction.text import CountVectorizer  # pylint: disable=import-outside-toplevel
+
         self.ps = PorterStemmer()
         self.cv = CountVectorizer(max_features=5000, stop_words='english')
-        
-        
+        self.index = None
+        self.cf = None
+        self.ratings_path = None
+        # Scratch arrays reused across calls, one set per thread
+        self._local = threading.local()
+        # Rating matrix kept for incremental updates, built on the first one
+        self._incremental = None
+        self._update_lock = threading.Lock()
+        # Content embeddings of the current index, built on the first similar_movies call
+        self._embeddings = None
+        self._embeddings_lock = threading.Lock()
+        # Version of the artifact the recommender was loaded from, if any
+        self.artifact_version = None
+
+
     def prepare_data(self, movies_path, ratings_path=None):
         """
         Prepare and process the movie data for recommendation
-        
+
         Parameters:
         movies_path (str): Path to movies CSV file
         ratings_path (str): Optional path to ratings CSV file for hybrid recommendations
         """
-        # Load and preprocess movies data
-        self.movies = pd.read_csv(movies_path)
-        self.movies = self.movies.drop_duplicates()
+        # The shared catalog holds the genre bitmasks and title lookups used for scoring
+        catalog = get_catalog(movies_path)
+        cf = None
+        if ratings_path is not None:
+            # scipy is only needed when ratings are blended in
+            from prediction_scripts.item_cf import load_neighbors  # pylint: disable=import-outside-toplevel
+            cf = CatalogNeighbors(catalog, load_neighbors(ratings_path))
+        self._publish(catalog, cf, ratings_path)
+
+    def _publish(self, catalog, cf, ratings_path, embeddings=None, version=None):
+        """
+        Swaps in a new catalog and the structures built for it
+        """
+        with self._update_lock:
+            self.cf = cf
+            self.ratings_path = ratings_path
+            self._embeddings = embeddings
+            self.artifact_version = version
+            # Publish the new index with a single assignment so readers never see a mix
+            self.index = catalog
+
+    def save_artifact(self, movies_path, root=None, keep=None):
+        """
+        Save the rating neighbours and content embeddings as the next version
+        of the recommender artifact
+
+        Parameters:
+        movies_path (str): Path to the movies CSV file the recommender was prepared with
+        root (str): Optional artifacts directory
+        keep (int): Optional number of versions to keep on disk
+
+        Returns:
+        int: Version of the saved artifact
+        """
+        index = self.index
+        embeddings = self._content(index)
+        arrays = {
+            "embedding_vectors": embeddings.vectors,
+            "ivf_centroids": embeddings.index.centroids,
+            "ivf_order": embeddings.index.order,
+            "ivf_offsets": embeddings.index.offsets,
+            "ivf_vectors": embeddings.index.list_vectors,
+        }
+        metadata = {"rows": len(index), "movies_source": source_of(movies_path), "ratings_source": None}
+        cf = self._neighbors(index)
+        if cf is not None:
+            arrays.update(
+                neighbor_movie_ids=cf.table.movie_ids,
+                neighbors=cf.table.neighbors,
+                neighbor_scores=cf.table.scores,
+                neighbor_rows=cf.rows,
+                neighbor_row_scores=cf.scores,
+            )
+            metadata["ratings_source"] = list(cf.table.source) if cf.table.source else None
+        version = save_artifact(RECOMMENDER_ARTIFACT, arrays, metadata, root, keep)
+        self.artifact_version = version
+        return version
+
+    def load_artifact(self, movies_path, ratings_path=None, root=None, version=None):
+        """
+        Swap in a saved version of the recommender artifact, memory-mapped
+
+        Parameters:
+        movies_path (str): Path to the movies CSV file the artifact was built from
+        ratings_path (str): Optional path to the ratings CSV file, for incremental updates
+        root (str): Optional artifacts directory
+        version (int): Version to load, the current one by default
+
+        Returns:
+        int: Version now in use
+        """
+        from prediction_scripts.embeddings import IVFIndex, MovieEmbeddings  # pylint: disable=import-outside-toplevel
+        from prediction_scripts.item_cf import ItemNeighbors  # pylint: disable=import-outside-toplevel
+
+        arrays, manifest = load_artifact(RECOMMENDER_ARTIFACT, root, version)
+        metadata = manifest["metadata"]
+        catalog = get_catalog(movies_path)
+        movies_source = source_of(movies_path)
+        if len(catalog) != metadata["rows"] or movies_source not in (None, metadata["movies_source"]):
+            raise ArtifactError(f"Recommender artifact v{manifest['version']} was built from other movies")
+
+        cf = None
+        if "neighbors" in arrays:
+            source = metadata["ratings_source"]
+            table = ItemNeighbors(
+                arrays["neighbor_movie_ids"], arrays["neighbors"], arrays["neighbor_scores"],
+                tuple(source) if source else None,
+            )
+            cf = CatalogNeighbors(catalog, table, arrays["neighbor_rows"], arrays["neighbor_row_scores"])
+        index = IVFIndex(arrays["ivf_centroids"], arrays["ivf_order"], arrays["ivf_offsets"], arrays["ivf_vectors"])
+        embeddings = MovieEmbeddings(catalog, arrays["embedding_vectors"], index)
+        self._publish(catalog, cf, ratings_path if cf is not None else None, embeddings, manifest["version"])
+        return manifest["version"]
+
+    @property
+    def movies(self):
+        """
+        Frame of the catalog the recommender was prepared with
+        """
+        return self.index.frame
+
+    @property
+    def model_version(self):
+        """
+        Identifies the catalog, artifact and rating neighbours in use, for
+        caching results; it changes whenever recommendations may, and is the
+        same in every process serving the same data
+        """
+        index = self.index
+        cf = self._neighbors(index)
+        ratings = None
+        if cf is not None:
+            high_water = cf.high_water
+            if high_water is None:
+                # Updates not numbered by the Ratings table only exist in this recommender
+                high_water = f"{os.getpid()}.{id(self)}.{cf.table.version}"
+            ratings = [cf.table.source, high_water]
+        identity = [index.source, self.artifact_version, ratings]
+        return json.dumps(identity, separators=(',', ':'))
+
+    def _neighbors(self, index):
+        """
+        Rating neighbours of the catalog rows, if they were built for this index
+        """
+        cf = self.cf
+        return cf if cf is not None and cf.catalog is index else None
+
+    def update_ratings(self, user_keys, movie_ids, ratings, high_water=None):
+        """
+        Add new ratings to the rating neighbours without rebuilding them
+
+        Parameters:
+        user_keys (list): Raters, which must not collide with the user ids of the ratings file
+        movie_ids (list): Rated movie ids of the catalog
+        ratings (list): Ratings on the scale of the ratings file
+        high_water (int): Optional idRatings of the last review among them, which
+            lets processes that fed the same reviews share cached results
+
+        Returns:
+        int: Version of the neighbour table now in use
+        """
+        with self._update_lock:
+            cf = self.cf
+            if cf is None:
+                raise ValueError("The recommender was prepared without ratings")
+            if self._incremental is None or self._incremental.table is not cf.table:
+                from prediction_scripts.item_cf import IncrementalNeighbors  # pylint: disable=import-outside-toplevel
+                self._incremental = IncrementalNeighbors.from_csv(self.ratings_path, cf.table)
+            table = self._incremental.apply(user_keys, movie_ids, ratings)
+            if table is cf.table:
+                return table.version
+            if cf.high_water is None:
+                high_water = None
+            # Swap the new version in with a single assignment, readers keep the one they hold
+            self.cf = CatalogNeighbors(cf.catalog, table, high_water=high_water)
+            return table.version
+
+    def _content(self, index):
+        """
+        Content embeddings of the catalog rows, built once per index
+        """
+        embeddings = self._embeddings
+        if embeddings is None or embeddings.catalog is not index:
+            with self._embeddings_lock:
+                embeddings = self._embeddings
+                if embeddings is None or embeddings.catalog is not index:
+                    from prediction_scripts.embeddings import MovieEmbeddings  # pylint: disable=import-outside-toplevel
+                    embeddings = self._embeddings = MovieEmbeddings.build(index, self.ps)
+        return embeddings
+
+    def similar_movies(self, movie_title, n_recommendations=10, n_probe=16):
+        """
+        Get the movies closest in content, from their title, genres and overview
+
+        Parameters:
+        movie_title (str): Title of the movie to find similar movies for
+        n_recommendations (int): Number of similar movies to return
+        n_probe (int): Index lists scanned; None compares against every movie exactly
+
+        Returns:
+        list: List of similar movie titles with their cosine similarity score
+        """
+        index = self.index
+        row = index.title_index.get(movie_title)
+        if row is None:
+            return f"Movie '{movie_title}' not found in database."
+        rows, scores = self._content(index).similar(
+            row, n_recommendations, n_probe, index.rows_of(movie_title)
+        )
+        return [
+            {'title': index.titles[row], 'similarity_score': score}
+            for row, score in zip(rows.tolist(), scores.tolist())
+        ]
+
+    def _buffers(self, index):
+        """
+        This thread's scratch arrays, reallocated when the index changes
+        """
+        local = self._local
+        if getattr(local, 'index', None) is not index:
+            n = len(index.titles)
+            local.masks = np.empty(n, dtype=index.genre_masks.dtype)
+            local.scores = np.empty(n, dtype=np.int64)
+            local.work = np.empty(n, dtype=np.int64)
+            local.index = index
+        return local
+
 
-        self.movies['genres'] = self.movies['genres'].apply(lambda x: set(x.split('|')))
-    
-    
     def recommend(self, movie_title, n_recommendations=10):
         """
         Get movie recommendations based on similarity
-        
+
         Parameters:
         movie_title (str): Title of the movie to base recommendations on
         n_recommendations (int): Number of recommendations to return
-        
+
         Returns:
-        list: List of recommended movie titles with similarity score (number of shared genres)
+        list: List of recommended movie titles with similarity score (number of shared genres,
+        plus CF_WEIGHT times the rating similarity when prepared with ratings)
         """
-        recommendations = []
-        try:
-            # Find the genres of the movie
-            target_genres = self.movies[self.movies['title'] == movie_title]['genres'].iloc[0]
-
-            # Compute the number of shared genres with other movies and sort by this number
-            self.movies['similarity_score'] = self.movies['genres'].apply(lambda x: len(x.intersection(target_genres)))
-            
-            # Get top recommendations based on similarity score, excluding the target movie
-            sorted_movies = self.movies[self.movies['title'] != movie_title].sort_values(by='similarity_score', ascending=False)
-            top_recommendations = sorted_movies.head(n_recommendations)
-
-            # Prepare the output list
-            for _, row in top_recommendations.iterrows():
-                recommendations.append({'title': row['title'], 'similarity_score': row['similarity_score']})
-
-        except IndexError:
+        index = self.index
+        cf = self._neighbors(index)
+        row = index.title_index.get(movie_title)
+        if row is None:
             return f"Movie '{movie_title}' not found in database."
 
+        # Number of shared genres with every movie in the catalog
+        buffers = self._buffers(index)
+        np.bitwise_and(index.genre_masks, index.genre_masks[row], out=buffers.masks)
+        scores = popcount(buffers.masks, out=buffers.scores)
+        if cf is not None:
+            scores = scores.astype(np.float64)
+            cf.add_scores(scores, row)
+
+        # Exclude the target movie itself
+        scores[index.rows_of(movie_title)] = -1
+
+        recommendations = []
+        work = buffers.work if cf is None else None
+        for row in self._top_k(scores, n_recommendations, work):
+            recommendations.append({'title': index.titles[row], 'similarity_score': scores[row].item()})
         return recommendations
-    
+
+    def recommend_many(self, movie_titles, n_recommendations=10, aggregation='max'):
+        """
+        Get one merged list of recommendations for several movies at once
+
+        Parameters:
+        movie_titles (list): Titles of the movies to base recommendations on
+        n_recommendations (int): Number of recommendations to return
+        aggregation (str): How per-movie scores are merged, one of 'max', 'sum' or 'rank'
+            ('rank' is reciprocal rank fusion of every movie's ranking)
+
+        Returns:
+        list: List of recommended movie titles with their merged similarity score,
+        excluding the input movies; titles not in the database are ignored
+        """
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{aggregation}', expected one of {AGGREGATIONS}")
+
+        index = self.index
+        cf = self._neighbors(index)
+        seeds = []
+        excluded = []
+        for title in dict.fromkeys(movie_titles):
+            row = index.title_index.get(title)
+            if row is not None:
+                seeds.append(row)
+                excluded.extend(index.rows_of(title))
+        if not seeds:
+            return []
+
+        # Shared genre counts of every seed against the whole catalog, shape (seeds, movies)
+        shared = popcount(index.genre_masks[seeds][:, None] & index.genre_masks[None, :])
+        if cf is not None:
+            shared = shared.astype(np.float64)
+            for scores, row in zip(shared, seeds):
+                cf.add_scores(scores, row)
+
+        dtype = np.int64 if cf is None else np.float64
+        if aggregation == 'max':
+            scores = shared.max(axis=0).astype(dtype)
+        elif aggregation == 'sum':
+            scores = shared.sum(axis=0, dtype=dtype)
+        else:
+            scores = self._rank_fusion(shared)
+        scores[excluded] = -1
+
+        recommendations = []
+        for row in self._top_k(scores, n_recommendations):
+            score = scores[row].item()
+            recommendations.append({'title': index.titles[row], 'similarity_score': score})
+        return recommendations
+
+    @staticmethod
+    def _rank_fusion(shared):
+        """
+        Reciprocal rank fusion of the per-seed rankings in a (seeds, movies) score matrix
+        """
+        # A movie's rank for a seed is the number of movies scoring strictly higher,
+        # which only depends on its score, so it can be read off a score histogram
+        if shared.dtype.kind == 'f':
+            # Blended scores are not small integers; histogram their distinct values instead
+            fused = np.zeros(shared.shape[1])
+            for row in shared:
+                _, inverse, counts = np.unique(row, return_inverse=True, return_counts=True)
+                higher = counts[::-1].cumsum()[::-1] - counts
+                fused += (1.0 / (RANK_FUSION_K + 1 + higher))[inverse]
+            return fused
+        n_scores = int(shared.max()) + 1
+        counts = np.stack([np.bincount(row, minlength=n_scores) for row in shared])
+        higher = counts[:, ::-1].cumsum(axis=1)[:, ::-1] - counts
+        weights = 1.0 / (RANK_FUSION_K + 1 + higher)
+        return np.take_along_axis(weights, shared.astype(np.intp), axis=1).sum(axis=0)
+
+    @staticmethod
+    def _top_k(scores, k, work=None):
+        """
+        Rows of the k highest non-negative scores, ties broken by catalog order
+
+        work is an optional scratch array of the same shape and dtype as scores
+        """
+        k = min(k, int(np.count_nonzero(scores >= 0)))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        n = len(scores)
+        if work is None:
+            work = scores.copy()
+        else:
+            np.copyto(work, scores)
+        work.partition(n - k)
+        kth = work[n - k]
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)[:k - len(above)]
+        top = np.concatenate([above, tied])
+        return top[np.lexsort((top, -scores[top]))]
+
 
 # Example usage:
 if __name__ == "__main__":
     # Create and train new recommender
     recommender = MovieRecommender()
     recommender.prepare_data('../../data/movies.csv')
-    
+
     # Get recommendations
     recommendations = recommender.recommend('The Avengers (2012)')
     for rec in recommendations:
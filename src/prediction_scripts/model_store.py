@@ -0,0 +1,216 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Versioned, checksummed model artifacts, memory-mapped when loaded.
+
+Every artifact is a directory of .npy arrays with a JSON manifest holding
+their SHA-256 checksums, stored as artifacts/<name>/v<version>; the
+CURRENT file next to the versions names the one to serve. Checksums are
+computed when an artifact is saved, and a load only recomputes those of
+arrays whose size or modification time changed since. The recommender
+and latent-factor models are built offline with
+
+    python src/prediction_scripts/model_store.py build [--movies PATH] [--ratings PATH]
+
+and running servers swap the new versions in on /admin/reload or SIGHUP.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import numpy as np
+
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+code_dir = os.path.dirname(scripts_dir)
+project_dir = os.path.dirname(code_dir)
+
+ARTIFACTS_DIR = os.path.join(scripts_dir, "artifacts")
+
+# Bumped whenever the artifact layout changes so older artifacts are refused
+ARTIFACT_FORMAT = 1
+ARTIFACT_MANIFEST = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+# Versions kept on disk by the build command, counting the new one
+DEFAULT_KEEP = 3
+
+
+class ArtifactError(ValueError):
+    """
+    An artifact that is missing, corrupt or does not match the data it is loaded with
+    """
+
+
+def file_checksum(path):
+    """
+    SHA-256 hex digest of a file, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(path):
+    """
+    [size, mtime_ns] of a file, which changes whenever it is rewritten
+    """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def source_of(path):
+    """
+    (size, mtime_ns) of a data file, or None if it is gone
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def versions(name, root=None):
+    """
+    Versions of an artifact on disk, oldest first
+    """
+    try:
+        entries = os.listdir(os.path.join(root or ARTIFACTS_DIR, name))
+    except OSError:
+        return []
+    return sorted(int(entry[1:]) for entry in entries if entry[:1] == "v" and entry[1:].isdigit())
+
+
+def current_version(name, root=None):
+    """
+    Version of an artifact to serve, or None if none was built
+    """
+    try:
+        with open(os.path.join(root or ARTIFACTS_DIR, name, CURRENT_FILE), "r", encoding="utf-8") as file:
+            return int(file.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def save_artifact(name, arrays, metadata=None, root=None, keep=None):
+    """
+    Writes arrays and JSON-serializable metadata as the next version of an
+    artifact, makes it current and returns its version; keep optionally
+    bounds the versions left on disk
+    """
+    directory = os.path.join(root or ARTIFACTS_DIR, name)
+    os.makedirs(directory, exist_ok=True)
+    version = max(versions(name, root), default=0) + 1
+    staging = os.path.join(directory, f".v{version}.tmp{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    checksums = {}
+    signatures = {}
+    for key, array in arrays.items():
+        path = os.path.join(staging, key + ".npy")
+        np.save(path, np.ascontiguousarray(array))
+        checksums[key] = file_checksum(path)
+        # Renaming the staging directory leaves the files' signatures as they are
+        signatures[key] = file_signature(path)
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "name": name,
+        "version": version,
+        "created": time.time(),
+        "checksums": checksums,
+        "signatures": signatures,
+        "metadata": metadata or {},
+    }
+    with open(os.path.join(staging, ARTIFACT_MANIFEST), "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    os.rename(staging, os.path.join(directory, f"v{version}"))
+
+    current = os.path.join(directory, f"{CURRENT_FILE}.tmp{os.getpid()}")
+    with open(current, "w", encoding="utf-8") as file:
+        file.write(str(version))
+    os.replace(current, os.path.join(directory, CURRENT_FILE))
+
+    if keep:
+        # Processes still mapping a removed version keep reading its unlinked files
+        for old in versions(name, root)[:-keep]:
+            shutil.rmtree(os.path.join(directory, f"v{old}"), ignore_errors=True)
+    return version
+
+
+def load_artifact(name, root=None, version=None, verify=True, full_verify=False):
+    """
+    Memory-maps the arrays of an artifact version, the current one by
+    default, and returns them with its manifest; verify checks the arrays
+    rewritten since they were saved against their checksums first, and
+    full_verify every array
+    """
+    version = version or current_version(name, root)
+    if version is None:
+        raise ArtifactError(f"No {name} artifact has been built")
+    path = os.path.join(root or ARTIFACTS_DIR, name, f"v{version}")
+    try:
+        with open(os.path.join(path, ARTIFACT_MANIFEST), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f"Unreadable {name} artifact v{version}: {e}") from e
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ArtifactError(f"Unsupported {name} artifact format: {manifest.get('format')}")
+
+    # Artifacts saved before signatures were recorded are checked in full
+    signatures = manifest.get("signatures", {})
+    arrays = {}
+    for key, checksum in manifest["checksums"].items():
+        array_path = os.path.join(path, key + ".npy")
+        try:
+            unchanged = not full_verify and file_signature(array_path) == signatures.get(key)
+        except OSError as e:
+            raise ArtifactError(f"Unreadable {name} artifact v{version}: {e}") from e
+        if verify and not unchanged and file_checksum(array_path) != checksum:
+            raise ArtifactError(f"Checksum mismatch in {name} artifact v{version}: {key}")
+        arrays[key] = np.load(array_path, mmap_mode="r")
+    return arrays, manifest
+
+
+def build(movies_path, ratings_path, root=None, keep=DEFAULT_KEEP):
+    """
+    Builds the catalog snapshot, then the recommender and latent-factor
+    artifacts, and returns their new versions
+    """
+    # pylint: disable=import-outside-toplevel
+    sys.path.insert(0, code_dir)
+    from prediction_scripts.als import ALSModel
+    from prediction_scripts.catalog import build_snapshot
+    from prediction_scripts.item_cf import read_ratings
+    from prediction_scripts.model import MovieRecommender
+
+    build_snapshot(movies_path)
+    recommender = MovieRecommender()
+    recommender.prepare_data(movies_path, ratings_path)
+    factors = ALSModel.fit(read_ratings(ratings_path))
+    factors.source = tuple(source_of(ratings_path))
+    return {
+        "recommender": recommender.save_artifact(movies_path, root, keep),
+        "als": factors.save_artifact(root, keep),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model artifact tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_command = commands.add_parser("build", help="build new versions of the model artifacts")
+    build_command.add_argument("--movies", default=os.path.join(project_dir, "data", "movies.csv"))
+    build_command.add_argument("--ratings", default=os.path.join(project_dir, "data", "ratings.csv"))
+    build_command.add_argument("--root", default=ARTIFACTS_DIR)
+    build_command.add_argument("--keep", type=int, default=DEFAULT_KEEP)
+    args = parser.parse_args()
+    for artifact, built in build(args.movies, args.ratings, args.root, args.keep).items():
+        print(f"Wrote {artifact} v{built} to {os.path.join(args.root, artifact)}")
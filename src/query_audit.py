@@ -0,0 +1,266 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Audit of the query plans of the SQL the API runs.
+
+Runs EXPLAIN for every SQL string in recommenderapp/utils.py and
+recommenderapp/app.py against a local database seeded with synthetic users,
+movies, reviews, watchlists, friendships and friend timelines, and exits
+with status 1 if a hot query reads a whole table.
+
+Usage: python query_audit.py [--database NAME] [--users N] [--movies N] [--keep]
+"""
+
+import argparse
+import ast
+import os
+import random
+import re
+import sys
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+INIT_SQL = os.path.join(SRC_DIR, "init.sql")
+SOURCES = [
+    os.path.join(SRC_DIR, "recommenderapp", "utils.py"),
+    os.path.join(SRC_DIR, "recommenderapp", "app.py"),
+]
+
+# Same server as app.py
+DATABASE_CONFIG = {
+    "host": "localhost",
+    "port": 27276,
+    "user": "root",
+    "password": "password",
+}
+
+# Scratch database created from init.sql, seeded and dropped by the audit
+AUDIT_DATABASE = "PopcornPicksAuditDB"
+
+# Statements with a plan worth checking; INSERT ... VALUES reads no table
+STATEMENT = re.compile(r"^\s*(SELECT|UPDATE|DELETE)\s")
+
+# Queries that read whole tables by design, by the function running them
+FULL_SCANS_ALLOWED = {
+    "get_wall_posts": "replaced by get_feed_page on /reviews",
+    "get_rating_history": "batch export of every review for precompute.py",
+    "get_watchlist_history": "batch export of every watchlist for precompute.py",
+    "get_movie_ids_by_imdb_id": "batch export of every movie id for precompute.py",
+}
+
+Query = namedtuple("Query", ["path", "function", "line", "sql"])
+
+
+class QueryCollector(ast.NodeVisitor):
+    """
+    Collects the SQL string literals of a module with the function using them
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.functions = []
+        self.queries = []
+
+    def visit_FunctionDef(self, node):  # pylint: disable=invalid-name
+        """
+        Visits a function body, tracking it as the user of the SQL inside
+        """
+        self.functions.append(node.name)
+        self.generic_visit(node)
+        self.functions.pop()
+
+    def visit_Constant(self, node):  # pylint: disable=invalid-name
+        """
+        Collects a plain string literal if it is SQL
+        """
+        if isinstance(node.value, str):
+            self.add(node, node.value)
+
+    def visit_JoinedStr(self, node):  # pylint: disable=invalid-name
+        """
+        Collects an f-string if it is SQL
+        """
+        # Interpolated parts of f-strings are placeholder lists such as "%s, %s"
+        sql = "".join(
+            part.value if isinstance(part, ast.Constant) else "%s" for part in node.values
+        )
+        self.add(node, sql)
+
+    def add(self, node, sql):
+        """
+        Records sql, whitespace-normalized, if it is a statement with a plan
+        """
+        if STATEMENT.match(sql):
+            function = self.functions[-1] if self.functions else None
+            self.queries.append(Query(self.path, function, node.lineno, " ".join(sql.split())))
+
+
+def extract_queries(paths=SOURCES):
+    """
+    The SQL statements found in the given Python files
+    """
+    queries = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            tree = ast.parse(file.read(), filename=path)
+        collector = QueryCollector(path)
+        collector.visit(tree)
+        queries.extend(collector.queries)
+    return queries
+
+
+def bind(sql):
+    """
+    A query with literal values in place of its parameters, which EXPLAIN needs;
+    a quoted '1' compares with string and integer columns alike without
+    disabling their indexes, and time columns get a date
+    """
+    sql = re.sub(r"LIMIT\s+%s", "LIMIT 10", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"(time\s*[<>=]+\s*)%s", r"\1'2023-01-01 00:00:00'", sql)
+    return sql.replace("%s", "'1'")
+
+
+def full_scans(plan):
+    """
+    Tables a plan reads in full, from the rows of EXPLAIN as dictionaries;
+    derived tables such as <derived2> are left out, as their source tables
+    have rows of their own
+    """
+    return [
+        row["table"] for row in plan
+        if row.get("type") == "ALL" and row.get("table") and not row["table"].startswith("<")
+    ]
+
+
+def explain(cursor, query):
+    """
+    The EXPLAIN rows of a query as dictionaries
+    """
+    cursor.execute("EXPLAIN " + bind(query.sql))
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def schema_statements(database, path=INIT_SQL):
+    """
+    The statements of init.sql, creating its tables in the given database
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        script = re.sub(r"--[^\n]*", "", file.read())
+    script = script.replace("PopcornPicksDB", database)
+    return [statement.strip() for statement in script.split(";") if statement.strip()]
+
+
+def seed(connection, users=2000, movies=5000, rng=None):
+    """
+    Fills an empty schema with synthetic rows, enough for the optimizer to
+    prefer an index to a scan wherever one applies
+    """
+    rng = rng or random.Random(0)
+    cursor = connection.cursor()
+    start = datetime(2023, 1, 1)
+    cursor.executemany(
+        "INSERT INTO Movies (idMovies, name, imdb_id, overview) VALUES (%s, %s, %s, %s)",
+        [(i, f"Movie {i} ({1950 + i % 70})", f"tt{i:07d}", "Overview") for i in range(1, movies + 1)],
+    )
+    cursor.executemany(
+        "INSERT INTO Users (idUsers, username, email, password) VALUES (%s, %s, %s, %s)",
+        [(i, f"user{i}", f"user{i}@example.com", "password") for i in range(1, users + 1)],
+    )
+    ratings, watchlist, friends = [], [], set()
+    for user in range(1, users + 1):
+        for movie in rng.sample(range(1, movies + 1), 20):
+            ratings.append((user, movie, rng.randint(1, 10), "Review",
+                            start + timedelta(minutes=rng.randrange(500000))))
+        for movie in rng.sample(range(1, movies + 1), 10):
+            watchlist.append((user, movie))
+        for friend in rng.sample(range(1, users + 1), 5):
+            if friend != user:
+                friends.update([(user, friend), (friend, user)])
+    cursor.executemany(
+        "INSERT INTO Ratings (user_id, movie_id, score, review, time) VALUES (%s, %s, %s, %s, %s)",
+        ratings,
+    )
+    cursor.executemany("INSERT INTO Watchlist (user_id, movie_id) VALUES (%s, %s)", watchlist)
+    cursor.executemany("INSERT INTO Friends (idUsers, idFriend) VALUES (%s, %s)", sorted(friends))
+    cursor.execute(
+        "INSERT INTO FriendActivity (user_id, time, rating_id, friend_id) \
+            SELECT f.idUsers, r.time, r.idRatings, r.user_id FROM Friends AS f \
+            JOIN Ratings AS r ON r.user_id = f.idFriend"
+    )
+    connection.commit()
+    cursor.execute("ANALYZE TABLE Movies, Users, Ratings, Watchlist, Friends, FriendActivity")
+    cursor.fetchall()
+    cursor.close()
+
+
+def audit(cursor, queries):
+    """
+    Explains every query and prints its plan, returning the hot queries
+    that read a whole table with the tables they scan
+    """
+    failures = []
+    for query in queries:
+        plan = explain(cursor, query)
+        scans = full_scans(plan)
+        location = f"{os.path.basename(query.path)}:{query.line} {query.function}"
+        allowed = FULL_SCANS_ALLOWED.get(query.function)
+        if scans and allowed:
+            status = f"full scan of {', '.join(scans)} allowed: {allowed}"
+        elif scans:
+            status = f"FULL SCAN of {', '.join(scans)}"
+            failures.append((query, scans))
+        else:
+            status = "ok"
+        print(f"{location}: {status}")
+        for row in plan:
+            print(f"    {row.get('table')}: type={row.get('type')} key={row.get('key')} "
+                  f"rows={row.get('rows')} {row.get('Extra') or ''}".rstrip())
+    return failures
+
+
+def main():
+    """
+    Seeds a scratch database or uses an existing one, audits every query and
+    exits with status 1 if a hot query scans a whole table
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--database", default=None,
+                        help="audit an existing database instead of a seeded scratch one")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database")
+    args = parser.parse_args()
+
+    import mysql.connector  # pylint: disable=import-outside-toplevel
+    connection = mysql.connector.connect(**DATABASE_CONFIG)
+    cursor = connection.cursor()
+    database = args.database or AUDIT_DATABASE
+    try:
+        if args.database is None:
+            cursor.execute(f"DROP DATABASE IF EXISTS {AUDIT_DATABASE}")
+            for statement in schema_statements(AUDIT_DATABASE):
+                cursor.execute(statement)
+            seed(connection, args.users, args.movies)
+        cursor.execute(f"USE {database}")
+        failures = audit(cursor, extract_queries())
+    finally:
+        if args.database is None and not args.keep:
+            cursor.execute(f"DROP DATABASE IF EXISTS {AUDIT_DATABASE}")
+        cursor.close()
+        connection.close()
+
+    if failures:
+        print(f"\n{len(failures)} hot queries read a whole table:")
+        for query, scans in failures:
+            print(f"  {os.path.basename(query.path)}:{query.line} {query.function} scans {', '.join(scans)}")
+        sys.exit(1)
+    print("\nNo hot query reads a whole table")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,16 +8,18 @@ This code is licensed under MIT license (see LICENSE for details)
 # pylint: disable=wrong-import-order
 # pylint: disable=import-error
 
+import hmac
 import json
+import signal
 import sys
 import os
+import threading
+from functools import wraps
 import jwt
 import datetime
-import pandas as pd
 from flask import Flask, jsonify, render_template, request, g
 from flask_cors import CORS
 import mysql.connector
-import pickle
 from dotenv import load_dotenv
 import logging
 # from utils import (
@@ -38,18 +40,144 @@ from utils import get_username
 from utils import get_recent_movies
 from utils import add_friend
 from utils import get_recent_friend_movies
-from utils import get_wall_posts
+from utils import get_friend_activity, FRIEND_TIMELINE_LENGTH
+from utils import get_friends_recent_movies
+from utils import get_feed_page
+from utils import get_movie_details
+from utils import get_new_ratings
+from utils import get_user_ratings
+from utils import get_user_recommendations
 from utils import submit_review
 from utils import create_account
 from utils import login_to_account
-from search import Search
-from item_based import recommend_for_new_user
+from db_pool import ConnectionPool
+from rating_feed import RatingFeed, REVIEW_SCORE_SCALE
+from warmup import Deferred, warm_up
+from result_cache import ResultCache, RedisBackend, recommendation_key
+from auth import TokenVerifier, bearer_token
+from wall_feed import WallFeed, FEED_PAGE_SIZE, MAX_FEED_PAGE, decode_cursor, encode_cursor
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from prediction_scripts.model import MovieRecommender
 
-search_instance = Search()
+def load_search():
+    """
+    Builds the search indexes, ranked one included, importing pandas and the
+    catalog on first use
+    """
+    from search import Search  # pylint: disable=import-outside-toplevel
+    search = Search()
+    search.build_ranked_index()
+    return search
+
+
+MOVIES_PATH = '../../data/movies.csv'
+RATINGS_PATH = '../../data/ratings.csv'
+
+
+def load_recommender():
+    """
+    Loads the recommender from its current artifact, or prepares it from the
+    CSV files when none was built, importing its model on first use
+    """
+    from prediction_scripts.model import MovieRecommender  # pylint: disable=import-outside-toplevel
+    from prediction_scripts.model_store import ArtifactError  # pylint: disable=import-outside-toplevel
+    model = MovieRecommender()
+    try:
+        model.load_artifact(MOVIES_PATH, RATINGS_PATH)
+    except ArtifactError as e:
+        logging.info(f"Preparing the recommender from CSV: {e}")
+        # Genre overlap blended with item-item similarity from the ratings
+        model.prepare_data(MOVIES_PATH, RATINGS_PATH)
+    return model
+
+
+def load_als():
+    """
+    Loads the latent-factor model from its current artifact, or trains it
+    if none was built and ratings.csv changed since the last training
+    """
+    # pylint: disable=import-outside-toplevel
+    from prediction_scripts.als import ALSModel, load_als as load
+    from prediction_scripts.model_store import ArtifactError
+    try:
+        return ALSModel.from_artifact()
+    except ArtifactError as e:
+        logging.info(f"Loading the latent-factor model from CSV: {e}")
+        return load(RATINGS_PATH)
+
+
+def cache_backend():
+    """
+    Redis store shared by the workers' recommendation caches, when RECOMMENDATION_CACHE_REDIS_URL is set
+    """
+    url = os.getenv('RECOMMENDATION_CACHE_REDIS_URL')
+    if not url:
+        return None
+    try:
+        import redis  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        logging.warning("RECOMMENDATION_CACHE_REDIS_URL is set but redis is not installed")
+        return None
+    return RedisBackend(redis.Redis.from_url(url, socket_timeout=0.1))
+
+
+# /predict responses of anonymous requests, keyed by seed set, aggregation and model version
+recommendation_cache = ResultCache(
+    max_entries=int(os.getenv('RECOMMENDATION_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('RECOMMENDATION_CACHE_TTL', '300')),
+    backend=cache_backend(),
+)
+
+# Newest posts of the review wall, updated as reviews are submitted
+wall_feed = WallFeed(
+    get_feed_page,
+    capacity=int(os.getenv('WALL_FEED_SIZE', '500')),
+    ttl=float(os.getenv('WALL_FEED_TTL', '5')),
+)
+
+
+# Built on first use, or in the background when MODEL_WARMUP is set (the default)
+search_instance = Deferred("search", load_search)
+recommender = Deferred("recommender", load_recommender)
+als = Deferred("als", load_als)
+
+
+reload_lock = threading.Lock()
+
+
+def reload_models():
+    """
+    Swaps in the current version of every model artifact that changed and
+    returns the version in use of each
+    """
+    # pylint: disable=import-outside-toplevel
+    from prediction_scripts.als import ALS_ARTIFACT, ALSModel
+    from prediction_scripts.model import RECOMMENDER_ARTIFACT
+    from prediction_scripts.model_store import current_version
+    with reload_lock:
+        model = recommender.get()
+        version = current_version(RECOMMENDER_ARTIFACT)
+        if version is not None and version != model.artifact_version:
+            model.load_artifact(MOVIES_PATH, RATINGS_PATH, version=version)
+        version = current_version(ALS_ARTIFACT)
+        if version is not None and version != als.get().version:
+            als.replace(ALSModel.from_artifact(version=version))
+        return {"recommender": model.artifact_version, "als": als.get().version}
+
+
+def reload_in_background(signum=None, frame=None):
+    """
+    SIGHUP handler reloading the models off the signal handler
+    """
+
+    def run():
+        try:
+            logging.info(f"Reloaded models: {reload_models()}")
+        except Exception as e:  # pylint: disable=broad-except
+            logging.error(f"Error reloading models: {str(e)}")
+
+    threading.Thread(target=run, name="model-reload", daemon=True).start()
 
 
 sys.path.append("../../")
@@ -77,131 +205,170 @@ DATABASE_CONFIG = {
 }
 
 
-@app.before_request
-def before_request():
+load_dotenv()
+
+db_pool = ConnectionPool(
+    lambda: mysql.connector.connect(
+        host=DATABASE_CONFIG['host'],
+        port=DATABASE_CONFIG['port'],
+        user=DATABASE_CONFIG['user'],
+        password=DATABASE_CONFIG['password'],
+        database=DATABASE_CONFIG['database']
+    ),
+    size=int(os.getenv('DB_POOL_SIZE', '5')),
+    timeout=float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    ping_after=float(os.getenv('DB_POOL_PING_AFTER', '30')),
+)
+
+# New reviews reach the recommender within RATINGS_POLL_INTERVAL seconds (0 disables it)
+rating_feed = RatingFeed(
+    db_pool,
+    get_new_ratings,
+    recommender,
+    interval=float(os.getenv('RATINGS_POLL_INTERVAL', '5')),
+)
+
+
+def get_db():
     """
-    Opens the db connection.
+    Checks out a pooled db connection on first use within a request.
     """
-    load_dotenv()
-    if 'db' not in g:
-        try:
-            g.db = mysql.connector.connect(
-                host=DATABASE_CONFIG['host'],
-                port=DATABASE_CONFIG['port'],
-                user=DATABASE_CONFIG['user'],
-                password=DATABASE_CONFIG['password'],
-                database=DATABASE_CONFIG['database']
-            )
-            print("Database connected successfully.")
-        except mysql.connector.Error as err:
-            print(f"Error: {err}")
-    else:
-        print("Database connection failed.")
+    db = getattr(g, 'db', None)
+    if db is None:
+        db = g.db = db_pool.acquire()
+    return db
+
+@app.teardown_appcontext
+def release_db(exception):
+    """
+    Returns the request's db connection to the pool.
+    """
+    db = g.pop('db', None)
+    if db is not None:
+        db_pool.release(db)
+
 
-@app.after_request
-def after_request(response):
-    if hasattr(g, 'db') and g.db is not None:
-        g.db.close()
-    return response
+SECRET_KEY = "popcornpicks"
+
+# User ids of recently verified tokens, so a session's requests skip jwt.decode
+token_verifier = TokenVerifier(SECRET_KEY, max_entries=int(os.getenv('AUTH_CACHE_SIZE', '1024')))
+
+
+def require_auth(view):
+    """
+    Answers 401 to requests without a valid bearer token, and runs the view
+    with the token's user id in g.user_id otherwise
+    """
+    @wraps(view)
+    def authenticated(*args, **kwargs):
+        token = bearer_token(request.headers.get('Authorization'))
+        if token is None:
+            return jsonify({"error": "No token provided"}), 401
+        try:
+            g.user_id = token_verifier.user_id(token)
+        except jwt.InvalidTokenError:
+            return jsonify({"error": "Invalid token"}), 401
+        return view(*args, **kwargs)
+    return authenticated
 
 # test route
 @app.route("/")
 def hello():
     return "hello"
 
-@app.route("/getUserName", methods=["GET"])
-def getUsername():
+@app.route("/metrics", methods=["GET"])
+def metrics():
     """
-    Get username of the current user
+    Reports usage counters of the db connection pool and the memory held by the catalog
     """
-    # Get token from header
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return jsonify({"error": "No token provided"}), 401
-        
-    token = auth_header.split(' ')[1]
+    from prediction_scripts.catalog import max_rss_bytes  # pylint: disable=import-outside-toplevel
+    return jsonify({
+        "db_pool": db_pool.metrics(),
+        "recommendation_cache": recommendation_cache.metrics(),
+        "wall_feed": wall_feed.metrics(),
+        "auth_cache": token_verifier.metrics(),
+        "catalog": recommender.get().index.memory_usage() if recommender.ready else None,
+        "max_rss_bytes": max_rss_bytes(),
+    })
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """
+    Reports whether the search and recommender are loaded, with 503 until they are
+    """
+    status = {value.name: value.status() for value in (search_instance, recommender, als)}
+    code = 200 if all(value["ready"] for value in status.values()) else 503
+    return jsonify(status), code
+
+# Shared secret /admin/reload requires in its X-Admin-Token header; unset disables the route
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
 
+
+@app.route("/admin/reload", methods=["POST"])
+def reload_route():
+    """
+    Swaps in newly built model artifacts without restarting, in the worker
+    process serving the request only
+    """
+    token = request.headers.get('X-Admin-Token', '')
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        return jsonify({'error': 'Forbidden'}), 403
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload['user_id']
+        return jsonify(dict(reload_models(), pid=os.getpid())), 200
+    except Exception as e:
+        logging.error(f"Error reloading models: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
+@app.route("/getUserName", methods=["GET"])
+@require_auth
+def getUsername():
+    """
+    Get username of the current user
+    """
+    user_id = g.user_id
     
     try:
-        username = get_username(g.db,user_id)
+        username = get_username(get_db(),user_id)
         return username
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/getFriends", methods=["GET"])
+@require_auth
 def getFriends():
     """
     Gets friends of the current user
     """
-    # Get token from header
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return jsonify({"error": "No token provided"}), 401
-        
-    token = auth_header.split(' ')[1]
-
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload['user_id']
-
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
+    user_id = g.user_id
     
     try:
-        friends = get_friends(g.db, user_id)
+        friends = get_friends(get_db(), user_id)
         return friends
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route("/getRecentMovies", methods=["GET"])
+@require_auth
 def getRecentMovies():
     """
     Gets recent movies of the current user
     """
-    # Get token from header
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return jsonify({"error": "No token provided"}), 401
-        
-    token = auth_header.split(' ')[1]
-
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload['user_id']
-
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
+    user_id = g.user_id
     
     try:
-        recent_movies = get_recent_movies(g.db, user_id)
+        recent_movies = get_recent_movies(get_db(), user_id)
         return recent_movies
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route("/friend", methods=["POST"])
+@require_auth
 def add_friend_route():
     data = request.get_json()
     username = data.get("user")  # Friend's username from the request
 
-    # Get token from header
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return jsonify({"error": "No token provided"}), 401
-        
-    token = auth_header.split(' ')[1]
-
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload['user_id']
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
+    user_id = g.user_id
     
 
     if not username or not user_id:
@@ -209,7 +376,7 @@ def add_friend_route():
 
     # Call add_friend with proper user_id
     try:
-        add_friend(g.db, username, user_id)
+        add_friend(get_db(), username, user_id)
         return jsonify({"message": "Friend added successfully"}), 200
     except ValueError as e:
         if str(e) == "Friend not found in the database":
@@ -225,8 +392,66 @@ def get_recent_friend_movies_route():
         return jsonify({'error': 'Missing friend username'}), 400
     
     try:
-        return get_recent_friend_movies(g.db, friend_username)
+        return get_recent_friend_movies(get_db(), friend_username)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Most friends and reviews per friend one /friends/movies request may ask for
+MAX_FRIEND_BATCH = 500
+MAX_FRIEND_MOVIES = 50
+
+
+@app.route("/friends/movies", methods=["GET"])
+@require_auth
+def friends_movies():
+    """
+    Returns the recent movies of many of the current user's friends at once,
+    grouped by username: those named by repeated friend query parameters, or
+    all of them when none are, n movies each (5 by default)
+    """
+    user_id = g.user_id
+
+    usernames = list(dict.fromkeys(request.args.getlist("friend")))
+    try:
+        n = int(request.args.get("n", 5))
+    except ValueError:
+        return jsonify({"error": "n must be an integer"}), 400
+    if not 0 < n <= MAX_FRIEND_MOVIES or len(usernames) > MAX_FRIEND_BATCH:
+        return jsonify({"error": f"n must be between 1 and {MAX_FRIEND_MOVIES}, "
+                                 f"with at most {MAX_FRIEND_BATCH} friends"}), 400
+
+    try:
+        return jsonify(get_friends_recent_movies(get_db(), user_id, usernames, n)), 200
+    except Exception as e:
+        print(f"Error fetching friends' movies: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route("/friends/activity", methods=["GET"])
+@require_auth
+def friend_activity():
+    """
+    Returns the recent reviews of all the current user's friends, newest first,
+    read from the timeline submit_review fans out to. Pass the last post's
+    cursor as before for older ones
+    """
+    user_id = g.user_id
+
+    try:
+        limit = int(request.args.get("limit", FEED_PAGE_SIZE))
+        before = request.args.get("before")
+        before = decode_cursor(before) if before else None
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or limit"}), 400
+    if not 0 < limit <= FRIEND_TIMELINE_LENGTH:
+        return jsonify({"error": f"limit must be between 1 and {FRIEND_TIMELINE_LENGTH}"}), 400
+
+    try:
+        activity = get_friend_activity(get_db(), user_id, before, limit)
+        return jsonify([dict(post, cursor=encode_cursor(post)) for post in activity])
     except Exception as e:
+        print(f"Error fetching friend activity: {str(e)}")
         return jsonify({'error': str(e)}), 500
     
 @app.route("/search", methods=["POST"])
@@ -237,16 +462,38 @@ def search_movies():
     if not query:
         return jsonify({"error": "Empty query"}), 400
 
-    # Get top 10 search results
-    results = search_instance.results_top_ten(query)
+    # Get top 10 search results, ranked and typo-tolerant if requested
+    mode = data.get("mode", "exact")
+    if mode == "ranked":
+        results = search_instance.get().ranked_results(query)
+    elif mode == "exact":
+        results = search_instance.get().results_top_ten(query)
+    else:
+        return jsonify({"error": f"Invalid search mode: {mode}"}), 400
     return jsonify(results), 200
 
 
 @app.route("/reviews", methods=["GET"])
 def wall_posts():
-    return get_wall_posts(g.db) 
+    """
+    Returns a page of the review wall, newest first. Every post has a cursor:
+    pass the last one as before for the next page, or the first as after for newer posts
+    """
+    try:
+        limit = int(request.args.get("limit", FEED_PAGE_SIZE))
+        before = request.args.get("before")
+        after = request.args.get("after")
+        before = decode_cursor(before) if before else None
+        after = decode_cursor(after) if after else None
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or limit"}), 400
+    if not 0 < limit <= MAX_FEED_PAGE or (before and after):
+        return jsonify({"error": f"limit must be between 1 and {MAX_FEED_PAGE}, with at most one cursor"}), 400
+    posts = wall_feed.page(get_db(), before, after, limit)
+    return jsonify([dict(post, cursor=encode_cursor(post)) for post in posts])
 
 @app.route("/review", methods=["POST"])
+@require_auth
 def review():
     data = request.get_json()
     
@@ -254,23 +501,12 @@ def review():
     if not data or "movie" not in data or "score" not in data or "review" not in data:
         return jsonify({"error": "Invalid or incomplete data"}), 400
     
-    # Get token from header
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return jsonify({"error": "No token provided"}), 401
-        
-    token = auth_header.split(' ')[1]
-
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload['user_id']
-
-    except jwt.InvalidTokenError:
-        return jsonify({"error": "Invalid token"}), 401
+    user_id = g.user_id
     
     try:
         # Submit the review using the provided data
-        submit_review(g.db, user_id, data["movie"], data["score"], data["review"])
+        submit_review(get_db(), user_id, data["movie"], data["score"], data["review"], wall=wall_feed)
+        rating_feed.notify()
         return jsonify({"message": "Review submitted successfully"}), 201
     except Exception as e:
         print(f"Error submitting review: {e}")
@@ -292,7 +528,7 @@ def create_acc():
         return jsonify({"error": "Invalid or incomplete data"}), 400
 
     try:
-        create_account(g.db, data["email"], data["username"], data["password"])
+        create_account(get_db(), data["email"], data["username"], data["password"])
         print("Account created successfully") # Debug log
         return jsonify({"message": "Sign up is successful"}), 200
     except Exception as e:
@@ -302,7 +538,6 @@ def create_acc():
         return jsonify({"error": "An entry with this username or email already exists, Please try with different username."}), 500
     
 
-SECRET_KEY = "popcornpicks"  
 @app.route("/login", methods=["POST"])
 def login():
     data = request.get_json()
@@ -310,7 +545,7 @@ def login():
         return jsonify({"error": "Invalid or incomplete data", "status": "fail"}), 400
     
     try:
-        resp = login_to_account(g.db, data["username"], data["password"])
+        resp = login_to_account(get_db(), data["username"], data["password"])
         if resp is None:
             return jsonify({"error": "Invalid username or password", "status": "fail"}), 401
 
@@ -326,8 +561,49 @@ def login():
         return jsonify({"error": "Login failed, please check your credentials", "status": "fail"}), 401
 
 
-recommender = MovieRecommender()
-recommender.prepare_data('../../data/movies.csv')
+# Number of ranked candidates /predict fetches to fill its top 10
+PREDICT_CANDIDATES = 30
+
+# Rating, on the ratings.csv scale, given to the movies a user asks recommendations for
+INPUT_MOVIE_RATING = 5.0
+
+
+def request_user_id():
+    """
+    The user id of the request's bearer token, or None for anonymous or invalid tokens
+    """
+    token = bearer_token(request.headers.get('Authorization'))
+    if token is None:
+        return None
+    try:
+        return token_verifier.user_id(token)
+    except jwt.InvalidTokenError:
+        return None
+
+
+def personalized_recommendations(user_id, input_movies, n):
+    """
+    Latent-factor recommendations for a user from their reviews and the input
+    movies, or None if none of them is known to the model
+    """
+    catalog = recommender.get().index
+    factors = als.get()
+    imdb_movie_ids = catalog.imdb_movie_ids()
+    rated = {}
+    for imdb_id, score in get_user_ratings(get_db(), user_id):
+        if imdb_id in imdb_movie_ids:
+            rated[imdb_movie_ids[imdb_id]] = score * REVIEW_SCORE_SCALE
+    for title in input_movies:
+        row = catalog.title_index.get(title)
+        if row is not None:
+            rated[int(catalog.movie_ids[row])] = INPUT_MOVIE_RATING
+    vector = factors.fold_in(list(rated), list(rated.values()))
+    if vector is None:
+        return None
+    recs = factors.recommend(vector, n, exclude=rated)
+    rows = catalog.rows_of_movie_ids([movie_id for movie_id, _ in recs])
+    return [{'title': catalog.titles[row], 'similarity_score': score}
+            for row, (_, score) in zip(rows, recs) if row >= 0]
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -338,55 +614,41 @@ def predict():
         if not input_movies:
             return jsonify({'error': 'No movies provided'}), 400
             
-        recommendations = set()
-        movie_details = []  # Store both title and ID
-            
-        for movie in input_movies:
+        model = recommender.get()
+        from prediction_scripts.model import AGGREGATIONS  # pylint: disable=import-outside-toplevel
+        aggregation = data.get('aggregation', 'max')
+        if aggregation not in AGGREGATIONS:
+            return jsonify({'error': f"Invalid aggregation: {aggregation}"}), 400
+
+        # Logged-in users get recommendations from their own reviews as well; the
+        # latent-factor model scores every movie at once, so aggregation does not apply
+        user_id = request_user_id()
+        recs = None
+        cache_key = None
+        if user_id is not None:
             try:
-                recs = recommender.recommend(movie, 10)
-                for rec in recs:
-                    # Check if this movie title hasn't been processed yet
-                    if rec['title'] not in recommendations:
-                        # Create a new database cursor
-                        cursor = g.db.cursor()
-                        
-                        # Query the Movies table to find if this movie exists
-                        # and get its unique database ID (idMovies)
-                        cursor.execute("SELECT idMovies FROM Movies WHERE name = %s", (rec['title'],))
-                        result = cursor.fetchone()
-                        cursor.close()
-                        
-                        # If the movie was found in the database
-                        if result:
-                            # Get the movie's ID from the result
-                            movie_id = result[0]
-
-                            cursor = g.db.cursor()
-                            cursor.execute("SELECT overview FROM Movies WHERE name = %s", (rec['title'],))
-                            overview = cursor.fetchone()[0]
-                            cursor.close()
-
-                            cursor = g.db.cursor()
-                            cursor.execute("SELECT streaming_platforms FROM Movies WHERE name = %s", (rec['title'],))
-                            streaming_platforms = cursor.fetchone()[0]
-                            cursor.close()
-                            
-                            # Add the title to our set of processed recommendations
-                            # to avoid duplicates
-                            recommendations.add(rec['title'])
-                            
-                            # Add both the ID and title to our final results
-                            movie_details.append({
-                                'id': movie_id,
-                                'title': rec['title'],
-                                'overview': overview,
-                                'streaming_platforms': streaming_platforms.replace("|", ", ")
-                            })
-            except IndexError:
-                continue
-         
+                recs = personalized_recommendations(user_id, input_movies, PREDICT_CANDIDATES)
+            except Exception as e:  # pylint: disable=broad-except
+                # Serve the same recommendations as anonymous users rather than fail
+                logging.warning(f"Personalized recommendations failed for user {user_id}: {str(e)}")
+        if recs is None:
+            cache_key = recommendation_key(input_movies, PREDICT_CANDIDATES, aggregation, model.model_version)
+            cached = recommendation_cache.get(cache_key)
+            if cached is not None:
+                return jsonify(cached), 200
+            # Score every input movie against the catalog in one pass, over-fetching
+            # candidates since some titles may be missing from the database
+            recs = model.recommend_many(input_movies, PREDICT_CANDIDATES, aggregation)
+
+        # Fetch the details of every candidate with one query, keeping the ranking
+        details = get_movie_details(get_db(), [rec['title'] for rec in recs])
+        movie_details = [details[title] for title in dict.fromkeys(rec['title'] for rec in recs)
+                         if title in details]
+
         # Limit to top 10
         top_recommendations = movie_details[:10]
+        if cache_key is not None:
+            recommendation_cache.put(cache_key, top_recommendations)
         
         return jsonify(top_recommendations), 200
     
@@ -395,23 +657,32 @@ def predict():
         return jsonify({'error': str(e)}), 500
 
 
+# Most recommendations /recommendations returns, as many as precompute.py keeps
+MAX_PRECOMPUTED = 50
+
+
+@app.route("/recommendations", methods=["GET"])
+@require_auth
+def precomputed_recommendations():
+    """
+    Returns the logged-in user's recommendations as last precomputed by
+    precompute.py, best first; empty until the job has run for the user
+    """
+    user_id = g.user_id
+    try:
+        n = min(max(int(request.args.get('n', 10)), 1), MAX_PRECOMPUTED)
+    except ValueError:
+        return jsonify({'error': 'n must be an integer'}), 400
+    return jsonify(get_user_recommendations(get_db(), user_id, n)), 200
+
+
 @app.route("/watchlist", methods=["GET"])
+@require_auth
 def get_watchlist():
     try:
-        # Get token from header
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "No token provided"}), 401
-        
-        token = auth_header.split(' ')[1]
-        try:
-            # Decode token to get user_id
-            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])  # Use SECRET_KEY instead of app.config
-            user_id = payload['user_id']
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token"}), 401
+        user_id = g.user_id
 
-        cursor = g.db.cursor(dictionary=True)
+        cursor = get_db().cursor(dictionary=True)
         query = """
             SELECT w.id, m.name as title, w.added_date, m.imdb_id
             FROM Watchlist w
@@ -438,25 +709,14 @@ def get_watchlist():
         return jsonify({"error": "Failed to fetch watchlist"}), 500
 
 @app.route("/watchlist/<int:movie_id>", methods=["POST"])
+@require_auth
 def add_to_watchlist(movie_id):
     try:
-        # Get token from header
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "No token provided"}), 401
-        
-        token = auth_header.split(' ')[1]
-        try:
-            print(f"Processing request for movie_id: {movie_id}")  # Debug log
-            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            user_id = payload['user_id']
-            print(f"User ID from token: {user_id}")  # Debug log
-            
-        except jwt.InvalidTokenError as e:
-            print(f"Token validation failed: {str(e)}")
-            return jsonify({"error": "Invalid token"}), 401
+        print(f"Processing request for movie_id: {movie_id}")  # Debug log
+        user_id = g.user_id
+        print(f"User ID from token: {user_id}")  # Debug log
 
-        cursor = g.db.cursor()
+        cursor = get_db().cursor()
         
         # First verify the movie exists
         print(f"Checking if movie exists: {movie_id}")  # Debug log
@@ -480,7 +740,7 @@ def add_to_watchlist(movie_id):
                 VALUES (%s, %s, %s)
             """
             cursor.execute(insert_query, (user_id, movie_id, datetime.datetime.now()))
-            g.db.commit()
+            get_db().commit()
             print(f"Successfully added movie {movie_id} to watchlist for user {user_id}")  # Debug log
             cursor.close()
             return jsonify({"message": "Added to watchlist"}), 201
@@ -493,25 +753,16 @@ def add_to_watchlist(movie_id):
         return jsonify({"error": f"Failed to add to watchlist: {str(e)}"}), 500
 
 @app.route("/watchlist/<int:watchlist_id>", methods=["DELETE"])
+@require_auth
 def remove_from_watchlist(watchlist_id):
     try:
-        # Get token from header
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "No token provided"}), 401
-        
-        token = auth_header.split(' ')[1]
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            user_id = payload['user_id']
-            print(f"Removing watchlist entry {watchlist_id} for user {user_id}")  # Debug log
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token"}), 401
+        user_id = g.user_id
+        print(f"Removing watchlist entry {watchlist_id} for user {user_id}")  # Debug log
 
-        cursor = g.db.cursor()
+        cursor = get_db().cursor()
         delete_query = "DELETE FROM Watchlist WHERE id = %s AND user_id = %s"
         cursor.execute(delete_query, (watchlist_id, user_id))
-        g.db.commit()
+        get_db().commit()
         
         if cursor.rowcount == 0:
             cursor.close()
@@ -525,22 +776,13 @@ def remove_from_watchlist(watchlist_id):
         return jsonify({"error": "Failed to remove from watchlist"}), 500
 
 @app.route("/watchlist/check/<int:movie_id>", methods=["GET"])
+@require_auth
 def check_watchlist_status(movie_id):
     try:
-        # Get token from header
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "No token provided"}), 401
-        
-        token = auth_header.split(' ')[1]
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            user_id = payload['user_id']
-            print(f"Checking watchlist for user {user_id}, movie {movie_id}")  # Debug log
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token"}), 401
+        user_id = g.user_id
+        print(f"Checking watchlist for user {user_id}, movie {movie_id}")  # Debug log
 
-        cursor = g.db.cursor()
+        cursor = get_db().cursor()
         
         # First check if movie exists in database
         movie_check_query = "SELECT idMovies FROM Movies WHERE idMovies = %s"
@@ -576,24 +818,15 @@ def check_watchlist_status(movie_id):
         }), 500
 
 @app.route("/watchlist/movie/<int:movie_id>", methods=["DELETE"])
+@require_auth
 def remove_from_watchlist_by_movie(movie_id):
     try:
-        # Get token from header
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "No token provided"}), 401
-        
-        token = auth_header.split(' ')[1]
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            user_id = payload['user_id']
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token"}), 401
+        user_id = g.user_id
 
-        cursor = g.db.cursor()
+        cursor = get_db().cursor()
         delete_query = "DELETE FROM Watchlist WHERE movie_id = %s AND user_id = %s"
         cursor.execute(delete_query, (movie_id, user_id))
-        g.db.commit()
+        get_db().commit()
         cursor.close()
 
         if cursor.rowcount == 0:
@@ -605,5 +838,27 @@ def remove_from_watchlist_by_movie(movie_id):
         print(f"Error removing from watchlist: {str(e)}")
         return jsonify({"error": "Failed to remove from watchlist"}), 500
 
+background_started = threading.Event()
+
+
+def start_background_tasks():
+    """
+    Starts the model warm-up and the rating feed, and installs the SIGHUP
+    handler; called once by the serving process, e.g. from a WSGI server's
+    post-fork hook, so importing app has no side effects
+    """
+    if background_started.is_set():
+        return
+    background_started.set()
+    if os.getenv('MODEL_WARMUP', '1') != '0':
+        warm_up(search_instance, recommender, als)
+    if rating_feed.interval > 0:
+        rating_feed.start()
+    # `kill -HUP` swaps in models rebuilt by `model_store.py build`
+    if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGHUP, reload_in_background)
+
+
 if __name__ == "__main__":
+    start_background_tasks()
     app.run(host='0.0.0.0', port=3001, debug=True)
@@ -0,0 +1,94 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import jwt
+
+
+def bearer_token(auth_header):
+    """
+    The token of an Authorization header, or None if it is not a bearer token
+    """
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    return auth_header.split(' ')[1]
+
+
+class TokenVerifier:
+    """
+    Verifies JWTs, keeping a size-bounded LRU of the user ids of recently
+    verified tokens so a session's repeated requests skip the HMAC and decode
+    """
+
+    def __init__(self, secret, max_entries=1024, algorithms=("HS256",), clock=time.time):
+        """
+        secret is the signing key, max_entries bounds the tokens remembered,
+        and clock gives the time exp claims are checked against
+        """
+        self.secret = secret
+        self.max_entries = max_entries
+        self.algorithms = list(algorithms)
+        self.clock = clock
+        # Token digests to (user_id, exp or None)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def user_id(self, token):
+        """
+        The user id of a token, or jwt.InvalidTokenError if it is invalid,
+        expired or has no user_id
+        """
+        key = hashlib.sha256(token.encode('utf-8')).digest()
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                user_id, expires = entry
+                if expires is None or expires > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return user_id
+                del self._entries[key]
+            self._misses += 1
+
+        payload = jwt.decode(token, self.secret, algorithms=self.algorithms)
+        if 'user_id' not in payload:
+            raise jwt.InvalidTokenError("Token has no user_id")
+        user_id = payload['user_id']
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[key] = (user_id, payload.get('exp'))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return user_id
+
+    def clear(self):
+        """
+        Forgets every verified token, e.g. after the secret changes
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        """
+        Usage counters of the cache
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,164 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+"""
+
+import threading
+import time
+
+
+class PoolExhaustedError(Exception):
+    """
+    Raised when no connection becomes free within the checkout timeout
+    """
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of database connections, opened lazily on first checkout
+    """
+
+    def __init__(self, connect, size=5, timeout=10.0, ping_after=30.0):
+        """
+        connect is a zero-argument callable opening a new connection, size the
+        maximum number of open connections, timeout how long a checkout waits
+        for a free connection and ping_after how long a connection may sit idle
+        before it is pinged on checkout
+        """
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        # Idle (connection, idle_since) pairs, most recently released last
+        self._idle = []
+        self._lock = threading.Lock()
+        # Notified whenever a connection is released or a slot is freed
+        self._available = threading.Condition(self._lock)
+        self._opened = 0
+        self._in_use = set()
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._checkout_time = 0.0
+        self._max_checkout_time = 0.0
+
+    def acquire(self):
+        """
+        Checks out a healthy connection, opening one if the pool is not full
+        """
+        start = time.perf_counter()
+        connection = self._checkout(start)
+        with self._lock:
+            elapsed = time.perf_counter() - start
+            self._in_use.add(id(connection))
+            self._checkouts += 1
+            self._checkout_time += elapsed
+            self._max_checkout_time = max(self._max_checkout_time, elapsed)
+        return connection
+
+    def _checkout(self, start):
+        """
+        Takes an idle connection, opens a new one or waits for a release
+        """
+        waited = False
+        while True:
+            with self._available:
+                while not self._idle and self._opened >= self.size:
+                    if not waited:
+                        waited = True
+                        self._waits += 1
+                    remaining = self.timeout - (time.perf_counter() - start)
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolExhaustedError(
+                            f"No database connection free after {self.timeout}s"
+                        )
+                    self._available.wait(remaining)
+                if self._idle:
+                    connection, idle_since = self._idle.pop()
+                else:
+                    # Reserve the slot before connecting outside the lock
+                    self._opened += 1
+                    connection = None
+            if connection is None:
+                return self._open()
+            if self._healthy(connection, idle_since):
+                return connection
+            self._discard(connection)
+
+    def _open(self):
+        """
+        Opens a new connection in a slot reserved by _checkout
+        """
+        try:
+            return self.connect()
+        except Exception:
+            with self._available:
+                self._opened -= 1
+                self._available.notify()
+            raise
+
+    def _healthy(self, connection, idle_since):
+        """
+        Pings connections that have been idle for a while
+        """
+        if time.monotonic() - idle_since < self.ping_after:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:  # pylint: disable=broad-except
+            return False
+
+    def _discard(self, connection):
+        """
+        Closes a broken connection and frees its slot for a waiting checkout
+        """
+        with self._available:
+            self._opened -= 1
+            self._discarded += 1
+            self._available.notify()
+        try:
+            connection.close()
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def release(self, connection):
+        """
+        Returns a connection to the pool, dropping any uncommitted work
+        """
+        with self._lock:
+            if id(connection) not in self._in_use:
+                return
+            self._in_use.remove(id(connection))
+        try:
+            connection.rollback()
+        except Exception:  # pylint: disable=broad-except
+            self._discard(connection)
+            return
+        with self._available:
+            self._idle.append((connection, time.monotonic()))
+            self._available.notify()
+
+    def metrics(self):
+        """
+        Usage counters of the pool
+        """
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._opened,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "avg_checkout_ms": 1000 * self._checkout_time / self._checkouts
+                if self._checkouts
+                else 0.0,
+                "max_checkout_ms": 1000 * self._max_checkout_time,
+            }
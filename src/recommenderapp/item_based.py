@@ -6,63 +6,41 @@ This code is licensed under MIT license (see LICENSE for details)
 """
 
 import os
+import sys
+import numpy as np
 import pandas as pd
 
 app_dir = os.path.dirname(os.path.abspath(__file__))
 code_dir = os.path.dirname(app_dir)
 project_dir = os.path.dirname(code_dir)
 
+sys.path.insert(0, code_dir)
+
+# pylint: disable=wrong-import-position
+from prediction_scripts.catalog import get_catalog
+
 
 def recommend_for_new_user(user_rating):
     """
     Generates a list of recommended movie titles for a new user based on their ratings.
     """
-    # ratings = pd.read_csv(os.path.join(project_dir, "data", "ratings.csv"))
-    movies = pd.read_csv(os.path.join(project_dir, "data", "movies.csv"))
+    catalog = get_catalog()
+    genre_matrix = catalog.genre_matrix()
+    # Only the columns needed here, so long text columns are never decoded
+    movies = pd.DataFrame({"movieId": catalog.movie_ids, "title": catalog.titles})
     user = pd.DataFrame(user_rating)
     user_movie_id = movies[movies["title"].isin(user["title"])]
     user_ratings = pd.merge(user_movie_id, user)
 
-    movies_genre_filled = movies.copy(deep=True)
-    copy_of_movies = movies.copy(deep=True)
-
-    for index, row in copy_of_movies.iterrows():
-        copy_of_movies.at[index, "genres"] = row["genres"].split("|")
+    # Weight each genre by the user's ratings of the movies having it
+    user_rows = np.flatnonzero(movies["movieId"].isin(user_ratings["movieId"]).to_numpy())
+    user_profile = genre_matrix[user_rows].T.dot(user_ratings["rating"].to_numpy(dtype=np.float64))
 
-    for index, row in copy_of_movies.iterrows():
-        for genre in row["genres"]:
-            movies_genre_filled.at[index, genre] = 1
-
-    movies_genre_filled = movies_genre_filled.fillna(0)
-
-    user_genre = movies_genre_filled[
-        movies_genre_filled.movieId.isin(user_ratings.movieId)
-    ]
-    user_genre = user_genre.copy()
-    user_genre.drop(
-        ["movieId", "title", "genres", "imdb_id", "overview", "poster_path", "runtime"],
-        axis=1,
-        inplace=True,
-    )
-    user_profile = user_genre.T.dot(user_ratings.rating.to_numpy())
-
-    movies_genre_filled.set_index(movies_genre_filled.movieId)
-    movies_genre_filled.drop(
-        ["movieId", "title", "genres", "imdb_id", "overview", "poster_path", "runtime"],
-        axis=1,
-        inplace=True,
-    )
-
-    recommendations = (movies_genre_filled.dot(user_profile)) / user_profile.sum()
-
-    join_movies_and_recommendations = movies.copy(deep=True)
-    join_movies_and_recommendations["recommended"] = recommendations
-    join_movies_and_recommendations.sort_values(
-        by="recommended", ascending=False, inplace=True
-    )
+    recommendations = pd.Series(genre_matrix.dot(user_profile) / user_profile.sum())
+    top = recommendations.sort_values(ascending=False).index[:201]
 
     return (
-        list(join_movies_and_recommendations["title"][:201]),
-        list(join_movies_and_recommendations["genres"][:201]),
-        list(join_movies_and_recommendations["imdb_id"][:201]),
+        list(catalog.titles[top]),
+        list(np.asarray(catalog.column("genres"))[top]),
+        list(catalog.column("imdb_id")[top]),
     )
@@ -0,0 +1,202 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Batch job precomputing the top recommendations of every user from their
+reviews and watchlist, served by the /recommendations endpoint.
+
+Run it from src/recommenderapp, e.g. nightly or after a model rebuild:
+
+    python precompute.py [--processes N] [--shards N] [--top N]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from multiprocessing import Pool
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+MOVIES_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../data/movies.csv'))
+RATINGS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../data/ratings.csv'))
+
+# Recommendations kept per user
+DEFAULT_TOP_N = 50
+
+# Rating, on the ratings.csv scale, given to a movie on the user's watchlist
+WATCHLIST_RATING = 4.0
+
+# Same database as app.py
+DATABASE_CONFIG = {
+    'host': 'localhost',
+    'port': 27276,
+    'user': 'root',
+    'password': 'password',
+    'database': 'popcornpicksdb'
+}
+
+# Models of a worker process, loaded once by init_worker
+_worker = {}
+
+
+def load_models(movies_path=MOVIES_PATH, ratings_path=RATINGS_PATH):
+    """
+    The catalog and latent-factor model, from their current artifacts when built
+    """
+    # pylint: disable=import-outside-toplevel
+    from prediction_scripts.als import ALSModel, load_als
+    from prediction_scripts.catalog import get_catalog
+    from prediction_scripts.model_store import ArtifactError
+    try:
+        factors = ALSModel.from_artifact()
+    except ArtifactError:
+        factors = load_als(ratings_path)
+    return get_catalog(movies_path), factors
+
+
+def model_version(factors):
+    """
+    Label of the model the recommendations were computed with
+    """
+    return f"als-v{factors.version}" if factors.version is not None else "als-csv"
+
+
+def user_histories(ratings, watchlist, review_scale):
+    """
+    Ratings on the ratings.csv scale of every user, keyed by imdb id, from
+    (user_id, imdb_id, score) review rows, oldest first, and (user_id,
+    imdb_id) watchlist rows; review scores are multiplied by review_scale,
+    and a review outweighs a watchlist entry
+    """
+    histories = {}
+    for user, imdb_id in watchlist:
+        histories.setdefault(user, {})[imdb_id] = WATCHLIST_RATING
+    for user, imdb_id, score in ratings:
+        histories.setdefault(user, {})[imdb_id] = score * review_scale
+    return histories
+
+
+def shards(histories, n_shards):
+    """
+    Users split into n_shards lists of (user_id, history) by user id
+    """
+    parts = [[] for _ in range(max(n_shards, 1))]
+    for user, history in histories.items():
+        parts[user % len(parts)].append((user, history))
+    return [part for part in parts if part]
+
+
+def init_worker(movies_path, ratings_path):
+    """
+    Loads the models once in every pool process
+    """
+    _worker["catalog"], _worker["factors"] = load_models(movies_path, ratings_path)
+
+
+def recommend_shard(users, n=DEFAULT_TOP_N):
+    """
+    Ranked (imdb_id, score) recommendations of a shard of users, folding in
+    each user and ranking the whole shard with one batched product; users
+    with no movie known to the model get none
+    """
+    catalog, factors = _worker["catalog"], _worker["factors"]
+    imdb_movie_ids = catalog.imdb_movie_ids()
+    known, vectors, excluded = [], [], []
+    for user, history in users:
+        rated = {imdb_movie_ids[imdb_id]: rating for imdb_id, rating in history.items()
+                 if imdb_id in imdb_movie_ids}
+        vector = factors.fold_in(list(rated), list(rated.values())) if rated else None
+        if vector is not None:
+            known.append(user)
+            vectors.append(vector)
+            excluded.append(rated)
+    if not known:
+        return {}
+    imdb_ids = catalog.column("imdb_id")
+    results = {}
+    for user, recs in zip(known, factors.recommend_batch(np.stack(vectors), n, excluded)):
+        rows = catalog.rows_of_movie_ids([movie_id for movie_id, _ in recs])
+        results[user] = [(imdb_ids[row], score) for row, (_, score) in zip(rows, recs) if row >= 0]
+    return results
+
+
+def precompute(histories, processes=None, n_shards=None, n=DEFAULT_TOP_N,
+               movies_path=MOVIES_PATH, ratings_path=RATINGS_PATH):
+    """
+    Recommendations of every user, computed shard by shard in a process pool
+    """
+    processes = processes or os.cpu_count()
+    parts = shards(histories, n_shards or processes * 4)
+    results = {}
+    if processes <= 1:
+        init_worker(movies_path, ratings_path)
+        for part in parts:
+            results.update(recommend_shard(part, n))
+        return results
+    with Pool(processes, initializer=init_worker, initargs=(movies_path, ratings_path)) as pool:
+        for shard_results in pool.starmap(recommend_shard, [(part, n) for part in parts]):
+            results.update(shard_results)
+    return results
+
+
+def refresh(db, processes=None, n_shards=None, n=DEFAULT_TOP_N):
+    """
+    Recomputes and stores the recommendations of every user with reviews or
+    a watchlist, deleting those of everyone else, and returns the number of
+    users refreshed
+    """
+    # pylint: disable=import-outside-toplevel
+    from rating_feed import REVIEW_SCORE_SCALE
+    from utils import (
+        get_movie_ids_by_imdb_id,
+        get_rating_history,
+        get_watchlist_history,
+        prune_user_recommendations,
+        save_user_recommendations,
+    )
+    histories = user_histories(get_rating_history(db), get_watchlist_history(db), REVIEW_SCORE_SCALE)
+    # Loads the models once here first, so the workers find the artifacts or caches ready
+    _, factors = load_models()
+    # Over-fetch, since some recommended movies may be missing from the database
+    results = precompute(histories, processes, n_shards, 2 * n)
+    movie_ids = get_movie_ids_by_imdb_id(db)
+    # Users the model knows none of the movies of are written with no rows, clearing older ones
+    recommendations = {
+        user: [(movie_ids[imdb_id], score) for imdb_id, score in results.get(user, [])
+               if imdb_id in movie_ids][:n]
+        for user in histories
+    }
+    save_user_recommendations(db, recommendations, model_version(factors))
+    # Users without history any more would otherwise keep their last recommendations
+    prune_user_recommendations(db, recommendations)
+    return len(recommendations)
+
+
+def main():
+    """
+    Refreshes the recommendations of every user in the local database
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--shards", type=int, default=None)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_N)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    import mysql.connector  # pylint: disable=import-outside-toplevel
+    db = mysql.connector.connect(**DATABASE_CONFIG)
+    start = time.perf_counter()
+    try:
+        users = refresh(db, args.processes, args.shards, args.top)
+    finally:
+        db.close()
+    logging.info(f"Precomputed recommendations of {users} users in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
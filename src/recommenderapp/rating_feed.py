@@ -0,0 +1,100 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+"""
+
+import logging
+import threading
+
+# Reviews on the site score movies out of 10, ratings.csv rates them out of 5
+REVIEW_SCORE_SCALE = 0.5
+
+
+class RatingFeed:
+    """
+    Feeds reviews added to the Ratings table into the recommender's rating neighbours
+    """
+
+    def __init__(self, pool, fetch, recommender, interval=5.0, batch_size=1000):
+        """
+        pool is the db connection pool, fetch a function like utils.get_new_ratings,
+        recommender the Deferred recommender, and interval the seconds between polls
+        """
+        self.pool = pool
+        self.fetch = fetch
+        self.recommender = recommender
+        self.interval = interval
+        self.batch_size = batch_size
+        # idRatings of the last review fed in
+        self.high_water = 0
+        self._table = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def poll(self):
+        """
+        Feeds every review added since the last poll, returns how many were used
+        """
+        if not self.recommender.ready:
+            return 0
+        model = self.recommender.get()
+        with self._lock:
+            cf = model.cf
+            if cf is None:
+                return 0
+            if cf.table is not self._table:
+                # A table this feed did not update has none of the reviews yet
+                self.high_water = 0
+            # The db numbers movies differently, so they are matched by imdb id
+            movie_id_of = cf.catalog.imdb_movie_ids()
+
+            applied = 0
+            db = self.pool.acquire()
+            try:
+                while True:
+                    rows = self.fetch(db, self.high_water, self.batch_size)
+                    if not rows:
+                        break
+                    users, movie_ids, ratings = [], [], []
+                    for _, user_id, imdb_id, score in rows:
+                        movie_id = movie_id_of.get(imdb_id)
+                        if movie_id is not None:
+                            # Negative keys never collide with the users of ratings.csv
+                            users.append(-user_id)
+                            movie_ids.append(movie_id)
+                            ratings.append(score * REVIEW_SCORE_SCALE)
+                    model.update_ratings(users, movie_ids, ratings, rows[-1][0])
+                    self.high_water = rows[-1][0]
+                    applied += len(users)
+                    if len(rows) < self.batch_size:
+                        break
+            finally:
+                self.pool.release(db)
+            self._table = model.cf.table
+            return applied
+
+    def notify(self):
+        """
+        Wakes the feed to poll now, e.g. right after a review is submitted
+        """
+        self._wake.set()
+
+    def start(self):
+        """
+        Polls in a background daemon thread every interval seconds, or when notified
+        """
+
+        def run():
+            while True:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                try:
+                    self.poll()
+                except Exception as e:  # pylint: disable=broad-except
+                    logging.warning(f"Could not feed new ratings: {e}")
+
+        thread = threading.Thread(target=run, name="rating-feed", daemon=True)
+        thread.start()
+        return thread
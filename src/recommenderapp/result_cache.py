@@ -0,0 +1,158 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def recommendation_key(titles, n, aggregation, model_version):
+    """
+    Cache key of a recommendation request: the same for any order or
+    repetition of its seed titles, and new for every model version
+    """
+    seeds = sorted(set(titles))
+    return json.dumps([seeds, n, aggregation, model_version], separators=(",", ":"))
+
+
+class RedisBackend:
+    """
+    Cache entries shared by every worker through a Redis client
+    """
+
+    def __init__(self, client, prefix="popcornpicks:recommendations:"):
+        """
+        client needs get and setex, as redis.Redis has
+        """
+        self.client = client
+        self.prefix = prefix
+
+    def _name(self, key):
+        return self.prefix + hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        The shared value of a key, or None
+        """
+        value = self.client.get(self._name(key))
+        return None if value is None else json.loads(value)
+
+    def put(self, key, value, ttl):
+        """
+        Stores a value for every worker, expiring after ttl seconds
+        """
+        self.client.setex(self._name(key), max(int(ttl), 1), json.dumps(value))
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of results that expire after ttl seconds, with an
+    optional shared backend consulted on local misses
+    """
+
+    def __init__(self, max_entries=1024, ttl=300.0, backend=None, clock=time.monotonic):
+        """
+        max_entries bounds the entries kept in this process, ttl is how long an
+        entry is served, and backend an optional shared store such as RedisBackend
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._shared_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._backend_errors = 0
+
+    def get(self, key):
+        """
+        The cached value of a key, or None
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+                self._expirations += 1
+        if self.backend is not None:
+            try:
+                value = self.backend.get(key)
+            except Exception:  # pylint: disable=broad-except
+                # A shared cache that is down only costs the hits it would have given
+                value = None
+                with self._lock:
+                    self._backend_errors += 1
+            if value is not None:
+                self._store(key, value, now)
+                with self._lock:
+                    self._shared_hits += 1
+                return value
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def put(self, key, value):
+        """
+        Caches a JSON-serializable value, evicting the least recently used entries beyond max_entries
+        """
+        self._store(key, value, self.clock())
+        if self.backend is not None:
+            try:
+                self.backend.put(key, value, self.ttl)
+            except Exception:  # pylint: disable=broad-except
+                with self._lock:
+                    self._backend_errors += 1
+
+    def _store(self, key, value, now):
+        """
+        Adds an entry to the local LRU
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """
+        Drops every local entry
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        """
+        Usage counters of the cache
+        """
+        with self._lock:
+            lookups = self._hits + self._shared_hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "shared_hits": self._shared_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "backend_errors": self._backend_errors,
+                "hit_rate": (self._hits + self._shared_hits) / lookups if lookups else 0.0,
+            }
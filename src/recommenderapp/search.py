@@ -5,6 +5,12 @@ This code is licensed under MIT license (see LICENSE for details)
 @author: PopcornPicks
 """
 import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+import numpy as np
 import pandas as pd
 
 # from flask import jsonify, request, render_template
@@ -14,52 +20,276 @@ app_dir = os.path.dirname(os.path.abspath(__file__))
 code_dir = os.path.dirname(app_dir)
 project_dir = os.path.dirname(code_dir)
 
+sys.path.insert(0, code_dir)
+
+# pylint: disable=wrong-import-position
+from prediction_scripts.catalog import get_catalog
+
+# Sorts after every character, so word + PREFIX_END bounds all keys starting with word
+PREFIX_END = "\U0010ffff"
+
+# Candidate count under which substring matches are checked directly
+MAX_VERIFY = 64
+
+# Ranked search: time budget per query, and caps that bound the work per query
+RANKED_BUDGET_MS = 20
+MAX_PREFIX_WORDS = 50
+MAX_RANKED_CANDIDATES = 200
+
+# Ranked search weights; a full word match is worth 1
+PREFIX_WORD_SCORE = 0.8
+TYPO_PENALTY = 0.3
+TITLE_PREFIX_BONUS = 2.0
+WORD_BOUNDARY_BONUS = 1.0
+SUBSTRING_BONUS = 0.5
+POPULARITY_WEIGHT = 0.5
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class PrefixIndex:
+    """
+    Case-folded titles in sorted order, for prefix lookups by binary search
+    """
+
+    def __init__(self, titles):
+        self.titles = list(titles)
+        self.lowered = [title.lower() for title in self.titles]
+        order = sorted(range(len(self.titles)), key=self.lowered.__getitem__)
+        self.keys = [self.lowered[i] for i in order]
+        self.rows = np.array(order, dtype=np.int64)
+
+    def matches(self, word, limit=None):
+        """
+        Rows of the titles starting with the lowercase word, in catalog order
+        """
+        lo = bisect_left(self.keys, word)
+        hi = bisect_left(self.keys, word + PREFIX_END, lo)
+        rows = self.rows[lo:hi]
+        if limit is not None and len(rows) > limit:
+            rows = np.partition(rows, limit - 1)[:limit]
+        return np.sort(rows)
+
+
+class TrigramIndex:
+    """
+    Inverted index from every three-character substring to the rows containing it
+    """
+
+    def __init__(self, lowered):
+        self.lowered = lowered
+        postings = {}
+        for row, title in enumerate(lowered):
+            for gram in {title[i:i + 3] for i in range(len(title) - 2)}:
+                postings.setdefault(gram, []).append(row)
+        self.postings = {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+
+    def candidates(self, word):
+        """
+        Rows that may contain the lowercase word, in catalog order
+        """
+        if len(word) < 3:
+            yield from range(len(self.lowered))
+            return
+        lists = []
+        for gram in {word[i:i + 3] for i in range(len(word) - 2)}:
+            rows = self.postings.get(gram)
+            if rows is None:
+                return
+            lists.append(rows)
+        # Intersect the shortest lists first and stop once few candidates are left to verify
+        lists.sort(key=len)
+        rows = lists[0]
+        for other in lists[1:]:
+            if len(rows) <= MAX_VERIFY:
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        # Hand out rows in chunks so callers that stop early skip converting the rest
+        for start in range(0, len(rows), MAX_VERIFY):
+            yield from rows[start:start + MAX_VERIFY].tolist()
+
+
+def deletes(word, max_deletes=1):
+    """
+    Word and every variant of it with up to max_deletes characters removed
+    """
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_deletes):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+def bounded_distance(a, b, max_distance):
+    """
+    Edit distance between a and b counting adjacent transpositions as one edit,
+    or max_distance + 1 if it is larger
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > max_distance and (before is None or min(previous) > max_distance):
+            return max_distance + 1
+        before, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def max_typos(word):
+    """
+    Edit distance tolerated for a query word of this length
+    """
+    if len(word) < 3:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+
+class RankedIndex:
+    """
+    Word postings, a sorted vocabulary for prefixes, a deletion index for
+    typos (SymSpell style) and rating counts for popularity
+    """
+
+    def __init__(self, lowered, movie_ids, ratings_path):
+        postings = {}
+        for row, title in enumerate(lowered):
+            for word in set(WORD_PATTERN.findall(title)):
+                postings.setdefault(word, []).append(row)
+        self.postings = {word: np.array(rows, dtype=np.int32) for word, rows in postings.items()}
+        self.vocabulary = sorted(self.postings)
+        self.frequency = np.array([len(self.postings[word]) for word in self.vocabulary])
+
+        # Deletes up to each word's own tolerance, so two-edit typos of long words are found
+        self.deletions = {}
+        for word in self.vocabulary:
+            limit = max_typos(word)
+            if limit:
+                for variant in deletes(word, limit):
+                    self.deletions.setdefault(variant, []).append(word)
+
+        self.popularity = np.zeros(len(lowered))
+        if os.path.exists(ratings_path):
+            counts = pd.read_csv(ratings_path, usecols=["movieId"])["movieId"].value_counts()
+            rated = np.log1p(pd.Series(movie_ids).map(counts).fillna(0).to_numpy(dtype=float))
+            if rated.max() > 0:
+                self.popularity = rated / rated.max()
+
+    def prefix_words(self, word):
+        """
+        Most frequent vocabulary words starting with word
+        """
+        lo = bisect_left(self.vocabulary, word)
+        hi = bisect_left(self.vocabulary, word + PREFIX_END, lo)
+        if hi - lo > MAX_PREFIX_WORDS:
+            best = np.argpartition(-self.frequency[lo:hi], MAX_PREFIX_WORDS - 1)[:MAX_PREFIX_WORDS]
+            return [self.vocabulary[lo + i] for i in best]
+        return self.vocabulary[lo:hi]
+
+    def typo_words(self, word):
+        """
+        Vocabulary words within the tolerated edit distance of word, with their distance
+        """
+        limit = max_typos(word)
+        if not limit:
+            return {}
+        found = {}
+        for variant in deletes(word, limit):
+            for candidate in self.deletions.get(variant, ()):
+                if candidate not in found:
+                    found[candidate] = bounded_distance(word, candidate, limit)
+        return {candidate: distance for candidate, distance in found.items() if distance <= limit}
+
+    def word_scores(self, word, last, n_rows):
+        """
+        How well every row matches one query word: exact, by prefix if it is
+        the last (possibly unfinished) word, or with typos
+        """
+        scores = np.zeros(n_rows, dtype=np.float32)
+        matches = {}
+        for candidate, distance in self.typo_words(word).items():
+            matches[candidate] = 1.0 - TYPO_PENALTY * distance
+        if last:
+            for candidate in self.prefix_words(word):
+                matches[candidate] = max(matches.get(candidate, 0.0), PREFIX_WORD_SCORE)
+        if word in self.postings:
+            matches[word] = 1.0
+        for candidate, score in matches.items():
+            rows = self.postings[candidate]
+            scores[rows] = np.maximum(scores[rows], score)
+        return scores
+
 
 class Search:
     """
     Search feature for landing page
     """
 
-    df = pd.read_csv(project_dir + "/data/movies.csv")
+    catalog = get_catalog()
+    index = None
+    trigram_index = None
+    ranked_index = None
+    _index_lock = threading.Lock()
 
     def __init__(self):
-        pass
+        # The indexes are built once and shared by every Search instance
+        if Search.index is None:
+            with Search._index_lock:
+                if Search.index is None:
+                    prefix_index = PrefixIndex(self.catalog.titles)
+                    Search.trigram_index = TrigramIndex(prefix_index.lowered)
+                    Search.index = prefix_index
+
+    @property
+    def df(self):
+        """
+        Frame of the movie catalog, decoded on first use
+        """
+        return self.catalog.frame
 
-    def starts_with(self, word):
+    def starts_with(self, word, limit=None):
         """
         Function to check movie prefix
         """
-        n = len(word)
-        res = []
         word = word.lower()
-        for x in self.df["title"]:
-            curr = x.lower()
-            if curr[:n] == word:
-                res.append(x)
-        return res
+        return [self.index.titles[row] for row in self.index.matches(word, limit)]
 
-    def anywhere(self, word, visited_words):
+    def anywhere(self, word, visited_words, limit=None):
         """
         Function to check visited words
         """
         res = []
+        if limit is not None and limit <= 0:
+            return res
         word = word.lower()
-        for x in self.df["title"]:
+        titles = self.index.titles
+        lowered = self.index.lowered
+        for row in self.trigram_index.candidates(word):
+            x = titles[row]
             if x not in visited_words:
-                curr = x.lower()
-                if word in curr:
+                if word in lowered[row]:
                     res.append(x)
+                    if len(res) == limit:
+                        break
         return res
 
-    def results(self, word):
+    def results(self, word, limit=None):
         """
         Function to serve the result render
         """
-        starts_with = self.starts_with(word)
+        starts_with = self.starts_with(word, limit)
         visited_words = set()
         for x in starts_with:
             visited_words.add(x)
-        anywhere = self.anywhere(word, visited_words)
+        remaining = None if limit is None else limit - len(starts_with)
+        anywhere = self.anywhere(word, visited_words, remaining)
         starts_with.extend(anywhere)
         return starts_with
 
@@ -67,6 +297,68 @@ class Search:
         """
         Function to get top 10 results
         """
-        return self.results(word)[:10]
+        return self.results(word, 10)
+
+    def build_ranked_index(self):
+        """
+        Builds the index of ranked_results once, called by the warm-up thread
+        """
+        if Search.ranked_index is None:
+            with Search._index_lock:
+                if Search.ranked_index is None:
+                    Search.ranked_index = RankedIndex(
+                        self.index.lowered,
+                        self.catalog.movie_ids,
+                        project_dir + "/data/ratings.csv",
+                    )
+        return Search.ranked_index
+
+    def ranked_results(self, word, limit=10, budget_ms=RANKED_BUDGET_MS):
+        """
+        Function to get results ranked by prefix, word boundary, typo-tolerant
+        word matches and popularity, within a time budget per query
+        """
+        word = word.lower()
+        query_words = WORD_PATTERN.findall(word)
+        if not query_words:
+            return self.results(word, limit)
+
+        ranked_index = self.build_ranked_index()
+        deadline = time.perf_counter() + budget_ms / 1000
 
+        n_rows = len(self.index.titles)
+        scores = np.zeros(n_rows, dtype=np.float32)
+        for i, query_word in enumerate(query_words):
+            scores += ranked_index.word_scores(query_word, i == len(query_words) - 1, n_rows)
+            if time.perf_counter() > deadline:
+                break
+        matched = np.flatnonzero(scores)
+        if len(matched) == 0:
+            # No word matched even with typos, fall back to plain substring matches
+            return self.results(word, limit)
+        if len(matched) > MAX_RANKED_CANDIDATES:
+            matched = matched[np.argpartition(-scores[matched], MAX_RANKED_CANDIDATES - 1)[:MAX_RANKED_CANDIDATES]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        totals = scores + POPULARITY_WEIGHT * ranked_index.popularity
 
+        # Whole-query bonuses for the best candidates while time remains; past the
+        # deadline the rest keep their word scores, so results degrade rather than vanish
+        ranked = []
+        rows = matched.tolist()
+        for i, row in enumerate(rows):
+            if time.perf_counter() > deadline:
+                ranked.extend((-totals[rest], rest) for rest in rows[i:])
+                break
+            title = self.index.lowered[row]
+            total = totals[row]
+            if title.startswith(word):
+                total += TITLE_PREFIX_BONUS
+            else:
+                position = title.find(word)
+                if position > 0 and not title[position - 1].isalnum():
+                    total += WORD_BOUNDARY_BONUS
+                elif position > 0:
+                    total += SUBSTRING_BONUS
+            ranked.append((-total, row))
+        ranked.sort()
+        return [self.index.titles[row] for _, row in ranked[:limit]]
@@ -17,7 +17,8 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from flask import jsonify
 
-import pandas as pd
+# Entries kept in each user's friend activity timeline
+FRIEND_TIMELINE_LENGTH = 100
 
 
 def create_colored_tags(genres):
@@ -175,6 +176,15 @@ def add_friend(db, username, user_id):
             "INSERT INTO Friends(idUsers, idFriend) VALUES (%s, %s), (%s, %s);",
             (user_id, friend_id, friend_id, user_id),
         )
+        # Each new friend's recent reviews join the other's timeline
+        for follower, friend in ((user_id, friend_id), (friend_id, user_id)):
+            executor.execute(
+                "INSERT IGNORE INTO FriendActivity (user_id, time, rating_id, friend_id) \
+                    SELECT %s, time, idRatings, user_id FROM Ratings WHERE user_id = %s \
+                    ORDER BY time DESC LIMIT %s;",
+                (follower, friend, FRIEND_TIMELINE_LENGTH),
+            )
+        trim_friend_activity(db, [user_id, friend_id])
         db.commit()
     else:
         raise ValueError("Friend not found in the database")
@@ -197,31 +207,239 @@ def login_to_account(db, username, password):
     return result[0][0]
 
 
-def submit_review(db, user, movie, score, review):
+def submit_review(db, user, movie, score, review, wall=None):
     """
-    Utility function for submitting a movie review to the database.
+    Utility function for submitting a movie review to the database,
+    writing it through to the wall feed cache when one is given.
     """
     with db.cursor() as executor:
         # Check if the movie exists
-        executor.execute("SELECT idMovies FROM Movies WHERE name = %s", [movie])
+        executor.execute("SELECT idMovies, imdb_id FROM Movies WHERE name = %s", [movie])
         result = executor.fetchone()
         
         if not result:
             raise ValueError("Movie not found")
         
-        movie_id = result[0]
-        timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        movie_id, imdb_id = result[0], result[1]
+        timestamp = datetime.datetime.utcnow().replace(microsecond=0)
         
         # Insert review into Ratings table
         executor.execute(
             "INSERT INTO Ratings (user_id, movie_id, score, review, time) VALUES (%s, %s, %s, %s, %s);",
-            (user, movie_id, score, review, timestamp)
+            (user, movie_id, score, review, timestamp.strftime("%Y-%m-%d %H:%M:%S"))
         )
+        rating_id = executor.lastrowid
+
+        # Fan the review out to the timelines of its author's friends, in the same transaction
+        executor.execute("SELECT idFriend FROM Friends WHERE idUsers = %s;", [user])
+        followers = [row[0] for row in executor.fetchall()]
+        if followers:
+            executor.executemany(
+                "INSERT INTO FriendActivity (user_id, time, rating_id, friend_id) VALUES (%s, %s, %s, %s);",
+                [(follower, timestamp.strftime("%Y-%m-%d %H:%M:%S"), rating_id, user) for follower in followers],
+            )
+            trim_friend_activity(db, followers)
         db.commit()
+
+        if wall is not None:
+            executor.execute("SELECT username FROM Users WHERE idUsers = %s;", [user])
+            username = executor.fetchone()[0]
+            wall.add({
+                "idRatings": rating_id,
+                "name": movie,
+                "imdb_id": imdb_id,
+                "review": review,
+                "score": score,
+                "username": username,
+                "time": timestamp,
+            })
         
     return f"Review for '{movie}' submitted successfully"
 
 
+def get_movie_details(db, titles):
+    """
+    Utility function for fetching the id, overview and streaming platforms
+    of many movies by name in a single query
+    """
+    titles = list(dict.fromkeys(titles))
+    if not titles:
+        return {}
+    placeholders = ", ".join(["%s"] * len(titles))
+    executor = db.cursor()
+    executor.execute(
+        f"SELECT idMovies, name, overview, streaming_platforms FROM Movies \
+            WHERE name IN ({placeholders}) ORDER BY idMovies;",
+        titles,
+    )
+    details = {}
+    for movie_id, name, overview, streaming_platforms in executor.fetchall():
+        # Keep the first row when a name appears more than once
+        details.setdefault(
+            name,
+            {
+                "id": movie_id,
+                "title": name,
+                "overview": overview,
+                "streaming_platforms": (streaming_platforms or "").replace("|", ", "),
+            },
+        )
+    executor.close()
+    return details
+
+
+def get_new_ratings(db, after_id, limit=1000):
+    """
+    Utility function for fetching the ratings added after a given idRatings,
+    oldest first, as (idRatings, user_id, imdb_id, score) rows
+    """
+    executor = db.cursor()
+    executor.execute(
+        "SELECT idRatings, user_id, imdb_id, score FROM Ratings JOIN Movies \
+            ON Ratings.movie_id = Movies.idMovies WHERE idRatings > %s \
+            ORDER BY idRatings LIMIT %s;",
+        (after_id, limit),
+    )
+    rows = executor.fetchall()
+    executor.close()
+    return rows
+
+
+def get_user_ratings(db, user):
+    """
+    Utility function for fetching every review score of a user, oldest
+    first, as (imdb_id, score) rows
+    """
+    executor = db.cursor()
+    executor.execute(
+        "SELECT imdb_id, score FROM Ratings JOIN Movies \
+            ON Ratings.movie_id = Movies.idMovies WHERE user_id = %s \
+            ORDER BY idRatings;",
+        [int(user)],
+    )
+    rows = executor.fetchall()
+    executor.close()
+    return rows
+
+
+def get_rating_history(db):
+    """
+    Utility function for fetching every review score, oldest first, as
+    (user_id, imdb_id, score) rows
+    """
+    executor = db.cursor()
+    executor.execute(
+        "SELECT user_id, imdb_id, score FROM Ratings JOIN Movies \
+            ON Ratings.movie_id = Movies.idMovies ORDER BY idRatings;"
+    )
+    rows = executor.fetchall()
+    executor.close()
+    return rows
+
+
+def get_watchlist_history(db):
+    """
+    Utility function for fetching every watchlisted movie as (user_id, imdb_id) rows
+    """
+    executor = db.cursor()
+    executor.execute(
+        "SELECT user_id, imdb_id FROM Watchlist JOIN Movies \
+            ON Watchlist.movie_id = Movies.idMovies ORDER BY Watchlist.id;"
+    )
+    rows = executor.fetchall()
+    executor.close()
+    return rows
+
+
+def get_movie_ids_by_imdb_id(db):
+    """
+    Utility function for mapping the imdb id of every movie to its idMovies
+    """
+    executor = db.cursor()
+    executor.execute("SELECT imdb_id, idMovies FROM Movies;")
+    ids = dict(executor.fetchall())
+    executor.close()
+    return ids
+
+
+def save_user_recommendations(db, recommendations, model_version, batch_size=1000):
+    """
+    Utility function for replacing the precomputed recommendations of some
+    users; recommendations maps each user id to a ranked list of
+    (idMovies, score) pairs, written with batched multi-row inserts
+    """
+    computed_at = datetime.datetime.now()
+    users = list(recommendations)
+    executor = db.cursor()
+    for start in range(0, len(users), batch_size):
+        batch = users[start:start + batch_size]
+        placeholders = ", ".join(["%s"] * len(batch))
+        executor.execute(
+            f"DELETE FROM UserRecommendations WHERE user_id IN ({placeholders});", batch
+        )
+        rows = [
+            (user, position, movie_id, float(score), model_version, computed_at)
+            for user in batch
+            for position, (movie_id, score) in enumerate(recommendations[user])
+        ]
+        if rows:
+            executor.executemany(
+                "INSERT INTO UserRecommendations (user_id, position, movie_id, score, \
+                    model_version, computed_at) VALUES (%s, %s, %s, %s, %s, %s);",
+                rows,
+            )
+        # One transaction per batch, so readers never see a user half written
+        db.commit()
+    executor.close()
+
+
+def prune_user_recommendations(db, keep, batch_size=1000):
+    """
+    Utility function for deleting the precomputed recommendations of every
+    user not in keep, such as users whose history was cleared since the last
+    refresh; returns the number of users deleted
+    """
+    keep = set(keep)
+    executor = db.cursor()
+    executor.execute("SELECT DISTINCT user_id FROM UserRecommendations;")
+    stale = [user for (user,) in executor.fetchall() if user not in keep]
+    for start in range(0, len(stale), batch_size):
+        batch = stale[start:start + batch_size]
+        placeholders = ", ".join(["%s"] * len(batch))
+        executor.execute(
+            f"DELETE FROM UserRecommendations WHERE user_id IN ({placeholders});", batch
+        )
+        db.commit()
+    executor.close()
+    return len(stale)
+
+
+def get_user_recommendations(db, user, limit=10):
+    """
+    Utility function for fetching the precomputed recommendations of a user,
+    best first, with the same movie fields as get_movie_details and the score
+    """
+    executor = db.cursor()
+    executor.execute(
+        "SELECT idMovies, name, overview, streaming_platforms, score \
+            FROM UserRecommendations JOIN Movies ON UserRecommendations.movie_id = Movies.idMovies \
+            WHERE user_id = %s ORDER BY position LIMIT %s;",
+        (int(user), int(limit)),
+    )
+    recommendations = [
+        {
+            "id": movie_id,
+            "title": name,
+            "overview": overview,
+            "streaming_platforms": (streaming_platforms or "").replace("|", ", "),
+            "score": score,
+        }
+        for movie_id, name, overview, streaming_platforms, score in executor.fetchall()
+    ]
+    executor.close()
+    return recommendations
+
+
 def get_wall_posts(db):
     """
     Utility function for creating getting wall posts from the db
@@ -241,6 +459,103 @@ def get_wall_posts(db):
     return jsonify(json_data)
 
 
+def get_feed_page(db, before=None, after=None, limit=50):
+    """
+    Utility function for fetching a page of wall posts, newest first, as
+    dicts with the fields of get_wall_posts plus idRatings; before and after
+    are (time, idRatings) keys the page starts below or above
+    """
+    executor = db.cursor()
+    if before is not None:
+        executor.execute(
+            "SELECT r.idRatings, m.name, m.imdb_id, r.review, r.score, u.username, r.time \
+                FROM Ratings AS r JOIN Movies AS m ON m.idMovies = r.movie_id \
+                JOIN Users AS u ON u.idUsers = r.user_id \
+                WHERE r.time < %s OR (r.time = %s AND r.idRatings < %s) \
+                ORDER BY r.time DESC, r.idRatings DESC LIMIT %s;",
+            (before[0], before[0], before[1], limit),
+        )
+    elif after is not None:
+        executor.execute(
+            "SELECT r.idRatings, m.name, m.imdb_id, r.review, r.score, u.username, r.time \
+                FROM Ratings AS r JOIN Movies AS m ON m.idMovies = r.movie_id \
+                JOIN Users AS u ON u.idUsers = r.user_id \
+                WHERE r.time > %s OR (r.time = %s AND r.idRatings > %s) \
+                ORDER BY r.time, r.idRatings LIMIT %s;",
+            (after[0], after[0], after[1], limit),
+        )
+    else:
+        executor.execute(
+            "SELECT r.idRatings, m.name, m.imdb_id, r.review, r.score, u.username, r.time \
+                FROM Ratings AS r JOIN Movies AS m ON m.idMovies = r.movie_id \
+                JOIN Users AS u ON u.idUsers = r.user_id \
+                ORDER BY r.time DESC, r.idRatings DESC LIMIT %s;",
+            (limit,),
+        )
+    rows = [x[0] for x in executor.description]
+    posts = [dict(zip(rows, r)) for r in executor.fetchall()]
+    executor.close()
+    if after is not None:
+        # Fetched oldest first to take the posts just above the key
+        posts.reverse()
+    return posts
+
+
+def trim_friend_activity(db, users):
+    """
+    Utility function for dropping all but the newest FRIEND_TIMELINE_LENGTH
+    entries of some users' friend activity timelines
+    """
+    if not users:
+        return
+    placeholders = ", ".join(["%s"] * len(users))
+    executor = db.cursor()
+    executor.execute(
+        f"DELETE activity FROM FriendActivity AS activity JOIN \
+            (SELECT user_id, time, rating_id, ROW_NUMBER() OVER \
+                (PARTITION BY user_id ORDER BY time DESC, rating_id DESC) AS position \
+            FROM FriendActivity WHERE user_id IN ({placeholders})) AS ranked \
+            USING (user_id, time, rating_id) WHERE ranked.position > %s;",
+        [*users, FRIEND_TIMELINE_LENGTH],
+    )
+    executor.close()
+
+
+def get_friend_activity(db, user, before=None, limit=50):
+    """
+    Utility function for reading a user's friend activity timeline, newest
+    first, below an optional (time, idRatings) key
+    """
+    executor = db.cursor()
+    if before is not None:
+        executor.execute(
+            "SELECT activity.rating_id AS idRatings, u.username, m.name AS movie_name, m.imdb_id, \
+                r.score, r.review, activity.time FROM FriendActivity AS activity \
+                JOIN Ratings AS r ON r.idRatings = activity.rating_id \
+                JOIN Movies AS m ON m.idMovies = r.movie_id \
+                JOIN Users AS u ON u.idUsers = activity.friend_id \
+                WHERE activity.user_id = %s AND (activity.time < %s \
+                    OR (activity.time = %s AND activity.rating_id < %s)) \
+                ORDER BY activity.time DESC, activity.rating_id DESC LIMIT %s;",
+            (int(user), before[0], before[0], before[1], limit),
+        )
+    else:
+        executor.execute(
+            "SELECT activity.rating_id AS idRatings, u.username, m.name AS movie_name, m.imdb_id, \
+                r.score, r.review, activity.time FROM FriendActivity AS activity \
+                JOIN Ratings AS r ON r.idRatings = activity.rating_id \
+                JOIN Movies AS m ON m.idMovies = r.movie_id \
+                JOIN Users AS u ON u.idUsers = activity.friend_id \
+                WHERE activity.user_id = %s \
+                ORDER BY activity.time DESC, activity.rating_id DESC LIMIT %s;",
+            (int(user), limit),
+        )
+    rows = [x[0] for x in executor.description]
+    activity = [dict(zip(rows, r)) for r in executor.fetchall()]
+    executor.close()
+    return activity
+
+
 def get_recent_movies(db, user):
     """
     Utility function for getting recent movies reviewed by a user
@@ -311,6 +626,49 @@ def get_recent_friend_movies(db, friend_username):
         cursor.close()
 
 
+def get_friends_recent_movies(db, user, usernames=None, limit=5):
+    """
+    Utility function for fetching the most recent movies of many of a user's
+    friends with one windowed query, as a dict from each friend's username to
+    their reviews, newest first; all friends when no usernames are given, and
+    usernames of users who are not friends are left out
+    """
+    executor = db.cursor()
+    if usernames:
+        placeholders = ", ".join(["%s"] * len(usernames))
+        executor.execute(
+            f"SELECT username, movie_name, score, time FROM \
+                (SELECT u.username, m.name AS movie_name, r.score, r.time, ROW_NUMBER() OVER \
+                    (PARTITION BY u.idUsers ORDER BY r.time DESC, r.idRatings DESC) AS position \
+                FROM Friends AS f JOIN Users AS u ON u.idUsers = f.idFriend \
+                LEFT JOIN Ratings AS r ON r.user_id = u.idUsers \
+                LEFT JOIN Movies AS m ON m.idMovies = r.movie_id \
+                WHERE f.idUsers = %s AND u.username IN ({placeholders})) AS ranked \
+            WHERE position <= %s ORDER BY username, position;",
+            [int(user), *usernames, limit],
+        )
+    else:
+        executor.execute(
+            "SELECT username, movie_name, score, time FROM \
+                (SELECT u.username, m.name AS movie_name, r.score, r.time, ROW_NUMBER() OVER \
+                    (PARTITION BY u.idUsers ORDER BY r.time DESC, r.idRatings DESC) AS position \
+                FROM Friends AS f JOIN Users AS u ON u.idUsers = f.idFriend \
+                LEFT JOIN Ratings AS r ON r.user_id = u.idUsers \
+                LEFT JOIN Movies AS m ON m.idMovies = r.movie_id \
+                WHERE f.idUsers = %s) AS ranked \
+            WHERE position <= %s ORDER BY username, position;",
+            [int(user), limit],
+        )
+    movies = {}
+    for username, movie_name, score, time in executor.fetchall():
+        reviews = movies.setdefault(username, [])
+        # A friend with no reviews comes back as one row of NULLs
+        if movie_name is not None:
+            reviews.append({"movie_name": movie_name, "score": score, "time": time})
+    executor.close()
+    return movies
+
+
 def get_friends(db, user):
     """
     Utility function for getting the current users friends
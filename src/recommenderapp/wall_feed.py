@@ -0,0 +1,178 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+"""
+
+import bisect
+import datetime
+import threading
+import time
+
+# Posts per page of the wall, and the most a client may ask for
+FEED_PAGE_SIZE = 50
+MAX_FEED_PAGE = 100
+
+
+def post_key(post):
+    """
+    The (time, idRatings) key posts are ordered and paged by
+    """
+    return (post["time"], post["idRatings"])
+
+
+def encode_cursor(post):
+    """
+    Opaque cursor of a post, passed back as before or after to page from it
+    """
+    return f"{post['time'].isoformat()}_{post['idRatings']}"
+
+
+def decode_cursor(cursor):
+    """
+    The (time, idRatings) key of a cursor, or ValueError if it is malformed
+    """
+    stamp, _, rating_id = cursor.rpartition("_")
+    return (datetime.datetime.fromisoformat(stamp), int(rating_id))
+
+
+class WallFeed:
+    """
+    Write-through cache of the newest wall posts, serving the pages that fall
+    inside it from memory and the older ones with a keyset query
+    """
+
+    def __init__(self, fetch, capacity=500, ttl=5.0, clock=time.monotonic):
+        """
+        fetch is a function like utils.get_feed_page, capacity the number of
+        newest posts kept, and ttl the seconds after which posts written by
+        other workers are fetched in
+        """
+        self.fetch = fetch
+        self.capacity = capacity
+        self.ttl = ttl
+        self.clock = clock
+        # Newest posts, oldest first, with their keys alongside for bisect
+        self._posts = []
+        self._keys = []
+        # Whether the cached posts are every post there is
+        self._complete = False
+        self._loaded_at = None
+        # Key of the newest post fetched from the db; posts written through
+        # may be newer than ones other workers committed just before them
+        self._synced = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def page(self, db, before=None, after=None, limit=FEED_PAGE_SIZE):
+        """
+        Up to limit posts, newest first, below the before key, above the after
+        key, or the newest ones when neither is given
+        """
+        self._refresh(db)
+        with self._lock:
+            posts = self._cached_page(before, after, limit)
+            if posts is not None:
+                self._hits += 1
+                return posts
+            self._misses += 1
+        return self.fetch(db, before=before, after=after, limit=limit)
+
+    def _cached_page(self, before, after, limit):
+        """
+        The page from memory, or None if part of it may lie beyond the cached posts
+        """
+        if self._loaded_at is None:
+            return None
+        if after is not None:
+            if not self._complete and (not self._keys or after < self._keys[0]):
+                return None
+            start = bisect.bisect_right(self._keys, after)
+            return self._posts[start:start + limit][::-1]
+        end = len(self._keys) if before is None else bisect.bisect_left(self._keys, before)
+        if end < limit and not self._complete:
+            return None
+        return self._posts[max(end - limit, 0):end][::-1]
+
+    def _refresh(self, db):
+        """
+        Loads the newest posts on first use, then every ttl seconds fetches
+        in the posts newer than the cached ones
+        """
+        now = self.clock()
+        with self._lock:
+            if self._loaded_at is not None and now - self._loaded_at < self.ttl:
+                return
+            head = self._synced
+            loaded = self._loaded_at is not None
+        if not loaded or head is None:
+            posts = self.fetch(db, limit=self.capacity)
+            with self._lock:
+                self._replace(posts[::-1], len(posts) < self.capacity, now)
+            return
+        newer = self.fetch(db, after=head, limit=self.capacity)
+        if len(newer) >= self.capacity:
+            # Too far behind to patch, the newest posts are all new
+            posts = self.fetch(db, limit=self.capacity)
+            with self._lock:
+                self._replace(posts[::-1], False, now)
+            return
+        with self._lock:
+            for post in reversed(newer):
+                self._insert(post)
+            if newer:
+                self._synced = post_key(newer[0])
+            self._loaded_at = now
+
+    def _replace(self, posts, complete, now):
+        self._posts = list(posts)
+        self._keys = [post_key(post) for post in self._posts]
+        self._complete = complete
+        self._loaded_at = now
+        self._synced = self._keys[-1] if self._keys else None
+
+    def _insert(self, post):
+        """
+        Adds a post in key order, dropping the oldest beyond capacity
+        """
+        key = post_key(post)
+        index = bisect.bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            return
+        self._keys.insert(index, key)
+        self._posts.insert(index, post)
+        if len(self._posts) > self.capacity:
+            del self._posts[0]
+            del self._keys[0]
+            self._complete = False
+
+    def add(self, post):
+        """
+        Writes a newly submitted post through to the cache
+        """
+        with self._lock:
+            if self._loaded_at is not None:
+                self._insert(post)
+
+    def clear(self):
+        """
+        Drops every cached post
+        """
+        with self._lock:
+            self._replace([], False, None)
+
+    def metrics(self):
+        """
+        Usage counters of the cache
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "posts": len(self._posts),
+                "capacity": self.capacity,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
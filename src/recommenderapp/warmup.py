@@ -0,0 +1,90 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+"""
+
+import threading
+import time
+
+
+class Deferred:
+    """
+    A value built on first use, or ahead of time by a warm-up thread
+    """
+
+    def __init__(self, name, build):
+        """
+        build is a zero-argument callable returning the value; it is where
+        heavy modules should be imported
+        """
+        self.name = name
+        self.build = build
+        self._value = None
+        self._ready = False
+        self._error = None
+        self._load_seconds = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        """
+        Whether the value has been built
+        """
+        return self._ready
+
+    def get(self):
+        """
+        The value, built now if no one has built it yet; a failed build is retried
+        """
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    start = time.perf_counter()
+                    try:
+                        self._value = self.build()
+                    except Exception as e:
+                        self._error = f"{type(e).__name__}: {e}"
+                        raise
+                    self._load_seconds = time.perf_counter() - start
+                    self._error = None
+                    self._ready = True
+        return self._value
+
+    def replace(self, value):
+        """
+        Swaps in a new value, e.g. a reloaded model; callers holding the old one keep it
+        """
+        with self._lock:
+            self._value = value
+            self._error = None
+            self._ready = True
+
+    def status(self):
+        """
+        Readiness of the value, for the /ready endpoint
+        """
+        return {
+            "ready": self._ready,
+            "error": self._error,
+            "load_seconds": self._load_seconds,
+        }
+
+
+def warm_up(*deferred):
+    """
+    Builds the values one after the other in a background daemon thread
+    """
+
+    def run():
+        for value in deferred:
+            try:
+                value.get()
+            except Exception:  # pylint: disable=broad-except
+                # Recorded in the status and retried by the first request needing it
+                pass
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
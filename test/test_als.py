@@ -0,0 +1,93 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for the latent-factor recommender
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# pylint: disable=wrong-import-position
+from src.prediction_scripts.als import ALSModel, load_als
+
+# pylint: enable=wrong-import-position
+
+warnings.filterwarnings("ignore")
+
+ratings = pd.read_csv("../data/ratings.csv", nrows=30000)
+model = ALSModel.fit(ratings, factors=16, iterations=8, workers=2)
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for ALS training and serving
+    """
+
+    def test_fits_ratings(self):
+        """
+        Test case 1
+        """
+        users = model.user_factors[model.user_position.get_indexer(ratings["userId"])]
+        items = model.item_factors[model.item_position.get_indexer(ratings["movieId"])]
+        predicted = (users * items).sum(axis=1) + model.mean
+        error = np.sqrt(((predicted - ratings["rating"]) ** 2).mean())
+        baseline = np.sqrt(((model.mean - ratings["rating"]) ** 2).mean())
+        self.assertLess(error, 0.8 * baseline)
+
+    def test_fold_in(self):
+        """
+        Test case 2
+        """
+        user = model.user_keys[0]
+        rated = ratings[ratings["userId"] == user]
+        vector = model.fold_in(rated["movieId"], rated["rating"])
+        self.assertGreater(np.corrcoef(vector, model.user_vector(user))[0, 1], 0.99)
+        self.assertIsNone(model.fold_in([-1], [5.0]))
+
+    def test_batched_top_k(self):
+        """
+        Test case 3
+        """
+        vectors = model.user_factors[:8]
+        seen = [ratings[ratings["userId"] == user]["movieId"].tolist() for user in model.user_keys[:8]]
+        batch = model.recommend_batch(vectors, 10, seen)
+        for vector, exclude, recommendations in zip(vectors, seen, batch):
+            movie_ids = [movie_id for movie_id, _ in recommendations]
+            top_scores = [score for _, score in recommendations]
+            single = model.recommend(vector, 10, exclude)
+            np.testing.assert_allclose([score for _, score in single], top_scores, rtol=1e-5)
+            self.assertFalse(set(exclude) & set(movie_ids))
+            # Same scores as a full sort, up to float32 rounding
+            scores = model.item_factors.dot(vector) + model.mean
+            scores[model.item_position.get_indexer(exclude)] = -np.inf
+            np.testing.assert_allclose(np.sort(scores)[::-1][:10], top_scores, rtol=1e-5)
+
+    def test_persisted(self):
+        """
+        Test case 4
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            ratings_path = os.path.join(tmp, "ratings.csv")
+            ratings[:5000].to_csv(ratings_path, index=False)
+            path = os.path.join(tmp, "als_factors.npz")
+            trained = load_als(ratings_path, path, factors=8, iterations=3, implicit=True)
+            loaded = load_als(ratings_path, path)
+            self.assertTrue(loaded.implicit)
+            np.testing.assert_array_equal(trained.item_factors, loaded.item_factors)
+            vector = loaded.user_factors[0]
+            self.assertEqual(trained.recommend(vector, 5), loaded.recommend(vector, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for the token verification cache
+"""
+
+import sys
+import time
+import unittest
+import warnings
+from pathlib import Path
+
+import jwt
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# pylint: disable=wrong-import-position
+from src.recommenderapp.auth import TokenVerifier, bearer_token
+
+# pylint: enable=wrong-import-position
+
+warnings.filterwarnings("ignore")
+
+SECRET_KEY = "test-secret"
+
+
+class Clock:
+    """
+    Manually advanced stand-in for time.time
+    """
+
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for the token verification cache
+    """
+
+    def test_cache(self):
+        """
+        Test case 1
+        """
+        verifier = TokenVerifier(SECRET_KEY, max_entries=2)
+        tokens = [jwt.encode({"user_id": user_id}, SECRET_KEY, algorithm="HS256") for user_id in range(3)]
+        self.assertEqual(0, verifier.user_id(tokens[0]))
+        self.assertEqual(0, verifier.user_id(tokens[0]))
+        self.assertEqual(1, verifier.user_id(tokens[1]))
+        self.assertEqual(2, verifier.user_id(tokens[2]))
+        self.assertEqual(0, verifier.user_id(tokens[0]))
+        metrics = verifier.metrics()
+        self.assertEqual(2, metrics["entries"])
+        self.assertEqual(1, metrics["hits"])
+        self.assertEqual(4, metrics["misses"])
+        self.assertEqual(tokens[1], bearer_token(f"Bearer {tokens[1]}"))
+        self.assertIsNone(bearer_token(f"Basic {tokens[1]}"))
+        self.assertIsNone(bearer_token(None))
+
+    def test_expiry(self):
+        """
+        Test case 2
+        """
+        clock = Clock()
+        verifier = TokenVerifier(SECRET_KEY, clock=clock)
+        token = jwt.encode({"user_id": 7, "exp": int(clock.now) + 60}, SECRET_KEY, algorithm="HS256")
+        self.assertEqual(7, verifier.user_id(token))
+        self.assertEqual(7, verifier.user_id(token))
+        self.assertEqual(1, verifier.metrics()["hits"])
+
+        # Past its exp the cached entry is not used, and the token is verified again
+        clock.now += 120
+        self.assertEqual(7, verifier.user_id(token))
+        self.assertEqual(2, verifier.metrics()["misses"])
+        expired = jwt.encode({"user_id": 7, "exp": int(time.time()) - 1}, SECRET_KEY, algorithm="HS256")
+        with self.assertRaises(jwt.ExpiredSignatureError):
+            verifier.user_id(expired)
+
+    def test_invalid(self):
+        """
+        Test case 3
+        """
+        verifier = TokenVerifier(SECRET_KEY)
+        with self.assertRaises(jwt.InvalidTokenError):
+            verifier.user_id(jwt.encode({"user_id": 1}, "other-secret", algorithm="HS256"))
+        with self.assertRaises(jwt.InvalidTokenError):
+            verifier.user_id(jwt.encode({"username": "someone"}, SECRET_KEY, algorithm="HS256"))
+        with self.assertRaises(jwt.InvalidTokenError):
+            verifier.user_id("not-a-token")
+        self.assertEqual(0, verifier.metrics()["entries"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for the shared movie catalog
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# pylint: disable=wrong-import-position
+from src.prediction_scripts.catalog import (
+    Catalog,
+    build_snapshot,
+    get_catalog,
+    snapshot_is_current,
+    snapshot_path,
+)
+from src.prediction_scripts.model import MovieRecommender
+from src.recommenderapp.search import Search
+
+# pylint: enable=wrong-import-position
+
+warnings.filterwarnings("ignore")
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for the shared movie catalog
+    """
+
+    def test_loaded_once(self):
+        """
+        Test case 1
+        """
+        recommender = MovieRecommender()
+        recommender.prepare_data("../data/movies.csv")
+        self.assertIs(Search.catalog, recommender.index)
+        self.assertIs(get_catalog("../data/movies.csv"), get_catalog("../data/../data/movies.csv"))
+
+    def test_read_only(self):
+        """
+        Test case 2
+        """
+        catalog = get_catalog("../data/movies.csv")
+        for array in (catalog.titles, catalog.movie_ids, catalog.genre_masks, catalog.genre_matrix()):
+            self.assertFalse(array.flags.writeable)
+        view = catalog.frame
+        view["extra"] = 1
+        self.assertNotIn("extra", catalog.frame.columns)
+
+    def test_dtypes(self):
+        """
+        Test case 3
+        """
+        frame = get_catalog("../data/movies.csv").frame
+        self.assertEqual("int32", str(frame["movieId"].dtype))
+        self.assertEqual("category", str(frame["genres"].dtype))
+
+    def test_genres(self):
+        """
+        Test case 4
+        """
+        catalog = get_catalog("../data/movies.csv")
+        row = catalog.title_index["Toy Story (1995)"]
+        genres = set(catalog.frame["genres"].iloc[row].split("|"))
+        matrix_genres = {
+            name for name, flag in zip(catalog.genre_names, catalog.genre_matrix()[row]) if flag
+        }
+        self.assertEqual(genres, matrix_genres)
+        self.assertEqual(len(genres), bin(int(catalog.genre_masks[row])).count("1"))
+
+    def test_memory_usage(self):
+        """
+        Test case 5
+        """
+        usage = get_catalog("../data/movies.csv").memory_usage()
+        self.assertEqual(usage["total"], sum(v for k, v in usage.items() if k != "total"))
+        self.assertTrue(usage["frame"] > 0)
+
+    def test_snapshot_round_trip(self):
+        """
+        Test case 6
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = build_snapshot("../data/movies.csv", os.path.join(tmp, "movies.snapshot"))
+            snapshot = Catalog.from_snapshot(path)
+            catalog = get_catalog("../data/movies.csv")
+            self.assertIsInstance(snapshot.genre_masks, np.memmap)
+            self.assertEqual(catalog.title_index, snapshot.title_index)
+            self.assertEqual(catalog.genre_names, snapshot.genre_names)
+            np.testing.assert_array_equal(catalog.genre_masks, snapshot.genre_masks)
+            pd.testing.assert_frame_equal(catalog.frame, snapshot.frame)
+
+    def test_snapshot_staleness(self):
+        """
+        Test case 7
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            movies_path = os.path.join(tmp, "movies.csv")
+            shutil.copyfile("../data/movies.csv", movies_path)
+            path = build_snapshot(movies_path)
+            self.assertEqual(snapshot_path(movies_path), path)
+            self.assertTrue(snapshot_is_current(movies_path, path))
+            self.assertIsInstance(get_catalog(movies_path).movie_ids, np.memmap)
+
+            with open(movies_path, "a", encoding="utf-8") as file:
+                file.write("\n")
+            self.assertFalse(snapshot_is_current(movies_path, path))
+
+
+if __name__ == "__main__":
+    unittest.main()
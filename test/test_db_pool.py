@@ -0,0 +1,152 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for the db connection pool
+"""
+
+import sys
+import threading
+import time
+import unittest
+import warnings
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# pylint: disable=wrong-import-position
+from src.recommenderapp.db_pool import ConnectionPool, PoolExhaustedError
+
+# pylint: enable=wrong-import-position
+
+warnings.filterwarnings("ignore")
+
+
+class FakeConnection:
+    """
+    Stand-in for a mysql.connector connection
+    """
+
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        """
+        Fails once the connection is marked dead
+        """
+        if not self.alive:
+            raise ConnectionError("gone away")
+
+    def rollback(self):
+        """
+        Counts rollbacks, failing once the connection is marked dead
+        """
+        if not self.alive:
+            raise ConnectionError("gone away")
+        self.rollbacks += 1
+
+    def close(self):
+        """
+        Marks the connection closed
+        """
+        self.closed = True
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for the db connection pool
+    """
+
+    def test_lazy_open(self):
+        """
+        Test case 1
+        """
+        opened = []
+        pool = ConnectionPool(lambda: opened.append(FakeConnection()) or opened[-1], size=3)
+        self.assertEqual(0, len(opened))
+        first = pool.acquire()
+        pool.release(first)
+        second = pool.acquire()
+        self.assertIs(first, second)
+        self.assertEqual(1, len(opened))
+        self.assertEqual(1, first.rollbacks)
+
+    def test_exhausted(self):
+        """
+        Test case 2
+        """
+        pool = ConnectionPool(FakeConnection, size=1, timeout=0.05)
+        pool.acquire()
+        with self.assertRaises(PoolExhaustedError):
+            pool.acquire()
+        metrics = pool.metrics()
+        self.assertEqual(1, metrics["in_use"])
+        self.assertEqual(1, metrics["waits"])
+        self.assertEqual(1, metrics["timeouts"])
+
+    def test_ping_replaces_dead(self):
+        """
+        Test case 3
+        """
+        pool = ConnectionPool(FakeConnection, size=1, ping_after=0)
+        first = pool.acquire()
+        pool.release(first)
+        first.alive = False
+        second = pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+        self.assertEqual(1, pool.metrics()["discarded"])
+
+    def test_waiter_gets_released(self):
+        """
+        Test case 4
+        """
+        pool = ConnectionPool(FakeConnection, size=1, timeout=5)
+        first = pool.acquire()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(pool.acquire()))
+        waiter.start()
+        pool.release(first)
+        waiter.join()
+        self.assertIs(first, result[0])
+        self.assertEqual(2, pool.metrics()["checkouts"])
+
+    def test_release_unknown(self):
+        """
+        Test case 5
+        """
+        pool = ConnectionPool(FakeConnection, size=1)
+        pool.release(FakeConnection())
+        self.assertEqual(0, pool.metrics()["idle"])
+        self.assertEqual(0, pool.metrics()["in_use"])
+
+    def test_waiter_gets_discarded_slot(self):
+        """
+        Test case 6
+        """
+        pool = ConnectionPool(FakeConnection, size=1, timeout=5)
+        first = pool.acquire()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(pool.acquire()))
+        waiter.start()
+        while pool.metrics()["waits"] == 0:
+            time.sleep(0.001)
+        # The failed rollback discards the connection, which must wake the waiter
+        first.alive = False
+        start = time.perf_counter()
+        pool.release(first)
+        waiter.join()
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertIsNot(first, result[0])
+        self.assertTrue(first.closed)
+        metrics = pool.metrics()
+        self.assertEqual(1, metrics["discarded"])
+        self.assertEqual(1, metrics["open"])
+        self.assertEqual(0, metrics["timeouts"])
+
+
+if __name__ == "__main__":
+    unittest.main()
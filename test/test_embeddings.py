@@ -0,0 +1,116 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for the content embeddings and their nearest-neighbour index
+"""
+
+import sys
+import unittest
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# pylint: disable=wrong-import-position
+from nltk.stem import PorterStemmer
+from src.prediction_scripts.catalog import CATALOG_DTYPES, Catalog
+from src.prediction_scripts.embeddings import IVFIndex, MovieEmbeddings, exact_search, normalize
+from src.prediction_scripts.model import MovieRecommender
+
+# pylint: enable=wrong-import-position
+
+warnings.filterwarnings("ignore")
+
+
+def clustered_vectors(n, dimensions, clusters, seed=0):
+    """
+    Unit vectors scattered around random cluster centres
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimensions))
+    vectors = centres[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dimensions))
+    return normalize(vectors.astype(np.float32))
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for similar-movie lookups
+    """
+
+    def test_probing_every_list_is_exact(self):
+        """
+        Test case 1
+        """
+        vectors = clustered_vectors(3000, 16, 40)
+        index = IVFIndex.build(vectors, n_lists=30)
+        self.assertEqual(len(vectors), len(index))
+        self.assertEqual(sorted(index.order.tolist()), list(range(len(vectors))))
+        for row in range(0, len(vectors), 97):
+            expected = exact_search(vectors, vectors[row], 10, [row])
+            found = index.search(vectors[row], 10, index.n_lists, [row])
+            np.testing.assert_array_equal(expected[0], found[0])
+            np.testing.assert_allclose(expected[1], found[1], rtol=1e-5)
+
+    def test_recall(self):
+        """
+        Test case 2
+        """
+        vectors = clustered_vectors(5000, 32, 60)
+        index = IVFIndex.build(vectors)
+        hits = 0
+        rows = range(0, len(vectors), 50)
+        for row in rows:
+            expected = set(exact_search(vectors, vectors[row], 10, [row])[0].tolist())
+            found = set(index.search(vectors[row], 10, 8, [row])[0].tolist())
+            hits += len(expected & found)
+        self.assertGreater(hits / (10 * len(rows)), 0.9)
+
+    def test_stemmed_content(self):
+        """
+        Test case 3
+        """
+        frame = pd.DataFrame(
+            {
+                "movieId": [1, 2, 3, 4],
+                "title": ["Racer (2001)", "Garden (2002)", "Racing (2003)", "Storm (2004)"],
+                "genres": ["Action", "Drama", "Action", "Thriller"],
+                "imdb_id": ["tt1", "tt2", "tt3", "tt4"],
+                "overview": [
+                    "A driver races cars through the desert",
+                    "An old gardener tends roses",
+                    "The racing driver raced a car",
+                    "Sailors caught in a storm at sea",
+                ],
+                "poster_path": ["/1.jpg", "/2.jpg", "/3.jpg", "/4.jpg"],
+                "runtime": [100.0, 90.0, 110.0, 95.0],
+                "streaming_platforms": ["", "", "", ""],
+            }
+        ).astype(CATALOG_DTYPES)
+        embeddings = MovieEmbeddings.build(Catalog.from_frame(frame), PorterStemmer(), dimensions=3)
+        np.testing.assert_allclose(np.linalg.norm(embeddings.vectors, axis=1), 1, rtol=1e-5)
+        rows, _ = embeddings.similar(0, 1, None, [0])
+        self.assertEqual([2], rows.tolist())
+
+    def test_similar_movies(self):
+        """
+        Test case 4
+        """
+        recommender = MovieRecommender()
+        recommender.prepare_data("../data/movies.csv")
+        similar = recommender.similar_movies("Toy Story (1995)", 10)
+        exact = recommender.similar_movies("Toy Story (1995)", 10, None)
+        self.assertEqual(10, len(exact))
+        self.assertNotIn("Toy Story (1995)", [movie["title"] for movie in similar + exact])
+        scores = [movie["similarity_score"] for movie in similar]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertLessEqual(scores[0], exact[0]["similarity_score"] + 1e-6)
+        self.assertEqual("Movie 'Not A Movie' not found in database.", recommender.similar_movies("Not A Movie"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,8 +24,11 @@ CREATE TABLE IF NOT EXISTS Movies (
   idMovies INT NOT NULL AUTO_INCREMENT,
   name VARCHAR(128) NOT NULL,
   imdb_id VARCHAR(45) NOT NULL,
+  overview TEXT,
+  streaming_platforms TEXT,
   PRIMARY KEY (idMovies),
-  UNIQUE INDEX imdb_id_UNIQUE (imdb_id ASC)
+  UNIQUE INDEX imdb_id_UNIQUE (imdb_id ASC),
+  INDEX name_idx (name ASC)
 );
 
 -- Create the Ratings table
@@ -37,7 +40,8 @@ CREATE TABLE IF NOT EXISTS Ratings (
   review VARCHAR(45) NULL,
   time DATETIME NOT NULL,
   PRIMARY KEY (idRatings),
-  INDEX user_id_idx (user_id ASC),
+  INDEX user_time_idx (user_id ASC, time ASC, movie_id, score),
+  INDEX time_idx (time ASC),
   INDEX movie_id_idx (movie_id ASC),
   CONSTRAINT user_id
     FOREIGN KEY (user_id)
@@ -56,6 +60,7 @@ CREATE TABLE IF NOT EXISTS Friends (
   idUsers INT NOT NULL,
   idFriend INT NOT NULL,
   PRIMARY KEY (idFriendship),
+  INDEX user_friend_idx (idUsers ASC, idFriend ASC),
   CONSTRAINT idUsers
     FOREIGN KEY (idUsers)
     REFERENCES Users (idUsers)
@@ -68,6 +73,47 @@ CREATE TABLE IF NOT EXISTS Friends (
     ON UPDATE NO ACTION
 ) ENGINE = InnoDB;
 
+-- Top recommendations of every user, written by src/recommenderapp/precompute.py
+CREATE TABLE IF NOT EXISTS UserRecommendations (
+  user_id INT NOT NULL,
+  position INT NOT NULL,
+  movie_id INT NOT NULL,
+  score FLOAT NOT NULL,
+  model_version VARCHAR(45) NOT NULL,
+  computed_at DATETIME NOT NULL,
+  PRIMARY KEY (user_id, position),
+  CONSTRAINT recommendation_user_id
+    FOREIGN KEY (user_id)
+    REFERENCES Users (idUsers)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION,
+  CONSTRAINT recommendation_movie_id
+    FOREIGN KEY (movie_id)
+    REFERENCES Movies (idMovies)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION
+) ENGINE = InnoDB;
+
+-- Recent reviews of every user's friends, newest first, pushed by submit_review
+-- and trimmed to the newest 100 per user
+CREATE TABLE IF NOT EXISTS FriendActivity (
+  user_id INT NOT NULL,
+  time DATETIME NOT NULL,
+  rating_id INT NOT NULL,
+  friend_id INT NOT NULL,
+  PRIMARY KEY (user_id, time, rating_id),
+  CONSTRAINT activity_user_id
+    FOREIGN KEY (user_id)
+    REFERENCES Users (idUsers)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION,
+  CONSTRAINT activity_rating_id
+    FOREIGN KEY (rating_id)
+    REFERENCES Ratings (idRatings)
+    ON DELETE CASCADE
+    ON UPDATE NO ACTION
+) ENGINE = InnoDB;
+
 
 INSERT INTO Movies (idMovies, name, imdb_id) VALUES (2, 'Ariel (1988)', 'tt0094675');
 INSERT INTO Movies (idMovies, name, imdb_id) VALUES (3, 'Shadows in Paradise (1986)', 'tt0092149');
@@ -0,0 +1,62 @@
+"""
+Copyright (c) 2023 Aditya Pai, Ananya Mantravadi, Rishi Singhal, Samarth Shetty
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for the genre-profile recommender for new users
+"""
+
+import sys
+import unittest
+import warnings
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# pylint: disable=wrong-import-position
+from src.prediction_scripts.catalog import get_catalog
+from src.recommenderapp.item_based import recommend_for_new_user
+
+# pylint: enable=wrong-import-position
+
+warnings.filterwarnings("ignore")
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for recommend_for_new_user
+    """
+
+    def test_genre_matrix_cached(self):
+        """
+        Test case 1
+        """
+        catalog = get_catalog()
+        genre_matrix = catalog.genre_matrix()
+        self.assertIs(genre_matrix, get_catalog().genre_matrix())
+        self.assertEqual(len(catalog), genre_matrix.shape[0])
+        self.assertTrue((genre_matrix.sum(axis=1) >= 1).all())
+
+    def test_shape(self):
+        """
+        Test case 2
+        """
+        titles, genres, imdb_ids = recommend_for_new_user(
+            [{"title": "Toy Story (1995)", "rating": 5.0}]
+        )
+        self.assertEqual(201, len(titles))
+        self.assertEqual(201, len(genres))
+        self.assertEqual(201, len(imdb_ids))
+
+    def test_best_match_shares_genres(self):
+        """
+        Test case 3
+        """
+        movies = get_catalog().frame
+        toy_story = set(movies[movies["title"] == "Toy Story (1995)"]["genres"].iloc[0].split("|"))
+        _, genres, _ = recommend_for_new_user([{"title": "Toy Story (1995)", "rating": 5.0}])
+        self.assertTrue(toy_story <= set(genres[0].split("|")))
+
+
+if __name__ == "__main__":
+    unittest.main()
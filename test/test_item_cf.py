@@ -0,0 +1,178 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for item-item collaborative filtering
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# pylint: disable=wrong-import-position
+from src.prediction_scripts.item_cf import (
+    IncrementalNeighbors,
+    ItemNeighbors,
+    load_neighbors,
+    rating_matrix,
+    top_k_neighbors,
+)
+from src.prediction_scripts.model import MovieRecommender
+from src.recommenderapp.rating_feed import RatingFeed
+from src.recommenderapp.warmup import Deferred
+
+# pylint: enable=wrong-import-position
+
+warnings.filterwarnings("ignore")
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for the item neighbour table
+    """
+
+    def test_matches_dense_cosine(self):
+        """
+        Test case 1
+        """
+        matrix, _ = rating_matrix(pd.read_csv("../data/ratings.csv", nrows=5000))
+        neighbors, scores = top_k_neighbors(matrix, k=10, block_size=64)
+        dense = matrix.toarray().astype(np.float64)
+        dense /= np.linalg.norm(dense, axis=1)[:, None]
+        similarity = dense.dot(dense.T)
+        np.fill_diagonal(similarity, 0)
+        for item in range(0, matrix.shape[0], 37):
+            expected = np.sort(similarity[item])[::-1][:10]
+            valid = neighbors[item] >= 0
+            np.testing.assert_allclose(expected[expected > 0], scores[item][valid], atol=1e-5)
+            np.testing.assert_allclose(similarity[item][neighbors[item][valid]], scores[item][valid], atol=1e-5)
+
+    def test_save_and_reload(self):
+        """
+        Test case 2
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            ratings_path = os.path.join(tmp, "ratings.csv")
+            pd.read_csv("../data/ratings.csv", nrows=2000).to_csv(ratings_path, index=False)
+            path = os.path.join(tmp, "item_neighbors.npz")
+            table = load_neighbors(ratings_path, path, k=5)
+            self.assertTrue(os.path.exists(path))
+            cached = ItemNeighbors.load(path)
+            self.assertEqual(table.source, cached.source)
+            np.testing.assert_array_equal(table.neighbors, cached.neighbors)
+            np.testing.assert_array_equal(table.scores, cached.scores)
+
+            movie_id = table.movie_ids[0]
+            similar, similarity = table.similar(movie_id)
+            self.assertNotIn(movie_id, similar)
+            self.assertEqual(list(similarity), sorted(similarity, reverse=True))
+            self.assertEqual(0, len(table.similar(-1)[0]))
+
+    def test_blended_recommendations(self):
+        """
+        Test case 3
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            ratings_path = os.path.join(tmp, "ratings.csv")
+            pd.read_csv("../data/ratings.csv").to_csv(ratings_path, index=False)
+            genres_only = MovieRecommender()
+            genres_only.prepare_data("../data/movies.csv")
+            blended = MovieRecommender()
+            blended.prepare_data("../data/movies.csv", ratings_path)
+
+        catalog = blended.index
+        row = catalog.title_index["Toy Story (1995)"]
+        neighbor_rows = blended.cf.rows[row]
+        self.assertTrue((neighbor_rows >= 0).any())
+
+        # Every recommendation scores its shared genres plus its weighted rating similarity
+        genre_scores = {
+            movie["title"]: movie["similarity_score"]
+            for movie in genres_only.recommend_many(["Toy Story (1995)"], len(catalog))
+        }
+        recommendations = blended.recommend("Toy Story (1995)", 20)
+        self.assertEqual(recommendations, blended.recommend_many(["Toy Story (1995)"], 20))
+        for movie in recommendations:
+            self.assertGreaterEqual(movie["similarity_score"], genre_scores[movie["title"]])
+        scores = [movie["similarity_score"] for movie in recommendations]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_incremental_matches_rebuild(self):
+        """
+        Test case 4
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            ratings_path = os.path.join(tmp, "ratings.csv")
+            ratings = pd.read_csv("../data/ratings.csv", nrows=20000)
+            ratings.to_csv(ratings_path, index=False)
+            table = ItemNeighbors.build(ratings_path, k=10)
+            incremental = IncrementalNeighbors.from_csv(ratings_path, table)
+
+        movies = ratings["movieId"].unique()
+        new = pd.DataFrame(
+            {
+                "userId": [1, 1, -1, -1, -2, 7],
+                "movieId": [movies[0], 999999, movies[0], movies[5], movies[5], movies[0]],
+                "rating": [1.0, 4.0, 5.0, 3.5, 2.0, 0.5],
+                "timestamp": ratings["timestamp"].max() + np.arange(1, 7),
+            }
+        )
+        for start in range(0, len(new), 2):
+            batch = new[start:start + 2]
+            updated = incremental.apply(batch["userId"], batch["movieId"], batch["rating"])
+            self.assertEqual(start // 2 + 1, updated.version)
+        self.assertEqual(0, table.version)
+
+        matrix, movie_ids = rating_matrix(pd.concat([ratings, new]))
+        _, scores = top_k_neighbors(matrix, k=10)
+        order = np.argsort(updated.movie_ids)
+        np.testing.assert_array_equal(movie_ids, updated.movie_ids[order])
+        np.testing.assert_allclose(scores, updated.scores[order], atol=1e-5)
+
+    def test_rating_feed(self):
+        """
+        Test case 5
+        """
+        model = MovieRecommender()
+        model.prepare_data("../data/movies.csv", "../data/ratings.csv")
+        catalog = model.index
+        row = catalog.title_index["Toy Story (1995)"]
+        imdb_id = catalog.column("imdb_id")[row]
+        reviews = [(3, 1, imdb_id, 10), (8, 2, imdb_id, 6), (9, 2, "not-in-catalog", 6)]
+
+        class Pool:
+            """
+            Stand-in for the connection pool
+            """
+
+            def acquire(self):
+                return "db"
+
+            def release(self, db):
+                pass
+
+        def fetch(db, after_id, limit):
+            return [review for review in reviews if review[0] > after_id][:limit]
+
+        feed = RatingFeed(Pool(), fetch, Deferred("recommender", lambda: model), batch_size=2)
+        self.assertEqual(0, feed.poll())
+        feed.recommender.get()
+        self.assertEqual(2, feed.poll())
+        self.assertEqual(9, feed.high_water)
+        self.assertEqual(0, feed.poll())
+        movie_id = catalog.movie_ids[row]
+        self.assertEqual(1, model.cf.table.version)
+        self.assertIn(movie_id, model.cf.table.movie_ids)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for the versioned model artifacts
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# pylint: disable=wrong-import-position
+from src.prediction_scripts.als import ALSModel
+from src.prediction_scripts.model import MovieRecommender
+from src.prediction_scripts import model_store
+from src.prediction_scripts.model_store import (
+    current_version,
+    load_artifact,
+    save_artifact,
+    versions,
+)
+
+# pylint: enable=wrong-import-position
+
+warnings.filterwarnings("ignore")
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for saving, verifying and loading artifacts
+    """
+
+    def test_versions_and_checksums(self):
+        """
+        Test case 1
+        """
+        with tempfile.TemporaryDirectory() as root:
+            self.assertIsNone(current_version("table", root))
+            with self.assertRaises(ValueError):
+                load_artifact("table", root)
+            for i in range(4):
+                version = save_artifact("table", {"values": np.arange(5) * i}, {"step": i}, root, keep=2)
+                self.assertEqual(i + 1, version)
+            self.assertEqual([3, 4], versions("table", root))
+            self.assertEqual(4, current_version("table", root))
+
+            arrays, manifest = load_artifact("table", root)
+            self.assertIsInstance(arrays["values"], np.memmap)
+            self.assertEqual([0, 3, 6, 9, 12], arrays["values"].tolist())
+            self.assertEqual({"step": 3}, manifest["metadata"])
+            self.assertEqual([0, 2, 4, 6, 8], load_artifact("table", root, 3)[0]["values"].tolist())
+
+            # Arrays unchanged since they were saved are not hashed again
+            with mock.patch.object(model_store, "file_checksum") as checksum:
+                load_artifact("table", root)
+            checksum.assert_not_called()
+
+            path = os.path.join(root, "table", "v4", "values.npy")
+            with open(path, "r+b") as file:
+                file.seek(-1, os.SEEK_END)
+                file.write(b"\xff")
+            with self.assertRaises(ValueError):
+                load_artifact("table", root, full_verify=True)
+            with open(path, "ab") as file:
+                file.write(b"\x00")
+            with self.assertRaises(ValueError):
+                load_artifact("table", root)
+
+    def test_recommender_artifact(self):
+        """
+        Test case 2
+        """
+        prepared = MovieRecommender()
+        prepared.prepare_data("../data/movies.csv", "../data/ratings.csv")
+        with tempfile.TemporaryDirectory() as root:
+            self.assertEqual(1, prepared.save_artifact("../data/movies.csv", root))
+            loaded = MovieRecommender()
+            self.assertEqual(1, loaded.load_artifact("../data/movies.csv", "../data/ratings.csv", root))
+
+            other_movies = os.path.join(root, "movies.csv")
+            pd.read_csv("../data/movies.csv", nrows=100).to_csv(other_movies, index=False)
+            with self.assertRaises(ValueError):
+                MovieRecommender().load_artifact(other_movies, root=root)
+
+        self.assertIsInstance(loaded.cf.rows, np.memmap)
+        for title in ("Toy Story (1995)", "Jumanji (1995)"):
+            self.assertEqual(prepared.recommend(title, 20), loaded.recommend(title, 20))
+            self.assertEqual(prepared.similar_movies(title, 10), loaded.similar_movies(title, 10))
+        self.assertEqual(1, loaded.update_ratings([-1], [int(loaded.index.movie_ids[0])], [4.0]))
+
+    def test_als_artifact(self):
+        """
+        Test case 3
+        """
+        ratings = pd.read_csv("../data/ratings.csv", nrows=5000)
+        model = ALSModel.fit(ratings, factors=8, iterations=3)
+        with tempfile.TemporaryDirectory() as root:
+            self.assertEqual(1, model.save_artifact(root))
+            loaded = ALSModel.from_artifact(root)
+        self.assertEqual(1, loaded.version)
+        self.assertAlmostEqual(model.mean, loaded.mean)
+        np.testing.assert_array_equal(model.item_factors, loaded.item_factors)
+        vector = model.user_factors[0]
+        self.assertEqual(model.recommend(vector, 5), loaded.recommend(vector, 5))
+
+    def test_model_version(self):
+        """
+        Test case 4
+        """
+        with tempfile.TemporaryDirectory() as root:
+            prepared = MovieRecommender()
+            prepared.prepare_data("../data/movies.csv", "../data/ratings.csv")
+            unsaved = prepared.model_version
+            prepared.save_artifact("../data/movies.csv", root)
+            first, second = MovieRecommender(), MovieRecommender()
+            first.load_artifact("../data/movies.csv", "../data/ratings.csv", root)
+            second.load_artifact("../data/movies.csv", "../data/ratings.csv", root)
+
+        # Recommenders serving the same data share a version, whatever process built them
+        self.assertEqual(first.model_version, second.model_version)
+        self.assertNotEqual(unsaved, first.model_version)
+        movie_id = int(first.index.movie_ids[0])
+        first.update_ratings([-1], [movie_id], [4.0], high_water=7)
+        self.assertNotEqual(first.model_version, second.model_version)
+        second.update_ratings([-1], [movie_id], [4.0], high_water=7)
+        self.assertEqual(first.model_version, second.model_version)
+        second.update_ratings([-2], [movie_id], [2.0])
+        self.assertNotEqual(first.model_version, second.model_version)
+        first.update_ratings([-2], [movie_id], [2.0])
+        self.assertNotEqual(first.model_version, second.model_version)
+
+
+if __name__ == "__main__":
+    unittest.main()
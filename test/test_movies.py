@@ -0,0 +1,170 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for the bulk movie import
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import warnings
+from pathlib import Path
+
+import mysql.connector
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# pylint: disable=wrong-import-position
+from src import movies
+
+# pylint: enable=wrong-import-position
+
+warnings.filterwarnings("ignore")
+
+
+class FakeServer:
+    """
+    Movies table keyed by imdb_id, shared by the fake connections
+    """
+
+    def __init__(self):
+        self.movies = {}
+        self.commits = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+
+class FakeCursor:
+    """
+    Cursor refusing whole batches that hold a movie named 'bad'
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def executemany(self, query, rows):
+        """
+        Stages the rows, or refuses the whole batch if one is bad
+        """
+        if any(row[0] == "bad" for row in rows):
+            raise mysql.connector.Error("Data too long for column 'name'")
+        self.connection.pending.extend(rows)
+
+    def execute(self, query, row):
+        """
+        Stages one row
+        """
+        self.executemany(query, [row])
+
+    def close(self):
+        """
+        Nothing to release
+        """
+
+
+class FakeConnection:
+    """
+    Stand-in for a mysql.connector connection with transactions
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.pending = []
+        with server.lock:
+            server.connections += 1
+
+    def cursor(self):
+        """
+        New cursor staging rows in this connection
+        """
+        return FakeCursor(self)
+
+    def commit(self):
+        """
+        Stores the staged rows on the server
+        """
+        with self.server.lock:
+            for row in self.pending:
+                self.server.movies[row[2]] = row
+            self.server.commits += 1
+        self.pending = []
+
+    def rollback(self):
+        """
+        Drops the staged rows
+        """
+        self.pending = []
+
+    def close(self):
+        """
+        Nothing to release
+        """
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for the bulk movie import
+    """
+
+    def test_parse_row(self):
+        """
+        Test case 1
+        """
+        row = {"title": "Heat (1995)", "genres": "Action|Crime", "imdb_id": "tt0113277",
+               "overview": "", "poster_path": "/h.jpg", "runtime": "170.0", "streaming_platforms": ""}
+        self.assertEqual(
+            ("Heat (1995)", "Action|Crime", "tt0113277", None, "/h.jpg", 170, None), movies.parse_row(row)
+        )
+        with self.assertRaises(ValueError):
+            movies.parse_row(dict(row, imdb_id=""))
+        with self.assertRaises(ValueError):
+            movies.parse_row(dict(row, title="x" * 200))
+        with self.assertRaises(ValueError):
+            movies.parse_row(dict(row, runtime="long"))
+
+    def test_batches_isolate_bad_rows(self):
+        """
+        Test case 2
+        """
+        server = FakeServer()
+        rows = [(f"Movie {i}", None, f"tt{i}", None, None, None, None) for i in range(25)]
+        rows[12] = ("bad", None, "tt12", None, None, None, None)
+        stored, rejected = movies.load_batches(FakeConnection(server), rows, batch_size=10)
+        self.assertEqual(24, stored)
+        self.assertEqual(["bad"], [title for title, _ in rejected])
+        self.assertEqual(24, len(server.movies))
+        self.assertEqual(3, server.commits)
+
+        # Rerunning upserts the same movies
+        self.assertEqual(24, movies.load_batches(FakeConnection(server), rows, batch_size=10)[0])
+        self.assertEqual(24, len(server.movies))
+
+    def test_parallel_import(self):
+        """
+        Test case 3
+        """
+        server = FakeServer()
+        original_connect = movies.connect
+        movies.connect = lambda **options: FakeConnection(server)
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "movies.csv")
+                frame = pd.read_csv("../data/movies.csv", nrows=5000)
+                frame.loc[7, "imdb_id"] = None
+                frame.to_csv(path, index=False)
+                stored, rejected = movies.import_csv_to_mysql(path, batch_size=500, workers=4)
+        finally:
+            movies.connect = original_connect
+        self.assertEqual(4999, stored)
+        self.assertEqual(1, len(rejected))
+        self.assertEqual(4, server.connections)
+        self.assertEqual(frame["imdb_id"].nunique(), len(server.movies))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for the per-user recommendation precompute job
+"""
+
+import sys
+import unittest
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# pylint: disable=wrong-import-position
+from src.recommenderapp.precompute import (
+    WATCHLIST_RATING,
+    init_worker,
+    precompute,
+    recommend_shard,
+    shards,
+    user_histories,
+)
+
+# pylint: enable=wrong-import-position
+
+warnings.filterwarnings("ignore")
+
+movies = pd.read_csv("../data/movies.csv", nrows=200)
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for the precompute job
+    """
+
+    def test_histories_and_shards(self):
+        """
+        Test case 1
+        """
+        histories = user_histories(
+            [(1, "tt1", 8), (2, "tt2", 4), (1, "tt1", 10)],
+            [(1, "tt1"), (1, "tt3"), (3, "tt4")],
+            0.5,
+        )
+        self.assertEqual({"tt1": 5.0, "tt3": WATCHLIST_RATING}, histories[1])
+        self.assertEqual({"tt2": 2.0}, histories[2])
+        self.assertEqual({"tt4": WATCHLIST_RATING}, histories[3])
+        parts = shards(histories, 2)
+        self.assertEqual([[1, 3], [2]], sorted([user for user, _ in part] for part in parts))
+
+    def test_precompute_matches_single_process(self):
+        """
+        Test case 2
+        """
+        imdb_ids = movies["imdb_id"].tolist()
+        histories = {
+            user: {imdb_id: 5.0 - (i % 4) for i, imdb_id in enumerate(imdb_ids[user:user + 5])}
+            for user in range(1, 40)
+        }
+        histories[99] = {"not-in-catalog": 5.0}
+        pooled = precompute(histories, processes=2, n_shards=5, n=10)
+        self.assertNotIn(99, pooled)
+        self.assertEqual(39, len(pooled))
+
+        init_worker("../data/movies.csv", "../data/ratings.csv")
+        single = recommend_shard(list(histories.items()), 10)
+        self.assertEqual(sorted(single), sorted(pooled))
+        for user, recs in pooled.items():
+            # Same ranking, up to float32 rounding of differently sized batches
+            np.testing.assert_allclose([score for _, score in single[user]], [score for _, score in recs], rtol=1e-5)
+            self.assertFalse(set(histories[user]) & {imdb_id for imdb_id, _ in recs})
+            scores = [score for _, score in recs]
+            self.assertEqual(scores, sorted(scores, reverse=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
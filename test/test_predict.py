@@ -8,6 +8,7 @@ This code is licensed under MIT license (see LICENSE for details)
 import sys
 import unittest
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
@@ -186,5 +187,47 @@ class Tests(unittest.TestCase):
         found = any("House Of 9 (2005)" == movie['title'] for movie in recommendations)
         self.assertTrue(found)
 
+    def test_many_matches_single(self):
+        """
+        Test case 21
+        """
+        single = recommender.recommend('Toy Story (1995)')
+        many = recommender.recommend_many(['Toy Story (1995)'])
+        self.assertEqual(single, many)
+
+    def test_many_excludes_inputs(self):
+        """
+        Test case 22
+        """
+        seeds = ['Toy Story (1995)', 'Iron Man (2008)', 'Not A Movie (1900)']
+        for aggregation in ('max', 'sum', 'rank'):
+            recommendations = recommender.recommend_many(seeds, 20, aggregation)
+            titles = [movie['title'] for movie in recommendations]
+            self.assertEqual(20, len(titles))
+            self.assertFalse(set(seeds) & set(titles))
+            scores = [movie['similarity_score'] for movie in recommendations]
+            self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_many_unknown(self):
+        """
+        Test case 23
+        """
+        self.assertEqual([], recommender.recommend_many(['Not A Movie (1900)']))
+        with self.assertRaises(ValueError):
+            recommender.recommend_many(['Toy Story (1995)'], aggregation='median')
+
+    def test_concurrent_recommend(self):
+        """
+        Test case 24
+        """
+        titles = list(recommender.index.titles[:200])
+        expected = [recommender.recommend(title) for title in titles]
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            for _ in range(5):
+                results = list(pool.map(recommender.recommend, titles))
+                self.assertEqual(expected, results)
+                many = list(pool.map(lambda title: recommender.recommend_many([title]), titles))
+                self.assertEqual(expected, many)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,92 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for the query plan audit and the index migrations
+"""
+
+import os
+import re
+import sys
+import unittest
+import warnings
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# pylint: disable=wrong-import-position
+from src import query_audit
+
+# pylint: enable=wrong-import-position
+
+warnings.filterwarnings("ignore")
+
+MIGRATIONS_DIR = os.path.join(query_audit.SRC_DIR, "migrations")
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for the query plan audit
+    """
+
+    def test_extract_queries(self):
+        """
+        Test case 1
+        """
+        queries = {(query.function, query.sql) for query in query_audit.extract_queries()}
+        self.assertIn(("submit_review", "SELECT idMovies, imdb_id FROM Movies WHERE name = %s"), queries)
+        self.assertIn(
+            ("get_movie_details",
+             "SELECT idMovies, name, overview, streaming_platforms FROM Movies "
+             "WHERE name IN (%s) ORDER BY idMovies;"),
+            queries,
+        )
+        self.assertIn(
+            ("remove_from_watchlist_by_movie", "DELETE FROM Watchlist WHERE movie_id = %s AND user_id = %s"),
+            queries,
+        )
+        self.assertFalse([sql for _, sql in queries if sql.startswith("INSERT")])
+        self.assertEqual(
+            "SELECT name FROM Ratings WHERE user_id = '1' ORDER BY time DESC LIMIT 10;",
+            query_audit.bind("SELECT name FROM Ratings WHERE user_id = %s ORDER BY time DESC LIMIT %s;"),
+        )
+
+    def test_full_scans(self):
+        """
+        Test case 2
+        """
+        plan = [
+            {"table": "<derived2>", "type": "ALL"},
+            {"table": "r", "type": "ref", "key": "user_time_idx"},
+            {"table": "m", "type": "ALL"},
+            {"table": None, "type": None},
+        ]
+        self.assertEqual(["m"], query_audit.full_scans(plan))
+        self.assertEqual([], query_audit.full_scans(plan[1:2]))
+
+    def test_migrations_match_schema(self):
+        """
+        Test case 3
+        """
+        with open(query_audit.INIT_SQL, "r", encoding="utf-8") as file:
+            schema = " ".join(file.read().split())
+        for name in sorted(os.listdir(MIGRATIONS_DIR)):
+            with open(os.path.join(MIGRATIONS_DIR, name), "r", encoding="utf-8") as file:
+                migration = file.read()
+            added = re.findall(r"ADD (INDEX \w+ \([^)]*\))", migration)
+            dropped = re.findall(r"DROP INDEX (\w+)", migration)
+            created = re.findall(r"(CREATE TABLE IF NOT EXISTS \w+ \()", migration)
+            self.assertTrue(added or created)
+            for table in created:
+                self.assertIn(table, schema)
+            for index in added:
+                self.assertIn(index, schema)
+            for index in dropped:
+                self.assertNotIn(f"INDEX {index} ", schema)
+        statements = query_audit.schema_statements("testDB")
+        self.assertEqual("USE testDB", statements[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
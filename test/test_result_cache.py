@@ -0,0 +1,121 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for the recommendation result cache
+"""
+
+import sys
+import unittest
+import warnings
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# pylint: disable=wrong-import-position
+from src.recommenderapp.result_cache import RedisBackend, ResultCache, recommendation_key
+
+# pylint: enable=wrong-import-position
+
+warnings.filterwarnings("ignore")
+
+
+class Clock:
+    """
+    Manually advanced stand-in for time.monotonic
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """
+    Stand-in for a redis.Redis client, ignoring expiry
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.down = False
+
+    def get(self, name):
+        """
+        The stored value, or ConnectionError while down
+        """
+        if self.down:
+            raise ConnectionError("redis is down")
+        return self.values.get(name)
+
+    def setex(self, name, ttl, value):
+        """
+        Stores a value, or ConnectionError while down
+        """
+        if self.down:
+            raise ConnectionError("redis is down")
+        self.values[name] = value.encode("utf-8")
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for the result cache
+    """
+
+    def test_key(self):
+        """
+        Test case 1
+        """
+        key = recommendation_key(["Toy Story (1995)", "Heat (1995)"], 30, "max", "1.None.0")
+        self.assertEqual(key, recommendation_key(["Heat (1995)", "Toy Story (1995)", "Heat (1995)"], 30, "max", "1.None.0"))
+        self.assertNotEqual(key, recommendation_key(["Heat (1995)"], 30, "max", "1.None.0"))
+        self.assertNotEqual(key, recommendation_key(["Toy Story (1995)", "Heat (1995)"], 10, "max", "1.None.0"))
+        self.assertNotEqual(key, recommendation_key(["Toy Story (1995)", "Heat (1995)"], 30, "sum", "1.None.0"))
+        self.assertNotEqual(key, recommendation_key(["Toy Story (1995)", "Heat (1995)"], 30, "max", "1.None.1"))
+
+    def test_lru_and_ttl(self):
+        """
+        Test case 2
+        """
+        clock = Clock()
+        cache = ResultCache(max_entries=2, ttl=10, clock=clock)
+        cache.put("a", [1])
+        cache.put("b", [2])
+        self.assertEqual([1], cache.get("a"))
+        cache.put("c", [3])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual([3], cache.get("c"))
+        clock.now = 11
+        self.assertIsNone(cache.get("a"))
+        metrics = cache.metrics()
+        self.assertEqual(1, metrics["entries"])
+        self.assertEqual(2, metrics["hits"])
+        self.assertEqual(2, metrics["misses"])
+        self.assertEqual(1, metrics["evictions"])
+        self.assertEqual(1, metrics["expirations"])
+        self.assertEqual(0.5, metrics["hit_rate"])
+
+    def test_shared_backend(self):
+        """
+        Test case 3
+        """
+        client = FakeRedis()
+        worker_a = ResultCache(backend=RedisBackend(client))
+        worker_b = ResultCache(backend=RedisBackend(client))
+        worker_a.put("key", [{"title": "Heat (1995)"}])
+        self.assertEqual([{"title": "Heat (1995)"}], worker_b.get("key"))
+        self.assertEqual([{"title": "Heat (1995)"}], worker_b.get("key"))
+        self.assertEqual(1, worker_b.metrics()["shared_hits"])
+        self.assertEqual(1, worker_b.metrics()["hits"])
+
+        client.down = True
+        self.assertIsNone(worker_b.get("other"))
+        worker_b.put("other", [])
+        self.assertEqual([], worker_b.get("other"))
+        self.assertEqual(2, worker_b.metrics()["backend_errors"])
+
+
+if __name__ == "__main__":
+    unittest.main()
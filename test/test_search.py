@@ -14,7 +14,7 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 # pylint: disable=wrong-import-position
-from src.recommenderapp.search import Search
+from src.recommenderapp.search import RankedIndex, Search, bounded_distance
 
 # pylint: enable=wrong-import-position
 
@@ -122,6 +122,58 @@ class Tests(unittest.TestCase):
         expected_resp = []
         self.assertFalse(filtered_dict == expected_resp)
 
+    def test_search_top_ten_matches_full(self):
+        """
+        Test case 7
+        """
+        finder = Search()
+        for search_word in ["toy", "LOVE", "the", "1995", "_", " ", "(19", "ory (", "gibberish"]:
+            expected_resp = finder.results(search_word)[:10]
+            self.assertEqual(expected_resp, finder.results_top_ten(search_word))
+
+    def test_ranked_typo(self):
+        """
+        Test case 8
+        """
+        finder = Search()
+        self.assertEqual("Toy Story (1995)", finder.ranked_results("toy stroy")[0])
+        self.assertEqual("Toy Story (1995)", finder.ranked_results("Toy Story (1995)")[0])
+        self.assertIn("Kung Fu Panda (2008)", finder.ranked_results("kung fu pnda"))
+
+    def test_ranked_budget(self):
+        """
+        Test case 9
+        """
+        finder = Search()
+        finder.ranked_results("toy")
+        self.assertTrue(len(finder.ranked_results("toy", limit=5)) <= 5)
+        self.assertEqual([], finder.ranked_results("qqqqqqqq"))
+        self.assertEqual(finder.results_top_ten("_"), finder.ranked_results("_"))
+        self.assertEqual(finder.results_top_ten("("), finder.ranked_results("("))
+        degraded = finder.ranked_results("toy story", limit=5, budget_ms=0)
+        self.assertTrue(0 < len(degraded) <= 5)
+
+    def test_bounded_distance(self):
+        """
+        Test case 10
+        """
+        self.assertEqual(0, bounded_distance("love", "love", 2))
+        self.assertEqual(1, bounded_distance("love", "lvoe", 2))
+        self.assertEqual(1, bounded_distance("story", "stroy", 2))
+        self.assertEqual(2, bounded_distance("panda", "pnad", 2))
+        self.assertEqual(3, bounded_distance("kitten", "sitting", 2))
+
+    def test_two_typos(self):
+        """
+        Test case 11
+        """
+        index = RankedIndex(["the shadow (1994)", "toy story (1995)"], [1, 2], "missing.csv")
+        self.assertEqual({"shadow": 2}, index.typo_words("shodaw"))
+        self.assertEqual({"shadow": 1}, index.typo_words("shadwo"))
+        self.assertEqual({"story": 1}, index.typo_words("stroy"))
+        self.assertEqual({"story": 2}, index.typo_words("stoyr1"))
+        self.assertEqual({}, index.typo_words("to"))
+
 
 if __name__ == "__main__":
     unittest.main()
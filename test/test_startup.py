@@ -0,0 +1,114 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for the startup cost of the Flask app
+"""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+import warnings
+from pathlib import Path
+
+warnings.filterwarnings("ignore")
+
+APP_DIR = Path(__file__).resolve().parents[1] / "src" / "recommenderapp"
+
+# Modules only the search and recommender need, which must not load with the app
+HEAVY_MODULES = ("pandas", "sklearn", "nltk")
+
+# Generous bound on importing app.py, well above its usual cost
+IMPORT_BUDGET_SECONDS = float(os.getenv("APP_IMPORT_BUDGET_SECONDS", "3"))
+
+
+def run_in_app_dir(code, *options):
+    """
+    Runs python code in a fresh interpreter from the app directory, without warm-up
+    """
+    env = dict(os.environ, MODEL_WARMUP="0")
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        cwd=APP_DIR,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+
+def import_times(report):
+    """
+    Cumulative import time in microseconds of every module in a -X importtime report
+    """
+    times = {}
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for the app's import time and deferred model loading
+    """
+
+    def test_import_profile(self):
+        """
+        Test case 1
+        """
+        times = import_times(run_in_app_dir("import app", "-X", "importtime").stderr)
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, times)
+        self.assertLess(times["app"] / 1e6, IMPORT_BUDGET_SECONDS)
+
+    def test_ready(self):
+        """
+        Test case 2
+        """
+        code = (
+            "import json, app\n"
+            "client = app.app.test_client()\n"
+            "before = client.get('/ready').status_code\n"
+            "response = client.post('/search', json={'q': 'toy'})\n"
+            "app.recommender.get()\n"
+            "app.als.get()\n"
+            "after = client.get('/ready')\n"
+            "print(json.dumps([before, response.status_code, after.status_code, after.json]))"
+        )
+        before, search, after, status = json.loads(run_in_app_dir(code).stdout.splitlines()[-1])
+        self.assertEqual(503, before)
+        self.assertEqual(200, search)
+        self.assertEqual(200, after)
+        self.assertTrue(status["search"]["ready"])
+        self.assertTrue(status["recommender"]["ready"])
+        self.assertTrue(status["als"]["ready"])
+
+    def test_no_import_side_effects(self):
+        """
+        Test case 3
+        """
+        code = (
+            "import json, os, threading\n"
+            "os.environ.update(MODEL_WARMUP='1', RATINGS_POLL_INTERVAL='0')\n"
+            "import app\n"
+            "threads = [thread.name for thread in threading.enumerate()]\n"
+            "started = []\n"
+            "app.warm_up = lambda *values: started.append([value.name for value in values])\n"
+            "app.start_background_tasks()\n"
+            "app.start_background_tasks()\n"
+            "print(json.dumps([threads, started]))"
+        )
+        threads, started = json.loads(run_in_app_dir(code).stdout.splitlines()[-1])
+        self.assertEqual(["MainThread"], threads)
+        self.assertEqual([["search", "recommender", "als"]], started)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -33,6 +33,13 @@ from src.recommenderapp.utils import (
     get_friends,
     submit_review,
     get_recent_friend_movies,
+    get_movie_details,
+    get_new_ratings,
+    prune_user_recommendations,
+    save_user_recommendations,
+    get_user_recommendations,
+    get_friend_activity,
+    get_friends_recent_movies,
 )
 
 # pylint: enable=wrong-import-position
@@ -67,6 +74,7 @@ class Tests(unittest.TestCase):
         executor.execute("DELETE FROM Users")
         executor.execute("DELETE FROM Ratings")
         executor.execute("DELETE FROM Friends")
+        executor.execute("DELETE FROM FriendActivity")
         db.commit()
 
     def test_beautify_feedback_data(self):
@@ -366,6 +374,154 @@ class Tests(unittest.TestCase):
             result = executor.fetchall()[0][0]
             self.assertEqual(9, int(result))
 
+    def test_get_movie_details(self):
+        """
+        Test case 11
+        """
+        load_dotenv()
+        db = mysql.connector.connect(
+            host=DATABASE_CONFIG['host'],
+            port=DATABASE_CONFIG['port'],
+            user=DATABASE_CONFIG['user'],
+            password=DATABASE_CONFIG['password'],
+            database=DATABASE_CONFIG['database']
+        )
+        executor = db.cursor()
+        executor.execute("USE testDB;")
+        details = get_movie_details(
+            db, ["Star Wars (1977)", "Forrest Gump (1994)", "Star Wars (1977)", "Not A Movie"]
+        )
+        self.assertEqual(2, len(details))
+        self.assertEqual(11, details["Star Wars (1977)"]["id"])
+        self.assertEqual(13, details["Forrest Gump (1994)"]["id"])
+        self.assertEqual({}, get_movie_details(db, []))
+        db.close()
+
+    def test_get_new_ratings(self):
+        """
+        Test case 12
+        """
+        load_dotenv()
+        db = mysql.connector.connect(
+            host=DATABASE_CONFIG['host'],
+            port=DATABASE_CONFIG['port'],
+            user=DATABASE_CONFIG['user'],
+            password=DATABASE_CONFIG['password'],
+            database=DATABASE_CONFIG['database']
+        )
+        executor = db.cursor()
+        executor.execute("USE testDB;")
+        create_account(db, "test@test.com", "testUser", "testPassword")
+        user = login_to_account(db, "testUser", "testPassword")
+        app = flask.Flask(__name__)
+        with app.test_request_context("/"):
+            submit_review(db, user, "Forrest Gump (1994)", 9, "testReview")
+            submit_review(db, user, "Star Wars (1977)", 7, "testReview")
+        rows = get_new_ratings(db, 0)
+        self.assertEqual(2, len(rows))
+        self.assertEqual((user, "tt0109830", 9), tuple(rows[0][1:]))
+        self.assertEqual([], get_new_ratings(db, rows[-1][0]))
+        self.assertEqual(rows[1:], get_new_ratings(db, rows[0][0]))
+        db.close()
+
+    def test_user_recommendations(self):
+        """
+        Test case 13
+        """
+        load_dotenv()
+        db = mysql.connector.connect(
+            host=DATABASE_CONFIG['host'],
+            port=DATABASE_CONFIG['port'],
+            user=DATABASE_CONFIG['user'],
+            password=DATABASE_CONFIG['password'],
+            database=DATABASE_CONFIG['database']
+        )
+        executor = db.cursor()
+        executor.execute("USE testDB;")
+        create_account(db, "test@test.com", "testUser", "testPassword")
+        user = login_to_account(db, "testUser", "testPassword")
+        save_user_recommendations(db, {user: [(13, 4.5), (11, 4.0), (2, 3.5)]}, "als-v1")
+        recommendations = get_user_recommendations(db, user, 2)
+        self.assertEqual(["Forrest Gump (1994)", "Star Wars (1977)"], [movie["title"] for movie in recommendations])
+        self.assertAlmostEqual(4.5, recommendations[0]["score"])
+        save_user_recommendations(db, {user: [(5, 3.0)]}, "als-v2")
+        self.assertEqual([5], [movie["id"] for movie in get_user_recommendations(db, user)])
+        save_user_recommendations(db, {user: []}, "als-v3")
+        self.assertEqual([], get_user_recommendations(db, user))
+        save_user_recommendations(db, {user: [(5, 3.0)]}, "als-v4")
+        self.assertEqual(0, prune_user_recommendations(db, [user]))
+        self.assertEqual(1, prune_user_recommendations(db, []))
+        self.assertEqual([], get_user_recommendations(db, user))
+        db.close()
+
+    def test_friend_activity(self):
+        """
+        Test case 14
+        """
+        load_dotenv()
+        db = mysql.connector.connect(
+            host=DATABASE_CONFIG['host'],
+            port=DATABASE_CONFIG['port'],
+            user=DATABASE_CONFIG['user'],
+            password=DATABASE_CONFIG['password'],
+            database=DATABASE_CONFIG['database']
+        )
+        executor = db.cursor()
+        executor.execute("USE testDB;")
+        create_account(db, "test@test.com", "testUser", "testPassword")
+        create_account(db, "friend@test.com", "testFriend", "testPassword")
+        user = login_to_account(db, "testUser", "testPassword")
+        friend = login_to_account(db, "testFriend", "testPassword")
+        submit_review(db, friend, "Star Wars (1977)", 8, "before")
+        add_friend(db, "testFriend", user)
+        submit_review(db, friend, "Forrest Gump (1994)", 9, "after")
+        submit_review(db, user, "Citizen Kane (1941)", 7, "mine")
+        activity = get_friend_activity(db, user)
+        self.assertEqual({"Star Wars (1977)", "Forrest Gump (1994)"}, {post["movie_name"] for post in activity})
+        self.assertEqual({"testFriend"}, {post["username"] for post in activity})
+        self.assertEqual(["Citizen Kane (1941)"], [post["movie_name"] for post in get_friend_activity(db, friend)])
+        oldest = activity[-1]
+        self.assertEqual([], get_friend_activity(db, user, (oldest["time"], oldest["idRatings"])))
+        db.close()
+
+    def test_friends_recent_movies(self):
+        """
+        Test case 15
+        """
+        load_dotenv()
+        db = mysql.connector.connect(
+            host=DATABASE_CONFIG['host'],
+            port=DATABASE_CONFIG['port'],
+            user=DATABASE_CONFIG['user'],
+            password=DATABASE_CONFIG['password'],
+            database=DATABASE_CONFIG['database']
+        )
+        executor = db.cursor()
+        executor.execute("USE testDB;")
+        create_account(db, "test@test.com", "testUser", "testPassword")
+        create_account(db, "friend@test.com", "testFriend", "testPassword")
+        create_account(db, "other@test.com", "otherFriend", "testPassword")
+        create_account(db, "stranger@test.com", "stranger", "testPassword")
+        user = login_to_account(db, "testUser", "testPassword")
+        friend = login_to_account(db, "testFriend", "testPassword")
+        add_friend(db, "testFriend", user)
+        add_friend(db, "otherFriend", user)
+        for movie, time in (("Star Wars (1977)", "2023-01-01"), ("Forrest Gump (1994)", "2023-01-03"),
+                            ("Citizen Kane (1941)", "2023-01-02")):
+            executor.execute(
+                "INSERT INTO Ratings(user_id, movie_id, score, review, time) \
+                    SELECT %s, idMovies, 8, 'review', %s FROM Movies WHERE name = %s;",
+                (friend, time, movie),
+            )
+        db.commit()
+        movies = get_friends_recent_movies(db, user, limit=2)
+        self.assertEqual({"testFriend", "otherFriend"}, set(movies))
+        self.assertEqual(["Forrest Gump (1994)", "Citizen Kane (1941)"],
+                         [movie["movie_name"] for movie in movies["testFriend"]])
+        self.assertEqual([], movies["otherFriend"])
+        self.assertEqual(["testFriend"], list(get_friends_recent_movies(db, user, ["testFriend", "stranger"])))
+        db.close()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,140 @@
+"""
+Copyright (c) 2023 Nathan Kohen, Nicholas Foster, Brandon Walia, Robert Kenney
+This code is licensed under MIT license (see LICENSE for details)
+
+@author: PopcornPicks
+
+Test suit for the review wall feed cache
+"""
+
+import datetime
+import sys
+import unittest
+import warnings
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+# pylint: disable=wrong-import-position
+from src.recommenderapp.wall_feed import WallFeed, decode_cursor, encode_cursor, post_key
+
+# pylint: enable=wrong-import-position
+
+warnings.filterwarnings("ignore")
+
+START = datetime.datetime(2023, 1, 1)
+
+
+def make_post(rating_id, minutes):
+    """
+    Wall post of a review made the given minutes after START
+    """
+    return {
+        "idRatings": rating_id,
+        "name": f"Movie {rating_id}",
+        "imdb_id": f"tt{rating_id:07d}",
+        "review": "Review",
+        "score": 5,
+        "username": "user",
+        "time": START + datetime.timedelta(minutes=minutes),
+    }
+
+
+class FakeFeed:
+    """
+    Ratings table answering get_feed_page's keyset queries, counting them
+    """
+
+    def __init__(self, posts):
+        self.posts = list(posts)
+        self.queries = 0
+
+    def __call__(self, db, before=None, after=None, limit=50):
+        self.queries += 1
+        posts = sorted(self.posts, key=post_key, reverse=True)
+        if before is not None:
+            posts = [post for post in posts if post_key(post) < before]
+        if after is not None:
+            return [post for post in posts if post_key(post) > after][-limit:]
+        return posts[:limit]
+
+
+class Clock:
+    """
+    Manually advanced stand-in for time.monotonic
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Tests(unittest.TestCase):
+    """
+    Test cases for the wall feed cache
+    """
+
+    def test_cursor(self):
+        """
+        Test case 1
+        """
+        post = make_post(42, 90)
+        self.assertEqual((START + datetime.timedelta(minutes=90), 42), decode_cursor(encode_cursor(post)))
+        with self.assertRaises(ValueError):
+            decode_cursor("yesterday_1")
+        with self.assertRaises(ValueError):
+            decode_cursor("2023-01-01T00:00:00_x")
+
+    def test_pages(self):
+        """
+        Test case 2
+        """
+        # Ties on time are broken by idRatings
+        fetch = FakeFeed([make_post(i, i // 2) for i in range(1, 101)])
+        feed = WallFeed(fetch, capacity=30, clock=Clock())
+        first = feed.page(None, limit=10)
+        self.assertEqual(list(range(100, 90, -1)), [post["idRatings"] for post in first])
+        second = feed.page(None, before=post_key(first[-1]), limit=10)
+        self.assertEqual(list(range(90, 80, -1)), [post["idRatings"] for post in second])
+        newer = feed.page(None, after=post_key(second[0]), limit=5)
+        self.assertEqual(list(range(95, 90, -1)), [post["idRatings"] for post in newer])
+        self.assertEqual(1, fetch.queries)
+
+        # Past the cached posts, pages come from the db
+        deep = feed.page(None, before=post_key(make_post(75, 37)), limit=10)
+        self.assertEqual(list(range(74, 64, -1)), [post["idRatings"] for post in deep])
+        last = feed.page(None, before=post_key(make_post(3, 1)), limit=10)
+        self.assertEqual([2, 1], [post["idRatings"] for post in last])
+        self.assertEqual(3, fetch.queries)
+        self.assertEqual(3, feed.metrics()["hits"])
+        self.assertEqual(2, feed.metrics()["misses"])
+
+    def test_write_through(self):
+        """
+        Test case 3
+        """
+        clock = Clock()
+        fetch = FakeFeed([make_post(i, i) for i in range(1, 6)])
+        feed = WallFeed(fetch, capacity=4, ttl=5, clock=clock)
+        self.assertEqual([5, 4, 3], [post["idRatings"] for post in feed.page(None, limit=3)])
+
+        # A review submitted through this worker is served without a query
+        fetch.posts.append(make_post(6, 6))
+        feed.add(make_post(6, 6))
+        self.assertEqual([6, 5, 4], [post["idRatings"] for post in feed.page(None, limit=3)])
+        self.assertEqual(1, fetch.queries)
+
+        # One submitted through another worker shows up after the ttl
+        fetch.posts.append(make_post(7, 7))
+        self.assertEqual([6, 5], [post["idRatings"] for post in feed.page(None, limit=2)])
+        clock.now = 6
+        self.assertEqual([7, 6], [post["idRatings"] for post in feed.page(None, limit=2)])
+        self.assertEqual(4, feed.metrics()["posts"])
+        self.assertEqual(
+            [4, 3], [post["idRatings"] for post in feed.page(None, before=post_key(make_post(5, 5)), limit=2)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()